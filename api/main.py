@@ -0,0 +1,149 @@
+"""
+HTTP API for content generation.
+
+Exposes the same generation path as the Streamlit app so other newsroom
+systems can call it directly. Each worker process holds one
+GenerationService with a pooled OpenAI client.
+
+Usage:
+    uvicorn api.main:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+import json
+import logging
+import os
+import re
+import unicodedata
+from contextlib import asynccontextmanager
+from typing import Literal
+from urllib.parse import quote
+
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from redaccion.config import GenerationConfig
+from redaccion.export.cache import EXPORT_FORMATS, get_export_cache
+from redaccion.generation.cache import get_generation_cache
+from redaccion.generation.service import MAX_CANDIDATES, GenerationRequest, GenerationService, create_openai_client
+from redaccion.monitoring.metrics import CONTENT_TYPE_LATEST, metrics_payload
+from redaccion.storage.usage import open_usage_recorder
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._ -]+")
+
+class GenerateBody(BaseModel):
+    category: str
+    subcategory: str
+    text_type: str
+    length: str = Field(description="Length key (corta, media, larga, muy_larga) or its UI label")
+    prompt: str
+    sources: str = ""
+    candidates: int = Field(1, ge=1, le=MAX_CANDIDATES)
+    use_cache: bool = True
+
+
+class ExportBody(BaseModel):
+    text: str
+    filename: str = "texto_generado"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    config = GenerationConfig.from_env()
+    client = create_openai_client(config, api_key=os.getenv("OPENAI_API_KEY"))
+    # Token usage and cost are recorded like the app's (generation_usage, daily budget alarms)
+    app.state.service = GenerationService(config, client, cache=get_generation_cache(), usage=open_usage_recorder())
+    # Blocking OpenAI calls run in the threadpool; let it use the whole connection pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.max_connections
+    yield
+    client.close()
+
+
+app = FastAPI(title="Asistente de Redacción Periodística", lifespan=lifespan)
+
+
+def _generation_request(body: GenerateBody) -> GenerationRequest:
+    try:
+        return GenerationRequest(**body.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/backends")
+def backends(request: Request):
+    """Rolling p50/p95 latency, error rate and health of each generation backend."""
+    service: GenerationService = request.app.state.service
+    return service.router.snapshot()
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: stage durations, tokens, cache lookups and storage queries."""
+    return Response(content=metrics_payload(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.post("/generate")
+def generate(body: GenerateBody, request: Request):
+    """Generate a text and return it with its stats (and ranked candidates)."""
+    service: GenerationService = request.app.state.service
+    generation_request = _generation_request(body)
+    try:
+        result = service.generate(generation_request)
+    except Exception as e:
+        logger.exception("Generation failed")
+        raise HTTPException(status_code=502, detail=f"Generation failed: {str(e)}")
+    return dict(result.to_dict(), metadata=generation_request.metadata())
+
+
+@app.post("/generate/stream")
+def generate_stream(body: GenerateBody, request: Request):
+    """Server-sent events: ``{"delta": ...}`` per chunk, then ``{"done": true, "result": ...}``."""
+    service: GenerationService = request.app.state.service
+    generation_request = _generation_request(body)
+    if generation_request.candidates > 1:
+        raise HTTPException(status_code=422, detail="Streaming supports a single candidate")
+    stream = service.stream(generation_request)
+
+    def events():
+        try:
+            for delta in stream:
+                yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+            yield f"data: {json.dumps({'done': True, 'result': stream.result.to_dict()}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.exception("Streaming generation failed")
+            yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _content_disposition(filename: str, extension: str) -> str:
+    """Attachment header with an ASCII ``filename`` and the original name as RFC 5987 ``filename*``."""
+    name = " ".join(filename.split()) or "texto_generado"
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    ascii_name = UNSAFE_FILENAME_CHARS.sub("_", ascii_name).strip(" .") or "texto_generado"
+    return (
+        f'attachment; filename="{ascii_name}.{extension}"; '
+        f"filename*=UTF-8''{quote(f'{name}.{extension}', safe='')}"
+    )
+
+
+@app.post("/export/{export_format}")
+def export(export_format: Literal["docx", "pdf"], body: ExportBody):
+    """Render a text as a Word or PDF document."""
+    mime = EXPORT_FORMATS[export_format]
+    try:
+        content = get_export_cache().render(body.text, export_format)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not render {export_format}: {str(e)}")
+    return Response(
+        content=content,
+        media_type=mime,
+        headers={"Content-Disposition": _content_disposition(body.filename, export_format)},
+    )
@@ -1,32 +1,21 @@
 import streamlit as st
 import openai
-from openai import OpenAI
 import os
-import json
-import time
-import pandas as pd
-import sqlite3
-from datetime import datetime
-import snowflake.connector
-from snowflake.connector import DictCursor
-from snowflake.sqlalchemy import URL
-from sqlalchemy import create_engine, text
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
-import base64
-from docx import Document
-from docx.shared import Inches
-import io
-from fpdf import FPDF
-import tempfile
+import functools
+# Warehouse (snowflake, sqlalchemy), analytics (pandas, plotly) and export
+# (python-docx, fpdf) modules are imported where they are first used to keep
+# cold start fast; see startup_benchmark.py.
+from redaccion.config import GenerationConfig
+from redaccion.export.cache import DOCX_MIME, PDF_MIME, get_export_cache
+from redaccion.generation.cache import get_generation_cache
+from redaccion.generation.jobs import DONE, FAILED, QUEUED, JobRejected, get_job_queue
+from redaccion.generation.prompt_builder import LENGTH_OPTIONS
+from redaccion.generation.service import GenerationRequest, GenerationService, create_openai_client
+from redaccion.monitoring import metrics, profiling
+from redaccion.storage.query_cache import MODEL_METRICS, USAGE, get_query_cache
+from redaccion.storage.snowflake import get_snowflake_provider
+from redaccion.storage.store import get_feedback_store
+from redaccion.storage.usage import USAGE_SEGMENTS, get_usage_recorder, usage_by
 
 # Set page config at the very beginning
 st.set_page_config(
@@ -36,6 +25,30 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Prometheus metrics on METRICS_PORT (once per process); count this run's storage queries
+metrics.start_metrics_server()
+metrics.start_rerun("full")
+
+# On-demand profiling of each run: PROFILE_RERUNS=true or the sidebar toggle
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "false").lower() in ("1", "true", "yes")
+
+
+def profiling_enabled():
+    return PROFILE_RERUNS or st.session_state.get("profile_reruns", False)
+
+
+def finish_profile(profiler):
+    profile = profiler.stop()
+    try:
+        path = profile.save(os.getenv("PROFILE_DIR", profiling.DEFAULT_PROFILE_DIR))
+    except OSError as e:
+        print(f"Could not save the profile: {str(e)}")
+        path = None
+    st.session_state.last_profile = (profile.summary(top=15), path)
+
+
+rerun_profiler = profiling.RerunProfiler("full").start() if profiling_enabled() else None
+
 # Initialize session state variables
 if 'user_input' not in st.session_state:
     st.session_state.user_input = ""
@@ -51,120 +64,81 @@ if 'comments' not in st.session_state:
 # Initialize OpenAI
 openai.api_key = st.secrets["OPENAI"]["api_key"]
 
-# Initialize the OpenAI client
-client = OpenAI(
-    api_key=st.secrets["OPENAI"]["api_key"]
-)
+# Feedback storage shared by all sessions: Snowflake or a local SQLite file (STORAGE_BACKEND)
+def get_store():
+    return get_feedback_store(dict(st.secrets.get("SNOWFLAKE", {})))
 
-# Create SQLAlchemy engine for Snowflake
-def get_snowflake_engine():
+# Verify the storage schema once per process (warehouse migrations normally run at release)
+def init_storage():
     try:
-        # First connect without database to create it if needed
-        conn = snowflake.connector.connect(
-            user=st.secrets["SNOWFLAKE"]["user"],
-            password=st.secrets["SNOWFLAKE"]["password"],
-            account=st.secrets["SNOWFLAKE"]["account"],
-            warehouse=st.secrets["SNOWFLAKE"]["warehouse"]
-        )
-        
-        # Create database and schema if they don't exist
-        cur = conn.cursor()
-        cur.execute(f"CREATE DATABASE IF NOT EXISTS {st.secrets['SNOWFLAKE']['database']}")
-        cur.execute(f"USE DATABASE {st.secrets['SNOWFLAKE']['database']}")
-        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {st.secrets['SNOWFLAKE']['schema']}")
-        cur.close()
-        conn.close()
-        
-        # Now create engine with the database and schema
-        engine = create_engine(URL(
-            account=st.secrets["SNOWFLAKE"]["account"],
-            user=st.secrets["SNOWFLAKE"]["user"],
-            password=st.secrets["SNOWFLAKE"]["password"],
-            warehouse=st.secrets["SNOWFLAKE"]["warehouse"],
-            database=st.secrets["SNOWFLAKE"]["database"],
-            schema=st.secrets["SNOWFLAKE"]["schema"]
-        ))
-        
-        return engine
+        get_store().ensure_schema(apply=os.getenv("AUTO_MIGRATE", "true").lower() == "true")
     except Exception as e:
-        st.error(f"Error creating Snowflake engine: {str(e)}")
-        return None
+        st.error(f"Error initializing storage: {str(e)}")
 
-# Snowflake connection function (for non-pandas operations)
-def get_snowflake_connection():
+# Generation service: one pooled OpenAI client and cache per process. Token usage and cost of every
+# generation are written to the store in batches (generation_usage)
+@st.cache_resource
+def get_generation_service():
+    config = GenerationConfig.from_env()
+    client = create_openai_client(config, api_key=st.secrets["OPENAI"]["api_key"])
     try:
-        conn = snowflake.connector.connect(
-            user=st.secrets["SNOWFLAKE"]["user"],
-            password=st.secrets["SNOWFLAKE"]["password"],
-            account=st.secrets["SNOWFLAKE"]["account"],
-            warehouse=st.secrets["SNOWFLAKE"]["warehouse"],
-            database=st.secrets["SNOWFLAKE"]["database"],
-            schema=st.secrets["SNOWFLAKE"]["schema"]
-        )
-        return conn
+        usage = get_usage_recorder(get_store())
     except Exception as e:
-        st.error(f"Error connecting to Snowflake: {str(e)}")
+        print(f"Usage accounting disabled: {str(e)}")
+        usage = None
+    return GenerationService(config, client, cache=get_generation_cache(), usage=usage)
+
+generation_service = get_generation_service()
+export_cache = get_export_cache()
+client = generation_service.client
+
+# Generations run on a process-wide worker pool; the session only keeps the job id and polls it
+generation_jobs = get_job_queue(generation_service)
+JOB_POLL_INTERVAL = float(os.getenv("GENERATION_POLL_INTERVAL", "0.5"))
+
+# Concurrency limits apply per signed-in editor, or per browser session without sign-in
+def job_owner():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    if st.user.get("is_logged_in") and st.user.get("email"):
+        return st.user.get("email")
+    return get_script_run_ctx().session_id
+
+# Attach the session's finished job to the session state; returns the job while it is still pending
+def collect_generation_job():
+    job_id = st.session_state.get("generation_job_id")
+    if job_id is None:
+        return None
+    job = generation_jobs.get(job_id)
+    if job is not None and not job.finished:
+        return job
+    del st.session_state.generation_job_id
+    if job is None:
+        # Expired, or lost with a server restart
+        st.warning("No se encontró la generación en curso. Por favor, intenta de nuevo.")
         return None
+    generation_jobs.forget(job_id)
+    if job.status == DONE:
+        generation_result = job.result
+        # Keep the result in the session so it survives reruns (e.g. the feedback form)
+        st.session_state.generated_text = generation_result.text
+        st.session_state.generation_info = generation_result.info()
+        st.session_state.generation_candidates = generation_result.candidates
+        st.session_state.generation_metadata = job.request.metadata()
+        st.session_state.feedback_submitted = False
+    elif job.status == FAILED:
+        st.error(f"Ocurrió un error al generar el contenido: {job.error}")
+    else:
+        st.info("Generación cancelada.")
+    return None
 
-# Initialize Snowflake tables
-def init_snowflake_tables():
+# Pooled Snowflake connection for the warehouse-only training functions; close() returns it to the pool
+def get_snowflake_connection():
     try:
-        conn = get_snowflake_connection()
-        if conn:
-            cur = conn.cursor()
-            
-            # Create feedback table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS feedback (
-                    id NUMBER AUTOINCREMENT,
-                    timestamp TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
-                    rating NUMBER,
-                    comments TEXT,
-                    generated_text TEXT,
-                    category TEXT,
-                    text_type TEXT,
-                    length TEXT,
-                    sources TEXT,
-                    tone TEXT,
-                    style TEXT,
-                    additional_instructions TEXT
-                )
-            """)
-            
-            # Create model metrics table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS model_metrics (
-                    id NUMBER AUTOINCREMENT,
-                    model_name TEXT,
-                    model_version TEXT,
-                    training_accuracy FLOAT,
-                    validation_accuracy FLOAT,
-                    last_updated TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
-                )
-            """)
-            
-            # Create analytics view
-            cur.execute("""
-                CREATE OR REPLACE VIEW feedback_analytics AS
-                SELECT 
-                    category,
-                    text_type,
-                    length,
-                    tone,
-                    style,
-                    AVG(rating) as avg_rating,
-                    COUNT(*) as feedback_count,
-                    COUNT(CASE WHEN rating >= 4 THEN 1 END) as positive_feedback_count
-                FROM feedback
-                GROUP BY category, text_type, length, tone, style
-            """)
-            
-            conn.commit()
-            cur.close()
-            conn.close()
-            st.success("Snowflake tables initialized successfully!")
+        return get_snowflake_provider(dict(st.secrets["SNOWFLAKE"])).raw_connection()
     except Exception as e:
-        st.error(f"Error initializing Snowflake tables: {str(e)}")
+        st.error(f"Error connecting to Snowflake: {str(e)}")
+        return None
 
 # Initialize session state for app refresh and text input
 if 'refresh' not in st.session_state:
@@ -178,86 +152,41 @@ if 'feedback_rating' not in st.session_state:
 if 'feedback_comments' not in st.session_state:
     st.session_state.feedback_comments = ""
 
-# Function to save feedback to Snowflake
+# Function to save feedback
 def save_feedback(rating, comments, generated_text, metadata):
     try:
-        conn = get_snowflake_connection()
-        if conn:
-            cur = conn.cursor()
-            cur.execute(f"USE DATABASE {st.secrets['SNOWFLAKE']['database']}")
-            cur.execute(f"USE SCHEMA {st.secrets['SNOWFLAKE']['schema']}")
-            feedback_df = pd.DataFrame([{
-                'rating': int(rating),
-                'comments': str(comments),
-                'generated_text': str(generated_text),
-                'category': str(metadata['category']),
-                'text_type': str(metadata['text_type']),
-                'length': str(metadata['length']),
-                'sources': str(metadata['sources']),
-                'tone': str(metadata['tone']),
-                'style': str(metadata['style']),
-                'additional_instructions': str(metadata['additional_instructions'])
-            }])
-            print("Attempting to write feedback to Snowflake:", feedback_df)
-            success, nchunks, nrows, _ = snowflake.connector.pandas_tools.write_pandas(
-                conn,
-                feedback_df,
-                'FEEDBACK.PUBLIC.FEEDBACK',
-                auto_create_table=False,
-                overwrite=False
-            )
-            print("Write result:", success, nchunks, nrows)
-            conn.close()
-            return success
+        get_store().save_feedback(rating, comments, generated_text, metadata)
+        return True
     except Exception as e:
-        st.error(f"Error saving feedback to Snowflake: {str(e)}")
-        print("Error saving feedback to Snowflake:", str(e))
+        st.error(f"Error saving feedback: {str(e)}")
+        print("Error saving feedback:", str(e))
         return False
 
-# Function to get feedback history from Snowflake
-def get_feedback_history():
-    try:
-        engine = get_snowflake_engine()
-        if engine:
-            with engine.connect() as conn:
-                query = text("""
-                    SELECT 
-                        timestamp,
-                        rating,
-                        comments,
-                        generated_text,
-                        category,
-                        text_type,
-                        length,
-                        sources,
-                        tone,
-                        style,
-                        additional_instructions
-                    FROM FEEDBACK.PUBLIC.FEEDBACK
-                    ORDER BY timestamp DESC
-                """)
-                df = pd.read_sql(query, conn)
-                return df
-    except Exception as e:
-        st.error(f"Error getting feedback history: {str(e)}")
-        return pd.DataFrame()
+# Run a feedback query function on a storage connection. Results are shared by all
+# sessions until new feedback is stored (or QUERY_CACHE_TTL expires).
+def run_feedback_query(query, *args, **kwargs):
+    key = (query.__module__, query.__qualname__, args, tuple(sorted(kwargs.items())))
+    return get_query_cache().get(key, lambda: get_store().run(lambda conn: query(conn, *args, **kwargs)))
+
+# Function to get feedback analytics from the daily rollup
+def get_feedback_analytics(history_filters=None, since=None):
+    import pandas as pd
+    from redaccion.storage import rollup
 
-# Function to get feedback analytics
-def get_feedback_analytics():
+    filters = {}
+    if history_filters is not None:
+        filters = {"category": list(history_filters.categories), "text_type": list(history_filters.text_types)}
     try:
-        engine = get_snowflake_engine()
-        if engine:
-            with engine.connect() as conn:
-                query = text("""
-                    SELECT *
-                    FROM feedback_analytics
-                    ORDER BY last_feedback_time DESC
-                """)
-                df = pd.read_sql(query, conn)
-                return df
+        def read(conn):
+            return {
+                "trend": pd.DataFrame(rollup.daily_trend(conn, since=since, **filters)),
+                "category": pd.DataFrame(rollup.rating_by(conn, "category", since=since, **filters)),
+                "text_type": pd.DataFrame(rollup.rating_by(conn, "text_type", since=since, **filters)),
+            }
+        return get_query_cache().get(("feedback_analytics", history_filters, since), lambda: get_store().run(read))
     except Exception as e:
         st.error(f"Error getting feedback analytics: {str(e)}")
-        return pd.DataFrame()
+        return {"trend": pd.DataFrame(), "category": pd.DataFrame(), "text_type": pd.DataFrame()}
 
 # Function to analyze feedback patterns
 def analyze_feedback(feedback_df):
@@ -275,40 +204,154 @@ def analyze_feedback(feedback_df):
     }
     return analysis
 
-# Initialize Snowflake tables
-init_snowflake_tables()
-
-# Function to create Word document
-def create_word_doc(text):
-    doc = Document()
-    doc.add_paragraph(text)
-    return doc
-
-# Function to create PDF document
-def create_pdf_doc(text):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    # Replace unsupported characters (like en dash) with hyphen
-    safe_text = text.replace("–", "-")
-    # Split text into lines that fit the page width
-    lines = safe_text.split('\n')
-    for line in lines:
-        pdf.multi_cell(0, 10, txt=line)
-    return pdf
-
-# Load training data
-def load_training_data():
-    training_data = []
-    with open('training_data.jsonl', 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                if 'metadata' in data and data['metadata']:
-                    training_data.append(data)
-            except json.JSONDecodeError:
-                continue
-    return training_data
+# Function to prepare training data in Snowflake
+def prepare_training_data():
+    try:
+        conn = get_snowflake_connection()
+        if conn:
+            # Create a view for training data
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE OR REPLACE VIEW training_data_view AS
+                SELECT 
+                    generated_text,
+                    category,
+                    subcategory,
+                    text_type,
+                    length,
+                    rating,
+                    comments,
+                    user_prompt,
+                    timestamp
+                FROM feedback
+                WHERE rating >= 4  -- Only use high-quality examples
+            """)
+            
+            # Create feature engineering view
+            cur.execute("""
+                CREATE OR REPLACE VIEW ml_features AS
+                SELECT 
+                    generated_text,
+                    category,
+                    subcategory,
+                    text_type,
+                    length,
+                    rating,
+                    -- Extract key features from comments
+                    REGEXP_SUBSTR(comments, 'estructura|clarity|relevance|sources|adaptation', 1, 1) as key_feature,
+                    -- Calculate text metrics
+                    LENGTH(generated_text) as text_length,
+                    -- Create category embeddings
+                    HASH(category) as category_embedding,
+                    HASH(subcategory) as subcategory_embedding,
+                    HASH(text_type) as text_type_embedding
+                FROM training_data_view
+            """)
+            
+            conn.commit()
+            conn.close()
+            return True
+    except Exception as e:
+        st.error(f"Error preparing training data: {str(e)}")
+        return False
+
+def train_model():
+    try:
+        conn = get_snowflake_connection()
+        if conn:
+            cur = conn.cursor()
+            # Create training procedure
+            cur.execute("""
+                CREATE OR REPLACE PROCEDURE train_text_model()
+                RETURNS STRING
+                LANGUAGE SQL
+                AS
+                $$
+                DECLARE
+                    model_id STRING;
+                BEGIN
+                    -- Create and train the model
+                    CREATE OR REPLACE MODEL text_generation_model
+                    AS SELECT 
+                        generated_text,
+                        category,
+                        subcategory,
+                        text_type,
+                        length,
+                        rating,
+                        key_feature,
+                        text_length,
+                        category_embedding,
+                        subcategory_embedding,
+                        text_type_embedding
+                    FROM ml_features
+                    WHERE rating >= 4;
+                    -- Get model ID
+                    SELECT model_id INTO :model_id
+                    FROM TABLE(INFORMATION_SCHEMA.MODELS)
+                    WHERE model_name = 'text_generation_model';
+                    -- Insert metrics into model_metrics table
+                    INSERT INTO model_metrics (
+                        model_name,
+                        model_version,
+                        training_accuracy,
+                        validation_accuracy
+                    )
+                    SELECT 
+                        'text_generation_model',
+                        model_id,
+                        0.85,  -- Example accuracy values
+                        0.82
+                    FROM TABLE(INFORMATION_SCHEMA.MODELS)
+                    WHERE model_name = 'text_generation_model';
+                    RETURN model_id;
+                END;
+                $$
+            """)
+            # Execute training
+            cur.execute("CALL train_text_model()")
+            model_id = cur.fetchone()[0]
+            conn.close()
+            # The procedure recorded new model metrics
+            get_query_cache().invalidate(MODEL_METRICS)
+            return model_id
+    except Exception as e:
+        st.error(f"Error training model: {str(e)}")
+        return None
+
+# Function to get model predictions
+def get_model_predictions(category, subcategory, text_type, length):
+    try:
+        conn = get_snowflake_connection()
+        if conn:
+            cur = conn.cursor()
+            
+            # Get predictions from the model
+            cur.execute("""
+                SELECT 
+                    PREDICT(
+                        text_generation_model,
+                        :category,
+                        :subcategory,
+                        :text_type,
+                        :length
+                    ) as prediction
+            """, {
+                'category': category,
+                'subcategory': subcategory,
+                'text_type': text_type,
+                'length': length
+            })
+            
+            prediction = cur.fetchone()[0]
+            conn.close()
+            return prediction
+    except Exception as e:
+        st.error(f"Error getting predictions: {str(e)}")
+        return None
+
+# Initialize storage tables
+init_storage()
 
 # Title and description
 st.title("📝 Asistente de Redacción Periodística")
@@ -394,12 +437,7 @@ selected_text_type = st.selectbox(
 )
 
 # Length selector
-length_options = {
-    "Corta (100-300 palabras)": "corta",
-    "Media (301-500 palabras)": "media",
-    "Larga (501-800 palabras)": "larga",
-    "Muy larga (801+ palabras)": "muy_larga"
-}
+length_options = LENGTH_OPTIONS
 
 selected_length = st.radio(
     "Selecciona la longitud del texto:",
@@ -413,8 +451,125 @@ Este asistente te ayudará a generar contenido periodístico de alta calidad.
 Escribe tus instrucciones o el tema sobre el que deseas escribir, y el asistente te ayudará a crear un texto profesional.
 """)
 
-# Add tabs for main content and feedback history
-tab1, tab2, tab3 = st.tabs(["Generar Texto", "Historial de Feedback", "Entrenamiento del Modelo"])
+# Fragment reruns skip the top of the script, so they count their own storage queries
+def measured_fragment(fn):
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if not (ctx and ctx.fragment_ids_this_run):
+            # Part of a full run, already measured
+            return fn(*args, **kwargs)
+        metrics.start_rerun("fragment")
+        profiler = profiling.RerunProfiler(fn.__name__).start() if profiling_enabled() else None
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                finish_profile(profiler)
+            metrics.finish_rerun()
+    return wrapper
+
+def submit_feedback(generated_text):
+    # Metadata of the request that produced this text
+    metadata = st.session_state.generation_metadata
+    if save_feedback(
+        st.session_state.feedback_form_rating, st.session_state.feedback_form_comments, generated_text, metadata
+    ):
+        st.session_state.feedback_submitted = True
+    else:
+        st.error("Hubo un error al guardar el feedback. Por favor, intenta de nuevo.")
+
+# Feedback form; submitting it reruns only the form, not the whole page
+@st.fragment
+@measured_fragment
+def feedback_form(generated_text):
+    if st.session_state.feedback_submitted:
+        st.success("¡Gracias por tus comentarios! Tu feedback nos ayuda a mejorar.")
+        
+        # Show thank you message
+        st.markdown("""
+        ### ¡Gracias por tu contribución! 🎉
+        
+        Tu feedback es valioso para nosotros y nos ayuda a:
+        - Mejorar la calidad de los textos generados
+        - Entender mejor las necesidades de los usuarios
+        - Refinar nuestros procesos de generación
+        
+        Puedes ver el historial de feedback en la pestaña "Historial de Feedback".
+        """)
+    else:
+        st.markdown("### ¿Cómo calificarías el texto generado?")
+        
+        # Create a form for feedback
+        with st.form(key="feedback_form"):
+            # Create columns for feedback
+            feedback_col1, feedback_col2 = st.columns([1, 2])
+            
+            with feedback_col1:
+                # Rating dropdown
+                st.selectbox(
+                    "Calificación",
+                    options=[5, 4, 3, 2, 1],
+                    format_func=lambda x: f"{x} {'⭐' * x}",
+                    index=0,
+                    key="feedback_form_rating"
+                )
+            
+            with feedback_col2:
+                # Comments text area
+                st.text_area(
+                    "Comentarios (opcional)",
+                    placeholder="¿Qué te gustó o qué podría mejorarse?",
+                    height=100,
+                    key="feedback_form_comments"
+                )
+            
+            # Submit button inside the form; saving in the callback lets the fragment rerun
+            # that follows show the thank-you message (the history tab reads the new row when opened)
+            st.form_submit_button(
+                label="Enviar Feedback",
+                type="primary",
+                on_click=submit_feedback,
+                args=(generated_text,)
+            )
+
+# Progress of the session's generation job, polled without rerunning the page
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+@measured_fragment
+def generation_progress(job_id, show_text):
+    job = generation_jobs.get(job_id)
+    if job is None or job.finished:
+        # The full run attaches the result and renders it with the feedback form
+        st.rerun()
+
+    if job.cancel_requested:
+        st.info("Cancelando la generación...")
+    elif job.status == QUEUED:
+        ahead = generation_jobs.position(job)
+        st.info(f"En espera: {ahead} generaciones por delante." if ahead else "En espera de un generador libre...")
+    else:
+        st.markdown("### Resultado:")
+        if show_text and job.text:
+            st.markdown(job.text + " ▌")
+        st.caption(f"Generando contenido... {job.elapsed:.0f} s")
+
+    st.button(
+        "Cancelar",
+        key="cancel_generation",
+        on_click=generation_jobs.cancel,
+        args=(job_id,),
+        disabled=job.cancel_requested
+    )
+
+# Add tabs for main content and feedback history. Only the open tab runs on each
+# rerun, so typing or generating in the first tab does not query the history.
+tab1, tab2, tab3 = st.tabs(
+    ["Generar Texto", "Historial de Feedback", "Entrenamiento del Modelo"],
+    key="main_tab",
+    on_change="rerun"
+)
 
 with tab1:
     # Create the text area for user input
@@ -438,16 +593,34 @@ with tab1:
     # Update session state with the current sources input
     st.session_state.sources_input = sources_prompt
 
+    # Streaming mode renders the text as it is generated
+    stream_output = st.toggle("Mostrar el texto mientras se genera", value=True)
+
+    # Several versions can be requested in one call and ranked locally
+    num_candidates = st.select_slider(
+        "Versiones a generar:",
+        options=[1, 2, 3, 4],
+        value=1,
+        help="Con más de una versión se muestra primero la mejor evaluada y el texto no se transmite en vivo."
+    )
+
     # Create columns for buttons
     col1, col2 = st.columns([1, 3])
 
     # Add a generate button
     with col1:
-        generate_button = st.button("Generar", type="primary")
+        generate_button = st.button(
+            "Generar",
+            type="primary",
+            help="Con las mismas instrucciones se genera una versión nueva."
+        )
 
     # Add a new text button
     with col2:
         if st.button("Nuevo Texto", type="secondary"):
+            # A pending generation would otherwise run on with nobody to collect it
+            if st.session_state.get("generation_job_id"):
+                generation_jobs.cancel(st.session_state.generation_job_id)
             # Clear all session state variables
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
@@ -463,300 +636,178 @@ with tab1:
     if st.session_state.get('refresh', False):
         st.session_state.refresh = False
 
+    # A job finished since the last run is attached to the session here
+    active_job = collect_generation_job()
     if generate_button:
         if user_prompt:
-            with st.spinner("Generando contenido..."):
-                try:
-                    # Load training data
-                    training_data = load_training_data()
-                    
-                    # Filter relevant examples based on category and text type
-                    relevant_examples = [
-                        example for example in training_data 
-                        if selected_category.lower() in example['metadata'].get('category', '').lower() 
-                        and selected_text_type.lower() in example['metadata'].get('type', '').lower()
-                    ][:3]  # Get top 3 relevant examples
-                    
-                    # Create a more specific system prompt based on the selected category, subcategory, text type and length
-                    length_instruction = {
-                        "corta": "El texto debe ser conciso y directo, entre 100 y 300 palabras.",
-                        "media": "El texto debe tener una extensión media, entre 301 y 500 palabras.",
-                        "larga": "El texto debe ser detallado y extenso, entre 501 y 800 palabras.",
-                        "muy_larga": "El texto debe ser muy detallado y extenso, con más de 801 palabras."
-                    }
+            try:
+                generation_request = GenerationRequest(
+                    category=selected_category,
+                    subcategory=selected_subcategory,
+                    text_type=selected_text_type,
+                    length=length_options[selected_length],
+                    prompt=user_prompt,
+                    sources=sources_prompt,
+                    candidates=num_candidates
+                )
+                # Generating again from the inputs of the text on screen asks for a new version, not the cached one
+                generation_request.use_cache = (
+                    generation_request.metadata() != st.session_state.get("generation_metadata")
+                )
+                # A new request replaces the one still running for this session
+                if active_job is not None:
+                    generation_jobs.cancel(active_job.id)
+                active_job = generation_jobs.submit(generation_request, owner=job_owner())
+                st.session_state.generation_job_id = active_job.id
+            except JobRejected as e:
+                active_job = None
+                st.session_state.pop("generation_job_id", None)
+                if e.reason == "user_limit":
+                    st.warning("Ya tienes generaciones en curso. Espera a que terminen o cancélalas.")
+                else:
+                    st.warning("Hay demasiadas generaciones en espera. Por favor, intenta de nuevo en unos segundos.")
+            except Exception as e:
+                st.error(f"Ocurrió un error al generar el contenido: {str(e)}")
+        else:
+            st.warning("Por favor, escribe algunas instrucciones para generar el contenido.")
 
-                    text_type_instruction = {
-                        "Nota Periodística": """El texto debe seguir el formato de una nota periodística:
-                        - Estilo directo y objetivo
-                        - Incluir las 5W (qué, quién, cuándo, dónde, por qué) pero no hacerlo textual sobre el texto
-                        - Estructura piramidal invertida (lo más importante primero)
-                        - Evitar opiniones personales
-                        - Usar lenguaje claro y preciso
-                        - Incluir citas directas cuando sea relevante""",
-                        
-                        "Artículo": """El texto debe seguir el formato de un artículo:
-                        - Estilo más elaborado y análisis profundo
-                        - Incluir contexto y antecedentes
-                        - Presentar diferentes perspectivas
-                        - Usar datos y estadísticas relevantes
-                        - Mantener un tono profesional pero accesible
-                        - Incluir conclusiones o reflexiones finales""",
-                        
-                        "Guión de TV": """El texto debe seguir el formato de un guión de TV:
-                        - Incluir indicaciones de cámara claras
-                        - Estructurar diálogos de manera natural
-                        - Describir escenas y ambientación
-                        - Incluir indicaciones de sonido y música
-                        - Mantener un ritmo dinámico
-                        - Usar formato estándar de guión""",
-                        
-                        "Crónica": """El texto debe seguir el formato de una crónica:
-                        - Estilo narrativo y personal
-                        - Incluir elementos descriptivos
-                        - Mantener un hilo narrativo coherente
-                        - Incorporar detalles sensoriales
-                        - Balancear objetividad con perspectiva personal
-                        - Usar lenguaje rico y evocador"""
-                    }
+    if active_job is not None:
+        generation_progress(active_job.id, stream_output)
+    elif st.session_state.generated_text:
+        generated_text = st.session_state.generated_text
+        generation_info = st.session_state.get('generation_info', {})
 
-                    # Add general writing guidelines
-                    writing_guidelines = """
-                    Instrucciones generales de redacción:
-                    1. Evitar repeticiones innecesarias de palabras o frases
-                    2. Mantener coherencia en el uso de tiempos verbales
-                    3. Asegurar que cada párrafo tenga una idea principal clara
-                    4. Usar conectores para mejorar la fluidez del texto
-                    5. Verificar que la información sea precisa y verificable
-                    6. Mantener un tono profesional y objetivo
-                    7. Evitar clichés y frases hechas
-                    8. Asegurar que las citas y referencias sean precisas
-                    9. Mantener consistencia en el estilo y formato
-                    10. Verificar que el texto cumpla con la longitud especificada
-                    """
-
-                    # Create examples section if we have relevant examples
-                    examples_section = ""
-                    if relevant_examples:
-                        examples_section = "\n\nEjemplos de referencia:\n"
-                        for i, example in enumerate(relevant_examples, 1):
-                            examples_section += f"\nEjemplo {i}:\n{example['text']}\n"
-
-                    # Add sources section if provided
-                    sources_section = ""
-                    if sources_prompt:
-                        sources_section = f"\n\nFuentes y referencias a incluir:\n{sources_prompt}"
-
-                    # Add violence guidelines prompt
-                    PROMPT_VIOLENCIA = (
-                        "Cuando escribas sobre temas sensibles como la muerte o asesinato de figuras públicas, "
-                        "hazlo de manera profesional, objetiva y respetuosa. "
-                        "Evita detalles explícitos o sensacionalistas, prioriza el respeto a las víctimas y sus familias, "
-                        "y utiliza un lenguaje responsable y factual. "
-                        "No rechaces la solicitud, pero asegúrate de mantener un tono periodístico y ético."
-                    )
+        st.markdown("### Resultado:")
+        st.markdown(generated_text)
 
-                    system_prompt = f"""Eres un asistente experto en redacción periodística, especializado en {selected_category} y {selected_subcategory}. 
-Tu objetivo es ayudar a crear contenido profesional, bien estructurado y atractivo para los lectores. 
-El contenido debe ser preciso, informativo y relevante para el área de {selected_category} y {selected_subcategory}.
-
-SIEMPRE incluye un título al inicio de cada nota, artículo, crónica, etc., a menos que el usuario especifique lo contrario.
-
-{text_type_instruction[selected_text_type]}
-{length_instruction[length_options[selected_length]]}
-{writing_guidelines}
-{examples_section}
-{sources_section}
-
-Recuerda:
-- Revisar el texto antes de entregarlo
-- Asegurar que cumple con todos los requisitos especificados
-- Mantener un estilo consistente y profesional
-- Verificar que la información sea precisa y relevante
-- Evitar errores comunes de redacción
-"""
-
-                    response = client.chat.completions.create(
-                        model="gpt-4-turbo-preview",
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "system", "content": PROMPT_VIOLENCIA},
-                            {"role": "user", "content": user_prompt}
-                        ]
-                    )
-                    
-                    generated_text = response.choices[0].message.content
-                    
-                    # Display the response in a nice format
-                    st.markdown("### Resultado:")
-                    st.markdown(generated_text)
-                    
-                    # Create columns for download buttons
-                    col1, col2 = st.columns(2)
-                    
-                    # Add download buttons
-                    with col1:
-                        # Word document download
-                        doc = create_word_doc(generated_text)
-                        docx_bytes = io.BytesIO()
-                        doc.save(docx_bytes)
-                        docx_bytes.seek(0)
-                        st.download_button(
-                            label="📥 Descargar como Word",
-                            data=docx_bytes,
-                            file_name="texto_generado.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
-                    
-                    with col2:
-                        # PDF document download
-                        pdf = create_pdf_doc(generated_text)
-                        # Create a temporary file to save the PDF
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                            pdf.output(tmp.name)
-                            # Read the temporary file
-                            with open(tmp.name, 'rb') as f:
-                                pdf_bytes = f.read()
-                        st.download_button(
-                            label="📥 Descargar como PDF",
-                            data=pdf_bytes,
-                            file_name="texto_generado.pdf",
-                            mime="application/pdf"
-                        )
-
-                    # Add feedback section
-                    st.markdown("---")
-                    st.markdown("### ¿Cómo calificarías el texto generado?")
-                    
-                    # Create a form for feedback
-                    with st.form(key="feedback_form"):
-                        # Create columns for feedback
-                        feedback_col1, feedback_col2 = st.columns([1, 2])
-                        
-                        with feedback_col1:
-                            # Rating dropdown
-                            rating = st.selectbox(
-                                "Calificación",
-                                options=[5, 4, 3, 2, 1],
-                                format_func=lambda x: f"{x} {'⭐' * x}",
-                                index=0
-                            )
-                        
-                        with feedback_col2:
-                            # Comments text area
-                            comments = st.text_area(
-                                "Comentarios (opcional)",
-                                placeholder="¿Qué te gustó o qué podría mejorarse?",
-                                height=100
-                            )
-                        
-                        # Submit button inside the form
-                        submit_button = st.form_submit_button(
-                            label="Enviar Feedback",
-                            type="primary"
-                        )
-                        
-                        if submit_button:
-                            # Prepare metadata
-                            metadata = {
-                                "category": selected_category,
-                                "subcategory": selected_subcategory,
-                                "text_type": selected_text_type,
-                                "length": length_options[selected_length],
-                                "user_prompt": user_prompt,
-                                "sources": sources_prompt,
-                                "tone": "",
-                                "style": "",
-                                "additional_instructions": ""
-                            }
-                            
-                            # Save feedback
-                            if save_feedback(rating, comments, generated_text, metadata):
-                                st.success("¡Gracias por tus comentarios! Tu feedback nos ayuda a mejorar.")
-                                st.balloons()
-                                
-                                # Show thank you message
-                                st.markdown("""
-                                ### ¡Gracias por tu contribución! 🎉
-                                
-                                Tu feedback es valioso para nosotros y nos ayuda a:
-                                - Mejorar la calidad de los textos generados
-                                - Entender mejor las necesidades de los usuarios
-                                - Refinar nuestros procesos de generación
-                                
-                                Puedes ver el historial de feedback en la pestaña "Historial de Feedback".
-                                """)
-                                
-                                # Force a rerun to update the feedback history
-                                st.rerun()
-                            else:
-                                st.error("Hubo un error al guardar el feedback. Por favor, intenta de nuevo.")
-                    
-                except Exception as e:
-                    st.error(f"Ocurrió un error al generar el contenido: {str(e)}")
+        prompt_caption = (
+            f"Tokens del prompt: {generation_info.get('assembled_prompt_tokens', 0):,} "
+            f"({generation_info.get('examples_used', 0)} ejemplos)"
+        )
+        if generation_info.get('cached'):
+            st.caption(f"Resultado recuperado de la caché · {prompt_caption}")
         else:
-            st.warning("Por favor, escribe algunas instrucciones para generar el contenido.")
+            st.caption(
+                f"Primer token: {generation_info.get('time_to_first_token') or 0:.1f} s · "
+                f"Tiempo total: {generation_info.get('total_duration') or 0:.1f} s · {prompt_caption}"
+            )
+
+        # Alternative versions, best ranked first
+        other_candidates = [
+            candidate for candidate in st.session_state.get('generation_candidates', [])
+            if candidate['text'] != generated_text
+        ]
+        if other_candidates:
+            with st.expander(f"Otras versiones ({len(other_candidates)})"):
+                for candidate in other_candidates:
+                    st.markdown(f"**Versión {candidate['index'] + 1}** · puntuación {candidate['score']:.2f}")
+                    st.markdown(candidate['text'])
+                    if st.button("Usar esta versión", key=f"use_candidate_{candidate['index']}"):
+                        st.session_state.generated_text = candidate['text']
+                        st.session_state.feedback_submitted = False
+                        st.rerun()
+                    st.markdown("---")
+
+        # Create columns for download buttons (only once the whole text is available)
+        col1, col2 = st.columns(2)
+        
+        # Add download buttons
+        with col1:
+            # Word document download
+            st.download_button(
+                label="📥 Descargar como Word",
+                # Rendered only when the button is clicked
+                data=export_cache.renderer(generated_text, "docx"),
+                file_name="texto_generado.docx",
+                mime=DOCX_MIME,
+                on_click="ignore",
+            )
+        
+        with col2:
+            # PDF document download
+            st.download_button(
+                label="📥 Descargar como PDF",
+                data=export_cache.renderer(generated_text, "pdf"),
+                file_name="texto_generado.pdf",
+                mime=PDF_MIME,
+                on_click="ignore",
+            )
+
+        # Add feedback section
+        st.markdown("---")
+        feedback_form(generated_text)
+
+# Feedback history; filters, paging and row selection rerun only this fragment
+@st.fragment
+@measured_fragment
+def feedback_history():
+    from redaccion.storage import feedback_queries
 
-with tab2:
     st.markdown("### Historial de Feedback")
     
-    # Get and display feedback history
-    feedback_df = get_feedback_history()
+    try:
+        filter_options = run_feedback_query(feedback_queries.fetch_filter_options)
+    except Exception as e:
+        st.error(f"Error getting feedback history: {str(e)}")
+        filter_options = {"category": [], "text_type": []}
     
-    if not feedback_df.empty:
-        # Add filters
+    if filter_options["category"] or filter_options["text_type"]:
+        # Add filters (applied in SQL)
         col1, col2 = st.columns(2)
         with col1:
             selected_category_filter = st.multiselect(
                 "Filtrar por categoría",
-                options=feedback_df['category'].unique(),
+                options=filter_options["category"],
                 default=[]
             )
         with col2:
             selected_type_filter = st.multiselect(
                 "Filtrar por tipo de texto",
-                options=feedback_df['text_type'].unique(),
+                options=filter_options["text_type"],
                 default=[]
             )
+        history_filters = feedback_queries.HistoryFilters(selected_category_filter, selected_type_filter)
         
-        # Apply filters
-        if selected_category_filter:
-            feedback_df = feedback_df[feedback_df['category'].isin(selected_category_filter)]
-        if selected_type_filter:
-            feedback_df = feedback_df[feedback_df['text_type'].isin(selected_type_filter)]
+        # Start again from the first page when the filters change
+        if st.session_state.get("history_filters") != history_filters:
+            st.session_state.history_filters = history_filters
+            st.session_state.history_cursors = [None]
         
         # Display statistics
+        summary = run_feedback_query(feedback_queries.fetch_summary, history_filters)
         st.markdown("#### Estadísticas")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Calificación Promedio", f"{feedback_df['rating'].mean():.1f} ⭐")
+            st.metric("Calificación Promedio", f"{summary['avg_rating'] or 0:.1f} ⭐")
         with col2:
-            st.metric("Total de Feedback", len(feedback_df))
+            st.metric("Total de Feedback", summary["total"])
         with col3:
-            st.metric("Tipos de Texto", len(feedback_df['text_type'].unique()))
+            st.metric("Tipos de Texto", summary["text_types"])
         
         # Add analytics section
         st.markdown("### Análisis de Feedback")
-        analytics_df = get_feedback_analytics()
+        analytics = get_feedback_analytics(history_filters)
         
-        if not analytics_df.empty:
+        if not analytics["trend"].empty:
             # Time series of ratings
             st.markdown("#### Tendencia de Calificaciones")
-            st.line_chart(analytics_df.set_index('date')['avg_rating'])
+            st.line_chart(analytics["trend"].set_index('date')['avg_rating'])
             
             # Category performance
             st.markdown("#### Rendimiento por Categoría")
-            category_performance = analytics_df.groupby('category')['avg_rating'].mean()
-            st.bar_chart(category_performance)
+            st.bar_chart(analytics["category"].set_index('category')['avg_rating'])
             
             # Text type performance
             st.markdown("#### Rendimiento por Tipo de Texto")
-            type_performance = analytics_df.groupby('text_type')['avg_rating'].mean()
-            st.bar_chart(type_performance)
+            st.bar_chart(analytics["text_type"].set_index('text_type')['avg_rating'])
         
-        # Display feedback table
+        # Display one page of feedback (without the full texts)
         st.markdown("#### Detalles del Feedback")
-        st.dataframe(
-            feedback_df,
+        cursors = st.session_state.history_cursors
+        page = run_feedback_query(feedback_queries.fetch_page, history_filters, cursor=cursors[-1])
+        history_table = st.dataframe(
+            page.rows,
+            column_order=[column for column in feedback_queries.LIST_COLUMNS if column != "id"],
             column_config={
                 "timestamp": "Fecha y Hora",
                 "rating": st.column_config.NumberColumn(
@@ -767,253 +818,145 @@ with tab2:
                 "category": "Categoría",
                 "text_type": "Tipo de Texto",
                 "length": "Longitud",
-                "sources": "Fuentes",
                 "tone": "Tono",
-                "style": "Estilo",
-                "additional_instructions": "Instrucciones Adicionales"
+                "style": "Estilo"
             },
-            hide_index=True
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="history_table"
         )
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            # Callbacks update the cursors before the fragment reruns
+            st.button("← Anteriores", disabled=len(cursors) == 1, on_click=cursors.pop)
+        with col2:
+            st.caption(f"Página {len(cursors)} · selecciona una fila para ver el texto completo")
+        with col3:
+            st.button("Siguientes →", disabled=not page.has_more, on_click=cursors.append, args=(page.next_cursor,))
+        
+        # Full text of the selected row, fetched on demand
+        selected_rows = history_table.selection.rows
+        if selected_rows and selected_rows[0] < len(page.rows):
+            detail = run_feedback_query(feedback_queries.fetch_detail, page.rows[selected_rows[0]]["id"])
+            if detail:
+                with st.expander("Texto generado", expanded=True):
+                    st.markdown(detail["generated_text"] or "")
+                    if detail["sources"]:
+                        st.caption(f"Fuentes: {detail['sources']}")
+                    if detail["additional_instructions"]:
+                        st.caption(f"Instrucciones adicionales: {detail['additional_instructions']}")
     else:
         st.info("Aún no hay feedback registrado.")
 
-with tab3:
+with tab2:
+    if tab2.open:
+        feedback_history()
+
+# Model training and metrics; its buttons rerun only this fragment
+@st.fragment
+@measured_fragment
+def model_training():
+    import plotly.graph_objects as go
+
     st.markdown("### Entrenamiento del Modelo")
     
-    if st.button("Preparar Datos de Entrenamiento"):
-        with st.spinner("Preparando datos..."):
-            if prepare_training_data():
-                st.success("Datos preparados exitosamente")
-            else:
-                st.error("Error al preparar los datos")
-    
-    if st.button("Entrenar Modelo"):
-        with st.spinner("Entrenando modelo..."):
-            model_id = train_model()
-            if model_id:
-                st.success(f"Modelo entrenado exitosamente. ID: {model_id}")
-            else:
-                st.error("Error al entrenar el modelo")
+    if not get_store().supports_training:
+        st.info("El entrenamiento del modelo solo está disponible con Snowflake (STORAGE_BACKEND=snowflake).")
+    else:
+        if st.button("Preparar Datos de Entrenamiento"):
+            with st.spinner("Preparando datos..."):
+                if prepare_training_data():
+                    st.success("Datos preparados exitosamente")
+                else:
+                    st.error("Error al preparar los datos")
+        
+        if st.button("Entrenar Modelo"):
+            with st.spinner("Entrenando modelo..."):
+                model_id = train_model()
+                if model_id:
+                    st.success(f"Modelo entrenado exitosamente. ID: {model_id}")
+                else:
+                    st.error("Error al entrenar el modelo")
     
     # Display model metrics
     st.markdown("#### Métricas del Modelo")
     try:
-        engine = get_snowflake_engine()
-        if engine:
-            # Get metrics from our custom table
-            metrics_df = pd.read_sql("""
-                SELECT 
-                    model_name,
-                    model_version,
-                    training_accuracy,
-                    validation_accuracy,
-                    last_updated
-                FROM model_metrics
-                ORDER BY last_updated DESC
-                LIMIT 1
-            """, engine)
-            
-            if not metrics_df.empty:
-                st.metric("Precisión de Entrenamiento", f"{metrics_df['training_accuracy'].iloc[0]:.2%}")
-                st.metric("Precisión de Validación", f"{metrics_df['validation_accuracy'].iloc[0]:.2%}")
-                st.metric("Última Actualización", str(metrics_df['last_updated'].iloc[0]))
-            else:
-                st.info("No hay métricas disponibles para el modelo.")
+        model_metrics = get_query_cache().get(
+            ("latest_model_metrics",), get_store().latest_model_metrics, tags=(MODEL_METRICS,)
+        )
+        if model_metrics:
+            st.metric("Precisión de Entrenamiento", f"{model_metrics['training_accuracy']:.2%}")
+            st.metric("Precisión de Validación", f"{model_metrics['validation_accuracy']:.2%}")
+            st.metric("Última Actualización", str(model_metrics['last_updated']))
+        else:
+            st.info("No hay métricas disponibles para el modelo.")
     except Exception as e:
         st.error(f"Error al obtener métricas: {str(e)}")
     
     # Model performance visualization
     st.markdown("#### Rendimiento del Modelo")
     try:
-        engine = get_snowflake_engine()
-        if engine:
-            # Get performance data using a simpler query
-            performance_df = pd.read_sql("""
-                SELECT 
-                    DATE(timestamp) as date,
-                    AVG(rating) as avg_rating,
-                    COUNT(*) as prediction_count
-                FROM feedback
-                WHERE timestamp >= DATEADD(day, -30, CURRENT_TIMESTAMP())
-                GROUP BY DATE(timestamp)
-                ORDER BY date
-            """, engine)
-            
-            if not performance_df.empty:
-                # Create a simple line chart using plotly
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=performance_df['date'],
-                    y=performance_df['avg_rating'],
-                    mode='lines+markers',
-                    name='Calificación Promedio'
-                ))
-                fig.update_layout(
-                    title='Tendencia de Calificaciones',
-                    xaxis_title='Fecha',
-                    yaxis_title='Calificación Promedio',
-                    hovermode='x'
-                )
-                st.plotly_chart(fig)
-                
-                # Display summary statistics
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Calificación Promedio", f"{performance_df['avg_rating'].mean():.2f}")
-                with col2:
-                    st.metric("Total de Predicciones", f"{performance_df['prediction_count'].sum():,}")
-            else:
-                st.info("No hay datos de rendimiento disponibles para el período seleccionado.")
-    except Exception as e:
-        st.error(f"Error al obtener datos de rendimiento: {str(e)}")
+        from datetime import date, timedelta
 
-# Function to prepare training data in Snowflake
-def prepare_training_data():
-    try:
-        conn = get_snowflake_connection()
-        if conn:
-            # Create a view for training data
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE OR REPLACE VIEW training_data_view AS
-                SELECT 
-                    generated_text,
-                    category,
-                    subcategory,
-                    text_type,
-                    length,
-                    rating,
-                    comments,
-                    user_prompt,
-                    timestamp
-                FROM feedback
-                WHERE rating >= 4  -- Only use high-quality examples
-            """)
-            
-            # Create feature engineering view
-            cur.execute("""
-                CREATE OR REPLACE VIEW ml_features AS
-                SELECT 
-                    generated_text,
-                    category,
-                    subcategory,
-                    text_type,
-                    length,
-                    rating,
-                    -- Extract key features from comments
-                    REGEXP_SUBSTR(comments, 'estructura|clarity|relevance|sources|adaptation', 1, 1) as key_feature,
-                    -- Calculate text metrics
-                    LENGTH(generated_text) as text_length,
-                    -- Create category embeddings
-                    HASH(category) as category_embedding,
-                    HASH(subcategory) as subcategory_embedding,
-                    HASH(text_type) as text_type_embedding
-                FROM training_data_view
-            """)
+        # Last 30 days from the daily rollup
+        performance_df = get_feedback_analytics(since=date.today() - timedelta(days=30))["trend"]
+        if not performance_df.empty:
+            # Create a simple line chart using plotly
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=performance_df['date'],
+                y=performance_df['avg_rating'],
+                mode='lines+markers',
+                name='Calificación Promedio'
+            ))
+            fig.update_layout(
+                title='Tendencia de Calificaciones',
+                xaxis_title='Fecha',
+                yaxis_title='Calificación Promedio',
+                hovermode='x'
+            )
+            st.plotly_chart(fig)
             
-            conn.commit()
-            conn.close()
-            return True
-    except Exception as e:
-        st.error(f"Error preparing training data: {str(e)}")
-        return False
-
-def train_model():
-    try:
-        conn = get_snowflake_connection()
-        if conn:
-            cur = conn.cursor()
-            # Create training procedure
-            cur.execute("""
-                CREATE OR REPLACE PROCEDURE train_text_model()
-                RETURNS STRING
-                LANGUAGE SQL
-                AS
-                $$
-                DECLARE
-                    model_id STRING;
-                BEGIN
-                    -- Create and train the model
-                    CREATE OR REPLACE MODEL text_generation_model
-                    AS SELECT 
-                        generated_text,
-                        category,
-                        subcategory,
-                        text_type,
-                        length,
-                        rating,
-                        key_feature,
-                        text_length,
-                        category_embedding,
-                        subcategory_embedding,
-                        text_type_embedding
-                    FROM ml_features
-                    WHERE rating >= 4;
-                    -- Get model ID
-                    SELECT model_id INTO :model_id
-                    FROM TABLE(INFORMATION_SCHEMA.MODELS)
-                    WHERE model_name = 'text_generation_model';
-                    -- Insert metrics into model_metrics table
-                    INSERT INTO model_metrics (
-                        model_name,
-                        model_version,
-                        training_accuracy,
-                        validation_accuracy
-                    )
-                    SELECT 
-                        'text_generation_model',
-                        model_id,
-                        0.85,  -- Example accuracy values
-                        0.82
-                    FROM TABLE(INFORMATION_SCHEMA.MODELS)
-                    WHERE model_name = 'text_generation_model';
-                    RETURN model_id;
-                END;
-                $$
-            """)
-            # Execute training
-            cur.execute("CALL train_text_model()")
-            model_id = cur.fetchone()[0]
-            conn.close()
-            return model_id
+            # Display summary statistics
+            # Weighted by the number of ratings per day
+            total_ratings = performance_df['feedback_count'].sum()
+            weighted_rating = (performance_df['avg_rating'] * performance_df['feedback_count']).sum() / total_ratings
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Calificación Promedio", f"{weighted_rating:.2f}")
+            with col2:
+                st.metric("Total de Predicciones", f"{int(total_ratings):,}")
+        else:
+            st.info("No hay datos de rendimiento disponibles para el período seleccionado.")
     except Exception as e:
-        st.error(f"Error training model: {str(e)}")
-        return None
+        st.error(f"Error al obtener datos de rendimiento: {str(e)}")
 
-# Function to get model predictions
-def get_model_predictions(category, subcategory, text_type, length):
-    try:
-        conn = get_snowflake_connection()
-        if conn:
-            cur = conn.cursor()
-            
-            # Get predictions from the model
-            cur.execute("""
-                SELECT 
-                    PREDICT(
-                        text_generation_model,
-                        :category,
-                        :subcategory,
-                        :text_type,
-                        :length
-                    ) as prediction
-            """, {
-                'category': category,
-                'subcategory': subcategory,
-                'text_type': text_type,
-                'length': length
-            })
-            
-            prediction = cur.fetchone()[0]
-            conn.close()
-            return prediction
-    except Exception as e:
-        st.error(f"Error getting predictions: {str(e)}")
-        return None
+with tab3:
+    if tab3.open:
+        model_training()
 
 # Add a sidebar button to test Snowflake connection and show current database/schema/user
 with st.sidebar:
-    if st.button("Test Snowflake Connection"):
+    with st.expander("Backends de generación"):
+        for name, backend in generation_service.router.snapshot().items():
+            if backend["requests"]:
+                st.caption(
+                    f"**{name}** ({backend['model']}): p50 {backend['p50'] or 0:.1f}s · "
+                    f"p95 {backend['p95'] or 0:.1f}s · errores {backend['error_rate']:.0%}"
+                    + (" · en pausa" if backend["cooling_down"] else "")
+                )
+            else:
+                st.caption(f"**{name}** ({backend['model']}): sin solicitudes todavía")
+            # Only backends behind a ResilientCaller have a circuit breaker
+            if "circuit" in backend:
+                st.caption(
+                    f"reintentos {backend['retries']} · circuito {backend['circuit']['state']} "
+                    f"({backend['circuit']['open_seconds']:.0f}s abierto) · "
+                    f"duplicadas {backend['hedges']} (ganadas {backend['hedges_won']})"
+                )
+    if get_store().name == "snowflake" and st.button("Test Snowflake Connection"):
         try:
             conn = get_snowflake_connection()
             if conn:
@@ -1027,3 +970,100 @@ with st.sidebar:
                 st.error("Could not establish a Snowflake connection.")
         except Exception as e:
             st.error(f"Connection failed: {e}")
+    pool = get_store().snapshot()
+    if pool.get("checkouts"):
+        st.caption(
+            f"Pool Snowflake: {pool['checkouts']} checkouts · espera media {pool['wait_avg'] * 1000:.0f} ms "
+            f"(máx. {pool['wait_max'] * 1000:.0f} ms) · {pool.get('checked_out', 0)} en uso · "
+            f"{pool['connects']} conexiones abiertas"
+        )
+    query_cache = get_query_cache().snapshot()
+    if query_cache["hits"] or query_cache["misses"]:
+        st.caption(
+            f"Caché de consultas: {query_cache['hit_rate']:.0%} aciertos · {query_cache['entries']} resultados · "
+            f"{query_cache['invalidations']} invalidaciones"
+        )
+    if generation_service.usage is not None:
+        budget = generation_service.usage.budget_status()
+        if budget["level"] == "exceeded":
+            st.error(f"Presupuesto diario agotado: US${budget['spent']:.2f} de US${budget['budget']:.2f}")
+        elif budget["level"] == "warning":
+            st.warning(f"Presupuesto diario: US${budget['spent']:.2f} de US${budget['budget']:.2f} ({budget['ratio']:.0%})")
+        with st.expander("Consumo de tokens"):
+            st.caption(
+                f"Hoy (UTC): US${budget['spent']:.2f}" + (f" de US${budget['budget']:.2f}" if budget["budget"] else "")
+            )
+            segment = st.selectbox(
+                "Últimos 30 días por",
+                USAGE_SEGMENTS,
+                format_func={
+                    "category": "Categoría", "subcategory": "Subcategoría", "text_type": "Tipo de texto",
+                    "length": "Extensión", "model": "Modelo",
+                }.get,
+                key="usage_segment",
+            )
+            from datetime import date, timedelta
+
+            since = date.today() - timedelta(days=30)
+            try:
+                usage_rows = get_query_cache().get(
+                    ("usage_by", segment, since),
+                    lambda: get_store().run(lambda conn: usage_by(conn, segment, since=since)),
+                    tags=(USAGE,),
+                )
+                st.dataframe(
+                    [
+                        {
+                            segment: row[segment],
+                            "generaciones": row["generations"],
+                            "en caché": row["cached_generations"],
+                            "tokens entrada": row["prompt_tokens"],
+                            "tokens salida": row["completion_tokens"],
+                            "US$": round(row["cost_usd"] or 0, 4),
+                            "US$/generación": round(row["cost_per_generation"] or 0, 4),
+                            "latencia media (s)": round((row["avg_latency_ms"] or 0) / 1000, 1),
+                        }
+                        for row in usage_rows
+                    ],
+                    hide_index=True,
+                )
+            except Exception as e:
+                st.caption(f"Sin datos de consumo: {str(e)}")
+    st.toggle(
+        "Perfilar ejecuciones",
+        key="profile_reruns",
+        disabled=PROFILE_RERUNS,
+        help="Muestrea cada ejecución y guarda el perfil en PROFILE_DIR (profiles/ por defecto)",
+    )
+    if rerun_profiler is not None:
+        finish_profile(rerun_profiler)
+    if st.session_state.get("last_profile"):
+        summary, path = st.session_state.last_profile
+        with st.expander("Perfil de la última ejecución"):
+            st.caption(
+                f"{summary['label']}: {summary['duration'] * 1000:.0f} ms · {summary['samples']} muestras · "
+                f"{summary['allocated_bytes'] / 1024:.0f} KiB asignados"
+                + (f" · guardado en `{path}`" if path else "")
+            )
+            st.dataframe(
+                [
+                    {
+                        "función": function["function"],
+                        "total (ms)": round(function["total_seconds"] * 1000),
+                        "propio (ms)": round(function["self_seconds"] * 1000),
+                    }
+                    for function in summary["functions"]
+                ],
+                hide_index=True,
+            )
+            if summary["allocations"]:
+                st.dataframe(
+                    [
+                        {"línea": allocation["location"], "KiB": round(allocation["size_kib"], 1),
+                         "bloques": allocation["count"]}
+                        for allocation in summary["allocations"]
+                    ],
+                    hide_index=True,
+                )
+
+metrics.finish_rerun()
@@ -0,0 +1,255 @@
+"""
+Headless batch generation from a JSONL file of requests.
+
+Each input line is a JSON object with the same fields the Streamlit form
+collects:
+
+    {"id": "nota-1", "category": "Economía", "subcategory": "Finanzas",
+     "text_type": "Nota Periodística", "length": "media",
+     "prompt": "Escribe una nota sobre ...", "sources": "..."}
+
+Results are appended to the output JSONL as they complete. Records whose id
+already has a successful result in the output file are skipped, so an
+interrupted run can simply be started again. Token usage and estimated cost
+of every generation are recorded in ``generation_usage`` like the app's
+(see redaccion.storage.usage); ``--no-usage`` skips that, e.g. against the
+mock server.
+
+Usage:
+    python batch_generate.py batch_requests.jsonl -o generated.jsonl --concurrency 8
+    python batch_generate.py batch_requests.jsonl --base-url http://127.0.0.1:8900/v1 --no-usage  # mock server
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from openai import AsyncOpenAI
+
+from redaccion.config import GenerationConfig
+from redaccion.generation.pipeline import prepare_prompt
+from redaccion.generation.prompt_builder import PromptBuilder
+from redaccion.generation.resilience import is_retryable, retry_delay
+from redaccion.generation.service import GenerationRequest, GenerationResult
+from redaccion.storage.usage import open_usage_recorder
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("category", "subcategory", "text_type", "length", "prompt")
+
+
+def record_id(record: Dict) -> str:
+    """Explicit ``id`` of the record, or a hash of its request fields."""
+    if record.get("id"):
+        return str(record["id"])
+    fields = {key: record.get(key, "") for key in REQUIRED_FIELDS + ("sources",)}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def read_records(path: str) -> List[Dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping invalid JSON on line {line_number}: {str(e)}")
+    return records
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids that already have a successful result in ``output_path``."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+class BatchGenerator:
+    """Runs request records through the generation pipeline with bounded concurrency."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        config: GenerationConfig,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 30.0,
+        usage=None,
+    ):
+        self.client = client
+        self.config = config
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # UsageRecorder for token and cost accounting, if any
+        self.usage = usage
+        self.builder = PromptBuilder(
+            config.model,
+            token_budget=config.prompt_token_budget,
+            min_example_tokens=config.min_example_tokens,
+        )
+        self.counts = {"ok": 0, "error": 0, "skipped": 0, "retries": 0}
+
+    async def generate(self, record: Dict) -> Dict:
+        """Generate one record, retrying on rate limits and server errors."""
+        result = {"id": record_id(record), "request": record, "model": self.config.model}
+        started = time.perf_counter()
+        try:
+            request = GenerationRequest.from_dict(record)
+        except ValueError as e:
+            return dict(result, status="error", error=str(e), attempts=0)
+
+        built = prepare_prompt(
+            self.config,
+            self.builder,
+            category=request.category,
+            subcategory=request.subcategory,
+            text_type=request.text_type,
+            length=request.length,
+            user_prompt=request.prompt,
+            sources=request.sources,
+        )
+        result.update(built.to_dict())
+
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.config.model,
+                    messages=built.messages,
+                )
+                break
+            except Exception as e:
+                if not is_retryable(e) or attempt > self.max_retries:
+                    return dict(
+                        result,
+                        status="error",
+                        error=f"{type(e).__name__}: {str(e)}",
+                        attempts=attempt,
+                        duration=time.perf_counter() - started,
+                    )
+                self.counts["retries"] += 1
+                delay = retry_delay(e, attempt - 1, self.backoff_base, self.backoff_cap)
+                logger.info(f"Retrying {result['id']} in {delay:.1f}s after {type(e).__name__}")
+                await asyncio.sleep(delay)
+
+        usage = getattr(response, "usage", None)
+        text = response.choices[0].message.content
+        prompt_tokens = usage.prompt_tokens if usage else None
+        completion_tokens = usage.completion_tokens if usage else None
+        if self.usage is not None:
+            stats = {
+                "model": self.config.model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_duration": time.perf_counter() - attempt_started,
+            }
+            self.usage.record(request, GenerationResult(text=text or "", stats=stats, prompt=built.to_dict()))
+        return dict(
+            result,
+            status="ok",
+            text=text,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            attempts=attempt,
+            duration=time.perf_counter() - started,
+        )
+
+    async def run(self, records: Iterable[Dict], output_path: str) -> Dict[str, int]:
+        """Generate every pending record, appending results to ``output_path``."""
+        done = completed_ids(output_path)
+        pending = []
+        for record in records:
+            if record_id(record) in done:
+                self.counts["skipped"] += 1
+            else:
+                pending.append(record)
+        logger.info(f"{len(pending)} records to generate, {self.counts['skipped']} already completed")
+
+        iterator = iter(pending)
+        with open(output_path, "a", encoding="utf-8") as out:
+            async def worker():
+                for record in iterator:
+                    result = await self.generate(record)
+                    self.counts[result["status"]] += 1
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    if result["status"] == "error":
+                        logger.warning(f"Record {result['id']} failed: {result['error']}")
+
+            await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+
+        return self.counts
+
+
+def default_output_path(input_path: str) -> str:
+    root, _ = os.path.splitext(input_path)
+    return f"{root}_generated.jsonl"
+
+
+async def main_async(args) -> Dict[str, int]:
+    config = GenerationConfig.from_env()
+    if args.model:
+        config.model = args.model
+    api_key = args.api_key or os.getenv("OPENAI_API_KEY") or ("mock" if args.base_url else None)
+    client = AsyncOpenAI(api_key=api_key, base_url=args.base_url, timeout=args.timeout, max_retries=0)
+    usage = None if args.no_usage else open_usage_recorder()
+    generator = BatchGenerator(
+        client, config, concurrency=args.concurrency, max_retries=args.max_retries, usage=usage
+    )
+    try:
+        return await generator.run(read_records(args.input), args.output or default_output_path(args.input))
+    finally:
+        await client.close()
+        if usage is not None:
+            usage.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate notes in bulk from a JSONL file of requests")
+    parser.add_argument("input", help="JSONL file with one request per line")
+    parser.add_argument("-o", "--output", help="Output JSONL (default: <input>_generated.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max requests in flight")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries on 429/5xx/connection errors")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--model", help="Override the generation model")
+    parser.add_argument("--base-url", help="Alternative API base URL (e.g. the mock server)")
+    parser.add_argument("--api-key", help="API key (default: OPENAI_API_KEY)")
+    parser.add_argument("--no-usage", action="store_true", help="Do not record token usage and cost")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts = asyncio.run(main_async(args))
+    logger.info(
+        f"Done in {time.perf_counter() - start:.1f}s: {counts['ok']} ok, {counts['error']} errors, "
+        f"{counts['skipped']} skipped, {counts['retries']} retries"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""
+Load test of one app process with concurrent editing sessions.
+
+Starts the mock chat completions server (``mock_llm_server.py``) in a
+subprocess and drives N simulated sessions of the Streamlit app in this
+process with ``streamlit.testing``, one thread per session. Storage is a
+temporary SQLite database. Every session repeats generate → download (Word
+and PDF) → feedback. The sessions share the process-wide HTTP pool, caches
+and store, as they would behind one ``streamlit run``.
+
+Sessions are grouped into editors (``--tabs`` sessions each, logged in
+with the same email), so an editor with more tabs than
+``GENERATION_JOBS_PER_USER`` runs into the per-user job limit. A rejected
+generation must show its warning and leave the page without a pending job;
+the editor then clicks again. Rejections are reported separately, and one
+that is not handled that way counts as an error.
+
+Each step is timed as the editor waits for it. ``generate`` runs from the
+accepted click until the polled generation job has attached its result, so
+it includes the wait for a worker (``GENERATION_WORKERS``). ``download``
+runs what the two download buttons serve when clicked, and ``feedback`` is
+the script run triggered by the click.
+The report has throughput, p50/p95/p99 and errors per stage, and resident
+memory per session. Failed model calls are answered by the mock with
+429/5xx and retried by the app; a stage only counts as an error when the
+editor would see one.
+
+Usage:
+    python load_test.py --sessions 8 --iterations 3
+    python load_test.py --sessions 32 --latency 2 --error-rate 0.05 --json > load_report.json
+    python load_test.py --base-url http://127.0.0.1:8900/v1       # mock server already running
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+PROMPT_LABEL = "Escribe instrucciones para generar tu nota:"
+GENERATION_ERROR = "Ocurrió un error al generar el contenido"
+# Warnings shown when the job queue turns a generation away, by JobRejected reason
+REJECTIONS = {
+    "user_limit": "Ya tienes generaciones en curso",
+    "queue_full": "Hay demasiadas generaciones en espera",
+}
+# File signatures of the downloads, by button label
+DOWNLOADS = {"📥 Descargar como Word": b"PK", "📥 Descargar como PDF": b"%PDF"}
+STAGES = ("load", "generate", "download", "feedback")
+# Seconds between polls of a running generation (the page polls every GENERATION_POLL_INTERVAL)
+POLL_INTERVAL = 0.05
+# Seconds an editor waits before clicking "Generar" again after a rejection
+RETRY_AFTER = 0.2
+TOPICS = ["el tipo de cambio", "el puerto de Veracruz", "la inflación", "el turismo en Cancún", "la energía solar"]
+
+
+def _widget(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (peak size where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values: List[float], share: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def start_mock_server(latency: float, jitter: float, error_rate: float, token_delay: float):
+    """Mock server in a subprocess on a free port; returns (process, base_url)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_llm_server.py"),
+            "--port", str(port), "--latency", str(latency), "--jitter", str(jitter),
+            "--error-rate", str(error_rate), "--token-delay", str(token_delay), "--seed", "0",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{base_url}/health", timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The mock server did not start")
+
+
+def mock_counts(base_url: str) -> Dict:
+    with urllib.request.urlopen(f"{base_url}/health", timeout=5) as response:
+        return json.load(response)
+
+
+# Identity of the session driven by the current thread; read when its script runner is created
+_session = threading.local()
+
+
+def share_test_runtime(secrets: Dict) -> None:
+    """Let several test-runner sessions run at the same time in this process.
+
+    The test runner is written for one run at a time. Each run installs a
+    mock Runtime singleton, the secrets and the ``global.appTest`` option, and
+    resets them when it ends, which would pull them out from under the other
+    sessions' runs. The secrets and option are installed once for the whole
+    test, and ``Runtime.instance()`` falls back to the last runtime installed.
+    Runs also share one script cache, so the script is compiled once, as in
+    ``streamlit run``, instead of on every run, and one media file manager,
+    which serves the download buttons.
+
+    Every test session has the same session id and user. The runners of a
+    session take its id and user from the thread driving it instead, so the
+    job limit and the download files are per session (and per editor) as
+    with real browsers.
+    """
+    import streamlit as st
+    import streamlit.testing.v1.app_test as app_test
+    import streamlit.testing.v1.local_script_runner as local_script_runner
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+    class DownloadManager(MediaFileManager):
+        def download(self, file_id: str) -> bytes:
+            """Run a download button's deferred data, as a click does, and return the file."""
+            url = self.execute_deferred(file_id)
+            return self._storage.get_file(url.rsplit("/", 1)[-1]).content
+
+    media_file_mgr = DownloadManager(MemoryMediaFileStorage("/mock/media"))
+    app_test.MediaFileManager = lambda storage: media_file_mgr
+
+    runner_init = local_script_runner.LocalScriptRunner.__init__
+
+    def init(self, *args, **kwargs):
+        runner_init(self, *args, **kwargs)
+        self._session_id = _session.id
+        self._user_info = dict(_session.user_info)
+
+    local_script_runner.LocalScriptRunner.__init__ = init
+
+    shared = Secrets()
+    shared._secrets = secrets
+    st.secrets = shared
+    config.set_option("global.appTest", True)
+
+    last = []
+
+    def instance(cls):
+        runtime = cls._instance
+        if runtime is not None:
+            last[:] = [runtime]
+            return runtime
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+
+
+class LoadRecorder:
+    """Durations and errors per stage, shared by the session threads."""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.errors: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.rejections: Dict[str, int] = {reason: 0 for reason in REJECTIONS}
+        self.cycles = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.durations[stage].append(seconds)
+            if not ok:
+                self.errors[stage] += 1
+
+    def reject(self, reason: str, handled: bool) -> None:
+        with self._lock:
+            self.rejections[reason] += 1
+            if not handled:
+                self.errors["generate"] += 1
+
+    def cycle_done(self) -> None:
+        with self._lock:
+            self.cycles += 1
+
+
+def run_session(script_path: str, index: int, iterations: int, think: float, timeout: float,
+                recorder: LoadRecorder, sessions: list, tabs: int = 1) -> None:
+    """One editor tab: open the app, then generate → download → feedback ``iterations`` times."""
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import AppTest
+
+    _session.id = f"load-test-session-{index}"
+    _session.user_info = {"email": f"editor-{index // tabs}@load-test.local", "is_logged_in": True}
+    at = AppTest.from_file(script_path, default_timeout=timeout)
+    # Kept alive until the memory is measured
+    sessions.append(at)
+
+    def rejection() -> Optional[str]:
+        for warning in at.warning:
+            for reason, message in REJECTIONS.items():
+                if message in warning.value:
+                    return reason
+        return None
+
+    def submit() -> float:
+        """Click "Generar" until the job is accepted, as an editor would after a rejection warning.
+
+        Returns when the accepted click was made.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            clicked = time.perf_counter()
+            _widget(at.button, "Generar").click().run()
+            reason = rejection()
+            if reason is None or clicked > deadline:
+                return clicked
+            recorder.reject(reason, handled="generation_job_id" not in at.session_state and not at.exception)
+            time.sleep(RETRY_AFTER)
+
+    def wait_for_job() -> None:
+        # The click only queues the job; rerun as the page's polling would until the result is attached
+        deadline = time.perf_counter() + timeout
+        while "generation_job_id" in at.session_state and time.perf_counter() < deadline:
+            time.sleep(POLL_INTERVAL)
+            at.run()
+
+    def download() -> bool:
+        buttons = {button.label: button for button in at.get("download_button")}
+        media_file_mgr = Runtime.instance().media_file_mgr
+        return all(
+            label in buttons and media_file_mgr.download(buttons[label].proto.deferred_file_id).startswith(signature)
+            for label, signature in DOWNLOADS.items()
+        )
+
+    def step(stage: str, check=None, run=None) -> bool:
+        started = time.perf_counter()
+        try:
+            (run or at.run)()
+            ok = not at.exception and (check is None or check())
+        except Exception:
+            ok = False
+        recorder.add(stage, time.perf_counter() - started, ok)
+        return ok
+
+    def generated() -> bool:
+        return (
+            "generation_job_id" not in at.session_state
+            and not at.warning
+            and not any(GENERATION_ERROR in error.value for error in at.error)
+        )
+
+    if not step("load"):
+        return
+    for iteration in range(iterations):
+        _widget(at.text_area, PROMPT_LABEL).input(
+            # Distinct opening words give distinct mock texts, so downloads are not served from the cache
+            f"Sesión {index}, versión {iteration}: escribe una nota sobre {TOPICS[(index + iteration) % len(TOPICS)]}"
+        )
+        clicked = time.perf_counter()
+        try:
+            clicked = submit()
+            wait_for_job()
+            ok = not at.exception and generated()
+        except Exception:
+            ok = False
+        recorder.add("generate", time.perf_counter() - clicked, ok)
+        if not ok:
+            continue
+        step("download", download, run=lambda: None)
+
+        _widget(at.button, "Enviar Feedback").click()
+        step("feedback", lambda: at.session_state["feedback_submitted"])
+        recorder.cycle_done()
+        if think:
+            time.sleep(think)
+
+
+def run(
+    script_path: str = "app.py",
+    sessions: int = 8,
+    iterations: int = 3,
+    tabs: int = 3,
+    think: float = 0.0,
+    latency: float = 0.5,
+    jitter: float = 0.1,
+    error_rate: float = 0.0,
+    token_delay: float = 0.0,
+    base_url: Optional[str] = None,
+    timeout: float = 120.0,
+) -> Dict:
+    """Drive ``sessions`` concurrent sessions of ``script_path`` and return the report."""
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    mock_process = None
+    if base_url is None:
+        mock_process, base_url = start_mock_server(latency, jitter, error_rate, token_delay)
+    os.environ.update(
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=os.path.join(workdir, "feedback.db"),
+        # Every run starts cold, so each generation reaches the mock server
+        GENERATION_CACHE_PATH=os.path.join(workdir, "generation_cache.db"),
+        OPENAI_BASE_URL=base_url,
+        METRICS_PORT="",
+    )
+    # The app imports the local packages from the project root
+    sys.path.insert(0, os.getcwd())
+    script_path = os.path.abspath(script_path)
+    share_test_runtime({"OPENAI": {"api_key": "load-test"}})
+
+    # The app prints to stdout; keep it for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return _run_sessions(
+                script_path, sessions, iterations, tabs, think, timeout, base_url, latency, error_rate
+            )
+        finally:
+            if mock_process is not None:
+                mock_process.terminate()
+                mock_process.wait()
+
+
+def _run_sessions(
+    script_path: str,
+    sessions: int,
+    iterations: int,
+    tabs: int,
+    think: float,
+    timeout: float,
+    base_url: str,
+    latency: float,
+    error_rate: float,
+) -> Dict:
+    """Warm up, then run the sessions in threads while sampling memory."""
+    # Imports, process-wide resources and the schema are paid once, before the baseline
+    warmup = LoadRecorder()
+    run_session(script_path, -1, 0, 0.0, timeout, warmup, [])
+    if warmup.errors["load"]:
+        raise RuntimeError("The app failed to load; run it once with streamlit to see the error")
+    mock_before = mock_counts(base_url)
+    baseline = _rss_bytes()
+
+    recorder = LoadRecorder()
+    alive: list = []
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(0.2):
+            peak[0] = max(peak[0], _rss_bytes())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    threads = [
+        threading.Thread(
+            target=run_session, args=(script_path, index, iterations, think, timeout, recorder, alive, tabs),
+            name=f"load-session-{index}", daemon=True,
+        )
+        for index in range(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    end = _rss_bytes()
+    peak[0] = max(peak[0], end)
+    mock_after = mock_counts(base_url)
+
+    generations = len(recorder.durations["generate"]) - recorder.errors["generate"]
+    return {
+        "script": script_path,
+        "sessions": sessions,
+        "iterations": iterations,
+        "tabs_per_editor": tabs,
+        "think_seconds": think,
+        "mock": {
+            "base_url": base_url,
+            "latency": latency,
+            "error_rate": error_rate,
+            "requests": mock_after["requests"] - mock_before["requests"],
+            "errors": mock_after["errors"] - mock_before["errors"],
+        },
+        "duration_seconds": elapsed,
+        "throughput": {
+            "cycles_per_second": recorder.cycles / elapsed,
+            "generations_per_second": generations / elapsed,
+        },
+        "stages": {
+            stage: {
+                "count": len(durations),
+                "errors": recorder.errors[stage],
+                "mean": sum(durations) / len(durations) if durations else None,
+                "p50": percentile(durations, 0.50),
+                "p95": percentile(durations, 0.95),
+                "p99": percentile(durations, 0.99),
+            }
+            for stage, durations in recorder.durations.items()
+        },
+        "rejections": recorder.rejections,
+        "memory": {
+            "baseline_mb": baseline / 2 ** 20,
+            "peak_mb": peak[0] / 2 ** 20,
+            "end_mb": end / 2 ** 20,
+            "per_session_mb": (end - baseline) / 2 ** 20 / sessions,
+        },
+    }
+
+
+def print_report(report: Dict) -> None:
+    mock = report["mock"]
+    print(
+        f"{report['sessions']} sessions × {report['iterations']} iterations of {report['script']} "
+        f"(mock latency {mock['latency']}s, error rate {mock['error_rate']:.0%}) in {report['duration_seconds']:.1f}s"
+    )
+    print(
+        f"throughput: {report['throughput']['cycles_per_second']:.2f} cycles/s, "
+        f"{report['throughput']['generations_per_second']:.2f} generations/s; "
+        f"mock requests {mock['requests']} ({mock['errors']} failed and retried)"
+    )
+    print(f"{'stage':<10} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, result in report["stages"].items():
+        cells = [f"{result[key]:>8.3f}" if result[key] is not None else f"{'-':>8}" for key in ("p50", "p95", "p99")]
+        print(f"{stage:<10} {result['count']:>6} {result['errors']:>6} {' '.join(cells)}")
+    rejections = report["rejections"]
+    print(
+        f"rejected generations ({report['tabs_per_editor']} tabs per editor): "
+        f"{rejections['user_limit']} at the per-user limit, {rejections['queue_full']} with the queue full"
+    )
+    memory = report["memory"]
+    print(
+        f"memory: baseline {memory['baseline_mb']:.0f} MB, peak {memory['peak_mb']:.0f} MB, "
+        f"{memory['per_session_mb']:.1f} MB per session"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test concurrent editing sessions against a mock model server")
+    parser.add_argument("script", nargs="?", default="app.py", help="Streamlit script to drive")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="generate → download → feedback cycles per session")
+    parser.add_argument(
+        "--tabs", type=int, default=3,
+        help="Sessions per editor; they share the editor's GENERATION_JOBS_PER_USER limit",
+    )
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds each session waits between cycles")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean mock response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform mock latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock responses that are 429/5xx")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Delay between streamed tokens in seconds")
+    parser.add_argument("--base-url", default=None, help="Use a running mock server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed for one script run")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.script,
+        sessions=args.sessions,
+        iterations=args.iterations,
+        tabs=args.tabs,
+        think=args.think,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        token_delay=args.token_delay,
+        base_url=args.base_url,
+        timeout=args.timeout,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    failed = sum(result["errors"] for result in report["stages"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Local mock of the OpenAI chat completions endpoint for batch and load tests.
+
+Usage:
+    python mock_llm_server.py --port 8900 --latency 0.5 --error-rate 0.05
+
+Point clients at it with base_url="http://127.0.0.1:8900/v1".
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOREM = (
+    "El gobierno federal anunció nuevas medidas económicas para impulsar el comercio y la inversión "
+    "en las principales regiones del país según datos oficiales publicados esta semana"
+).split()
+
+WORDS_PER_LENGTH = {"corta": 200, "media": 400, "larga": 650, "muy_larga": 900}
+
+
+class MockSettings:
+    """Behaviour of the mock server, shared by all handler threads."""
+
+    def __init__(self, latency=0.2, jitter=0.1, error_rate=0.0, token_delay=0.0, words=120, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_delay = token_delay
+        self.words = words
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self):
+        with self.lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def sample_error(self):
+        with self.lock:
+            self.requests += 1
+            if self.random.random() < self.error_rate:
+                self.errors += 1
+                return self.random.choice([429, 500, 503])
+        return None
+
+
+def _completion_text(body, words):
+    """Deterministic-ish article whose size follows the requested length."""
+    system = " ".join(m.get("content", "") for m in body.get("messages", []) if m.get("role") == "system")
+    for key, count in WORDS_PER_LENGTH.items():
+        if key.replace("_", " ") in system.lower():
+            words = count
+    user = next((m.get("content", "") for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+    title = " ".join(user.split()[:8]) or "Nota generada"
+    body_words = [LOREM[i % len(LOREM)] for i in range(words)]
+    paragraphs = [" ".join(body_words[i:i + 60]).capitalize() + "." for i in range(0, len(body_words), 60)]
+    return f"# {title}\n\n" + "\n\n".join(paragraphs)
+
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if status == 429:
+                self.send_header("Retry-After", "0.1")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") in ("/health", "/v1/health"):
+                self._send_json(200, {"status": "ok", "requests": settings.requests, "errors": settings.errors})
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            time.sleep(settings.sample_latency())
+            status = settings.sample_error()
+            if status is not None:
+                self._send_json(status, {"error": {"message": f"Mock error {status}", "type": "mock_error"}})
+                return
+
+            n = int(body.get("n", 1) or 1)
+            texts = [_completion_text(body, settings.words) for _ in range(n)]
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            completion_tokens = sum(len(text) for text in texts) // 4
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = body.get("model", "mock")
+            created = int(time.time())
+
+            if not body.get("stream"):
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                        for i, text in enumerate(texts)
+                    ],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def send_chunk(choices, chunk_usage=None):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": choices,
+                }
+                if chunk_usage is not None:
+                    payload["usage"] = chunk_usage
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                for i, text in enumerate(texts):
+                    for word in text.split(" "):
+                        send_chunk([{"index": i, "delta": {"content": word + " "}, "finish_reason": None}])
+                        if settings.token_delay:
+                            time.sleep(settings.token_delay)
+                    send_chunk([{"index": i, "delta": {}, "finish_reason": "stop"}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    send_chunk([], usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+
+    return Handler
+
+
+def start_mock_server(host="127.0.0.1", port=0, **settings_kwargs):
+    """Start the server in a daemon thread. Returns (server, settings, base_url)."""
+    settings = MockSettings(**settings_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(settings))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, settings, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Delay between streamed tokens in seconds")
+    parser.add_argument("--words", type=int, default=120, help="Words per completion when no length is given")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        token_delay=args.token_delay,
+        words=args.words,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Runtime configuration for content generation.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_LATENCY_SLO = {"corta": 20.0, "media": 40.0, "larga": 60.0, "muy_larga": 90.0}
+
+
+def _env_list(name: str, default: List[str]) -> List[str]:
+    value = os.getenv(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@dataclass
+class GenerationConfig:
+    """Settings for the generation path."""
+
+    # Model
+    model: str = "gpt-4-turbo-preview"
+
+    # Prompt assembly
+    prompt_token_budget: int = 6000  # Max tokens for all prompt messages, examples included
+    max_examples: int = 3
+    min_example_tokens: int = 150  # Examples that would be truncated below this are dropped
+
+    # API client
+    api_base_url: Optional[str] = None  # e.g. a local mock server
+    request_timeout: float = 120.0  # Seconds
+    max_connections: int = 100  # HTTP connection pool size per process
+
+    # Resilience
+    request_deadline: float = 180.0  # Seconds for a request including all retries
+    max_retries: int = 3  # Retries on 429/5xx/timeouts/connection errors
+    backoff_base: float = 1.0  # Seconds; full-jitter exponential backoff
+    backoff_cap: float = 20.0
+    circuit_failure_threshold: int = 5  # Consecutive failures that open the circuit
+    circuit_reset_timeout: float = 30.0  # Seconds before a probe request is let through
+    hedge_requests: bool = False  # Duplicate blocking requests slower than the recent p95
+    hedge_min_samples: int = 20  # Successful calls needed before hedging starts
+
+    # Local fine-tuned model (disabled unless a path or server URL is set)
+    local_model_path: Optional[str] = None  # e.g. models/<base-model>-news_generator
+    local_model_base_url: Optional[str] = None  # OpenAI-compatible server hosting the model
+    local_model_cost: float = 0.1  # Relative to OpenAI = 1.0
+    local_text_types: List[str] = field(default_factory=lambda: ["Nota Periodística"])
+    local_lengths: List[str] = field(default_factory=lambda: ["corta", "media"])
+
+    # Backend routing
+    latency_slo: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LATENCY_SLO))  # p95 seconds per length
+    backend_failure_threshold: int = 3  # Consecutive failures before a backend is skipped
+    backend_cooldown: float = 30.0  # Seconds a failing backend is skipped
+
+    def __post_init__(self):
+        """Validate configuration after initialization."""
+        if self.prompt_token_budget <= 0:
+            raise ValueError("Prompt token budget must be positive")
+        if self.max_examples < 0:
+            raise ValueError("Max examples must be zero or positive")
+        if self.request_deadline <= 0 or self.request_timeout <= 0:
+            raise ValueError("Timeouts must be positive")
+        if self.max_retries < 0:
+            raise ValueError("Max retries must be zero or positive")
+        if any(seconds <= 0 for seconds in self.latency_slo.values()):
+            raise ValueError("Latency SLOs must be positive")
+
+    @classmethod
+    def from_env(cls) -> 'GenerationConfig':
+        """Create configuration from environment variables."""
+        return cls(
+            model=os.getenv("GENERATION_MODEL", "gpt-4-turbo-preview"),
+            prompt_token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "6000")),
+            max_examples=int(os.getenv("MAX_EXAMPLES", "3")),
+            min_example_tokens=int(os.getenv("MIN_EXAMPLE_TOKENS", "150")),
+            api_base_url=os.getenv("OPENAI_BASE_URL") or None,
+            request_timeout=float(os.getenv("OPENAI_TIMEOUT", "120")),
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            request_deadline=float(os.getenv("OPENAI_DEADLINE", "180")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("OPENAI_BACKOFF_BASE", "1")),
+            backoff_cap=float(os.getenv("OPENAI_BACKOFF_CAP", "20")),
+            circuit_failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            circuit_reset_timeout=float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30")),
+            hedge_requests=os.getenv("HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes"),
+            hedge_min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+            local_model_path=os.getenv("LOCAL_MODEL_PATH") or None,
+            local_model_base_url=os.getenv("LOCAL_MODEL_BASE_URL") or None,
+            local_model_cost=float(os.getenv("LOCAL_MODEL_COST", "0.1")),
+            local_text_types=_env_list("LOCAL_MODEL_TEXT_TYPES", ["Nota Periodística"]),
+            local_lengths=_env_list("LOCAL_MODEL_LENGTHS", ["corta", "media"]),
+            latency_slo={
+                length: float(os.getenv(f"LATENCY_SLO_{length.upper()}", str(seconds)))
+                for length, seconds in DEFAULT_LATENCY_SLO.items()
+            },
+            backend_failure_threshold=int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3")),
+            backend_cooldown=float(os.getenv("BACKEND_COOLDOWN", "30")),
+        )
+
+
+@dataclass
+class WarehouseConfig:
+    """Connection pool settings for the Snowflake warehouse."""
+
+    pool_size: int = 5  # Connections kept open per process
+    max_overflow: int = 5  # Extra connections allowed under load
+    pool_timeout: float = 30.0  # Seconds to wait for a free connection
+    pool_recycle: int = 3600  # Seconds; well below the Snowflake session token lifetime
+    pool_pre_ping: bool = True  # Check connections before handing them out
+
+    def __post_init__(self):
+        """Validate configuration after initialization."""
+        if self.pool_size <= 0:
+            raise ValueError("Pool size must be positive")
+        if self.max_overflow < 0:
+            raise ValueError("Max overflow must be zero or positive")
+
+    @classmethod
+    def from_env(cls) -> 'WarehouseConfig':
+        """Create configuration from environment variables."""
+        return cls(
+            pool_size=int(os.getenv("SNOWFLAKE_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("SNOWFLAKE_MAX_OVERFLOW", "5")),
+            pool_timeout=float(os.getenv("SNOWFLAKE_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("SNOWFLAKE_POOL_RECYCLE", "3600")),
+            pool_pre_ping=os.getenv("SNOWFLAKE_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        )
+
+
+STORAGE_BACKENDS = ("snowflake", "sqlite")
+
+
+@dataclass
+class StorageConfig:
+    """Where feedback, analytics and model metrics are stored."""
+
+    backend: str = "snowflake"  # "snowflake" or "sqlite"
+    sqlite_path: str = "feedback.db"  # Database file for the sqlite backend
+
+    def __post_init__(self):
+        """Validate configuration after initialization."""
+        if self.backend not in STORAGE_BACKENDS:
+            raise ValueError(f"Storage backend must be one of: {', '.join(STORAGE_BACKENDS)}")
+
+    @classmethod
+    def from_env(cls) -> 'StorageConfig':
+        """Create configuration from environment variables."""
+        return cls(
+            backend=os.getenv("STORAGE_BACKEND", "snowflake").lower(),
+            sqlite_path=os.getenv("SQLITE_PATH", "feedback.db"),
+        )
+
+
+# USD per million (prompt, completion) tokens; models match on the longest prefix.
+# Models not listed (e.g. the local fine-tuned model) are costed at zero.
+DEFAULT_MODEL_PRICES = {
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4-0125-preview": (10.0, 30.0),
+    "gpt-4-1106-preview": (10.0, 30.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "ft:gpt-3.5-turbo": (3.0, 6.0),
+}
+
+
+@dataclass
+class UsageConfig:
+    """Token usage accounting and the daily cost budget."""
+
+    daily_budget: Optional[float] = None  # USD per UTC day; no alarms when unset
+    alert_ratio: float = 0.8  # Share of the budget that raises the first alarm
+    batch_size: int = 100  # Usage rows per write
+    flush_interval: float = 10.0  # Seconds between writes
+    prices: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(DEFAULT_MODEL_PRICES))
+
+    def __post_init__(self):
+        """Validate configuration after initialization."""
+        if self.daily_budget is not None and self.daily_budget <= 0:
+            raise ValueError("Daily budget must be positive")
+        if not 0 < self.alert_ratio <= 1:
+            raise ValueError("Alert ratio must be between 0 and 1")
+        if self.batch_size <= 0 or self.flush_interval <= 0:
+            raise ValueError("Batch size and flush interval must be positive")
+
+    @classmethod
+    def from_env(cls) -> 'UsageConfig':
+        """Create configuration from environment variables.
+
+        ``MODEL_PRICES`` is a JSON object such as ``{"gpt-4o": [2.5, 10]}`` that
+        adds to or overrides the default prices.
+        """
+        budget = os.getenv("DAILY_BUDGET_USD")
+        prices = dict(DEFAULT_MODEL_PRICES)
+        prices.update({
+            model: (float(prompt), float(completion))
+            for model, (prompt, completion) in json.loads(os.getenv("MODEL_PRICES") or "{}").items()
+        })
+        return cls(
+            daily_budget=float(budget) if budget else None,
+            alert_ratio=float(os.getenv("BUDGET_ALERT_RATIO", "0.8")),
+            batch_size=int(os.getenv("USAGE_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("USAGE_FLUSH_INTERVAL", "10")),
+            prices=prices,
+        )
+
+
+@dataclass
+class JobsConfig:
+    """Worker pool that runs generations off the Streamlit script thread."""
+
+    workers: int = 4  # Generations running at once in this process
+    queue_size: int = 32  # Jobs waiting for a worker; new jobs are rejected beyond this
+    per_user: int = 2  # Queued plus running jobs per user
+    retention: float = 600.0  # Seconds a finished job is kept for its session to pick it up
+
+    def __post_init__(self):
+        """Validate configuration after initialization."""
+        if self.workers <= 0 or self.per_user <= 0:
+            raise ValueError("Workers and jobs per user must be positive")
+        if self.queue_size < 0:
+            raise ValueError("Queue size cannot be negative")
+        if self.retention <= 0:
+            raise ValueError("Retention must be positive")
+
+    @classmethod
+    def from_env(cls) -> 'JobsConfig':
+        """Create configuration from environment variables."""
+        return cls(
+            workers=int(os.getenv("GENERATION_WORKERS", "4")),
+            queue_size=int(os.getenv("GENERATION_QUEUE_SIZE", "32")),
+            per_user=int(os.getenv("GENERATION_JOBS_PER_USER", "2")),
+            retention=float(os.getenv("GENERATION_JOB_RETENTION", "600")),
+        )
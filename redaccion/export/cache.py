@@ -0,0 +1,102 @@
+"""
+Bounded in-memory cache of exported documents.
+
+Documents are rendered only when a download is requested and kept by text
+hash and format, so repeated downloads and Streamlit reruns of the same text
+do not render it again.
+
+Usage:
+    from redaccion.export.cache import get_export_cache
+
+    content = get_export_cache().render(text, "pdf")
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+from redaccion.monitoring.metrics import record_cache, timed
+
+logger = logging.getLogger(__name__)
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PDF_MIME = "application/pdf"
+
+# Format -> MIME type
+EXPORT_FORMATS: Dict[str, str] = {"docx": DOCX_MIME, "pdf": PDF_MIME}
+
+
+def render_document(text: str, export_format: str) -> bytes:
+    # python-docx and fpdf are only loaded once something is exported
+    from redaccion.export import documents
+
+    if export_format == "docx":
+        return documents.docx_bytes(text)
+    return documents.pdf_bytes(text)
+
+
+class ExportCache:
+    """LRU of rendered documents bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, export_format: str) -> Tuple[str, str]:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest(), export_format
+
+    def render(self, text: str, export_format: str) -> bytes:
+        """Rendered ``text`` in ``export_format`` ("docx" or "pdf")."""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        key = self.key(text, export_format)
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache("export", True)
+                return content
+            self.misses += 1
+        record_cache("export", False)
+
+        with timed(f"export_{export_format}"):
+            content = render_document(text, export_format)
+
+        with self._lock:
+            if key not in self._entries and len(content) <= self.max_bytes:
+                self._entries[key] = content
+                self._size += len(content)
+                while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return content
+
+    def renderer(self, text: str, export_format: str) -> Callable[[], bytes]:
+        """Zero-argument callable rendering on demand (for deferred downloads)."""
+        return lambda: self.render(text, export_format)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+_export_cache = None
+_export_cache_lock = threading.Lock()
+
+
+def get_export_cache() -> ExportCache:
+    """Process-wide export cache."""
+    global _export_cache
+    with _export_cache_lock:
+        if _export_cache is None:
+            _export_cache = ExportCache()
+        return _export_cache
@@ -0,0 +1,67 @@
+"""
+Word and PDF rendering of generated texts.
+
+Rendering is done fully in memory. DOCX output reuses one parsed template
+document. PDFs use the built-in core fonts, so there are no font files to load.
+"""
+import io
+import threading
+from functools import lru_cache
+
+from docx import Document
+from docx.oxml.ns import qn
+from fpdf import FPDF
+
+# Latin-1 stand-ins for common typographic characters
+PDF_SUBSTITUTIONS = str.maketrans({
+    "–": "-", "—": "-", "‘": "'", "’": "'", "“": '"', "”": '"', "…": "...", "•": "-", "\u00a0": " ",
+})
+
+
+def create_pdf_doc(text):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    # Replace characters the core fonts cannot encode (dashes, curly quotes...)
+    safe_text = text.translate(PDF_SUBSTITUTIONS).encode("latin-1", "replace").decode("latin-1")
+    # Split text into lines that fit the page width
+    lines = safe_text.split('\n')
+    for line in lines:
+        pdf.multi_cell(0, 10, txt=line)
+    return pdf
+
+
+class DocxTemplate:
+    """A parsed blank document whose body is refilled for each render."""
+
+    def __init__(self):
+        self._document = Document()
+        self._lock = threading.Lock()
+
+    def render(self, text: str) -> bytes:
+        with self._lock:
+            body = self._document.element.body
+            for child in list(body):
+                if child.tag != qn("w:sectPr"):
+                    body.remove(child)
+            self._document.add_paragraph(text)
+            buffer = io.BytesIO()
+            self._document.save(buffer)
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def docx_template() -> DocxTemplate:
+    return DocxTemplate()
+
+
+def docx_bytes(text: str) -> bytes:
+    """Render ``text`` as a .docx file in memory."""
+    return docx_template().render(text)
+
+
+def pdf_bytes(text: str) -> bytes:
+    """Render ``text`` as a PDF in memory."""
+    output = create_pdf_doc(text).output(dest="S")
+    # PyFPDF returns a latin-1 str, fpdf2 returns a bytearray
+    return output.encode("latin-1") if isinstance(output, str) else bytes(output)
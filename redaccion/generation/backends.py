@@ -0,0 +1,401 @@
+"""
+Pluggable generation backends and a latency-aware router.
+
+Each request is sent to the cheapest backend that accepts its text type and
+length and whose recent p95 latency meets the SLO for that length. Backends
+that keep failing are skipped for a cooldown period and the next one is
+tried, so an outage or a slow backend does not block generation.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from redaccion.config import GenerationConfig
+from redaccion.generation.resilience import (
+    GenerationCancelled,
+    ResilientCaller,
+    check_cancelled,
+    get_circuit_breaker,
+)
+from redaccion.generation.streaming import (
+    GenerationStats,
+    complete_chat,
+    complete_chat_candidates,
+    stream_chat_completion,
+)
+
+logger = logging.getLogger(__name__)
+
+# Generated tokens allowed for each length key on local models
+LOCAL_MAX_NEW_TOKENS = {"corta": 512, "media": 850, "larga": 1300, "muy_larga": 2000}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (q in [0, 100])."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class LatencyTracker:
+    """Rolling window of request outcomes for one backend."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, length: str, duration: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((length, duration, ok))
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def record_alive(self) -> None:
+        """The backend answered, without a duration worth sampling (e.g. a stream closed early)."""
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def durations(self, length: Optional[str] = None) -> List[float]:
+        with self._lock:
+            return [d for l, d, ok in self._samples if ok and (length is None or l == length)]
+
+    def p50(self, length: Optional[str] = None) -> Optional[float]:
+        return percentile(self.durations(length), 50)
+
+    def p95(self, length: Optional[str] = None) -> Optional[float]:
+        return percentile(self.durations(length), 95)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, _, ok in self._samples if not ok) / len(self._samples)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            requests = len(self._samples)
+        return {
+            "requests": requests,
+            "p50": self.p50(),
+            "p95": self.p95(),
+            "error_rate": self.error_rate(),
+            "consecutive_failures": self.consecutive_failures,
+            "cooling_down": self.open_until > time.monotonic(),
+        }
+
+
+class Backend:
+    """A way of producing chat completions."""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        cost: float,
+        text_types: Optional[Iterable[str]] = None,
+        lengths: Optional[Iterable[str]] = None,
+    ):
+        self.name = name
+        self.model = model
+        # Relative cost per request; the router prefers cheaper backends
+        self.cost = cost
+        self.text_types = set(text_types) if text_types else None
+        self.lengths = set(lengths) if lengths else None
+
+    def supports(self, text_type: str, length: str) -> bool:
+        return (self.text_types is None or text_type in self.text_types) and \
+            (self.lengths is None or length in self.lengths)
+
+    def complete(self, messages: List[Dict[str, str]], stats: GenerationStats, length: str, **params) -> str:
+        raise NotImplementedError
+
+    def complete_candidates(
+        self, messages: List[Dict[str, str]], stats: GenerationStats, n: int, length: str, **params
+    ) -> List[str]:
+        texts, started_at, first_token_at, completion_tokens = [], None, None, 0
+        for _ in range(n):
+            check_cancelled()
+            texts.append(self.complete(messages, stats, length, **params))
+            started_at = started_at or stats.started_at
+            first_token_at = first_token_at or stats.first_token_at
+            completion_tokens += stats.completion_tokens or 0
+        # Report the whole sequence of calls, like a single n-candidate request
+        stats.started_at, stats.first_token_at = started_at, first_token_at
+        stats.completion_tokens = completion_tokens
+        return texts
+
+    def stream(self, messages: List[Dict[str, str]], stats: GenerationStats, length: str, **params) -> Iterator[str]:
+        yield self.complete(messages, stats, length, **params)
+
+    def snapshot(self) -> Dict:
+        return {}
+
+
+class OpenAIBackend(Backend):
+    """OpenAI (or any OpenAI-compatible server such as vLLM)."""
+
+    def __init__(self, name: str, client, model: str, cost: float = 1.0, caller: Optional[ResilientCaller] = None, **kwargs):
+        super().__init__(name, model, cost, **kwargs)
+        self.client = client
+        self.caller = caller
+
+    def complete(self, messages, stats, length, **params):
+        if self.caller is None:
+            return complete_chat(self.client, self.model, messages, stats, **params)
+        return self.caller.call(
+            lambda attempt_stats, timeout: complete_chat(
+                self.client, self.model, messages, attempt_stats, timeout=timeout, **params
+            ),
+            stats,
+        )
+
+    def complete_candidates(self, messages, stats, n, length, **params):
+        if self.caller is None:
+            return complete_chat_candidates(self.client, self.model, messages, stats, n, **params)
+        return self.caller.call(
+            lambda attempt_stats, timeout: complete_chat_candidates(
+                self.client, self.model, messages, attempt_stats, n, timeout=timeout, **params
+            ),
+            stats,
+        )
+
+    def stream(self, messages, stats, length, **params):
+        if self.caller is None:
+            return stream_chat_completion(self.client, self.model, messages, stats, **params)
+        return self.caller.stream(
+            lambda timeout: stream_chat_completion(self.client, self.model, messages, stats, timeout=timeout, **params)
+        )
+
+    def snapshot(self) -> Dict:
+        return self.caller.snapshot() if self.caller is not None else {}
+
+
+class LocalModelBackend(Backend):
+    """The fine-tuned model loaded in-process with transformers (see inference.py)."""
+
+    def __init__(self, name: str, model_path: str, cost: float = 0.1, **kwargs):
+        super().__init__(name, model_path, cost, **kwargs)
+        self.model_path = model_path
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded is None:
+            # Heavy imports only when the local backend is actually used
+            from inference import load_model_and_tokenizer
+
+            self._loaded = load_model_and_tokenizer(self.model_path)
+        return self._loaded
+
+    @staticmethod
+    def _prompt(messages: List[Dict[str, str]]) -> str:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        user = "\n\n".join(m["content"] for m in messages if m["role"] == "user")
+        return f"{system}\n\n### Instrucción:\n{user}\n\n### Respuesta:\n"
+
+    def complete(self, messages, stats, length, **params):
+        from inference import generate_text
+
+        prompt = self._prompt(messages)
+        stats.started_at = time.perf_counter()
+        # Generation on a single local model is not thread-safe
+        with self._lock:
+            model, tokenizer, device = self._load()
+            input_tokens = len(tokenizer(prompt)["input_ids"])
+            output = generate_text(
+                model, tokenizer, prompt, device,
+                max_length=input_tokens + LOCAL_MAX_NEW_TOKENS.get(length, 850),
+            )
+        if output is None:
+            raise RuntimeError("Local model failed to generate text")
+        text = output[len(prompt):].strip() if output.startswith(prompt) else output.strip()
+        stats.finished_at = stats.first_token_at = time.perf_counter()
+        stats.text = text
+        stats.finish_reason = "stop"
+        stats.prompt_tokens = input_tokens
+        stats.completion_tokens = len(tokenizer(text)["input_ids"])
+        return text
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class BackendRouter:
+    """Routes requests to the cheapest healthy backend that meets the latency SLO."""
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        latency_slo: Dict[str, float],
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        min_samples: int = 5,
+    ):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        self.backends = backends
+        self.latency_slo = latency_slo
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.trackers = {backend.name: LatencyTracker() for backend in backends}
+
+    def _meets_slo(self, backend: Backend, length: str) -> Tuple[bool, float]:
+        tracker = self.trackers[backend.name]
+        durations = tracker.durations(length)
+        slo = self.latency_slo.get(length)
+        if slo is None or len(durations) < self.min_samples:
+            # Not enough data yet: assume it meets the SLO
+            return True, 0.0
+        p95 = percentile(durations, 95)
+        return p95 <= slo, p95
+
+    def route(self, text_type: str, length: str) -> List[Backend]:
+        """Backends to try for a request, in order."""
+        now = time.monotonic()
+        eligible = [
+            backend for backend in self.backends
+            if backend.supports(text_type, length) and self.trackers[backend.name].open_until <= now
+        ]
+        if not eligible:
+            # Everything is cooling down: try supported backends anyway rather than fail outright
+            eligible = [backend for backend in self.backends if backend.supports(text_type, length)]
+
+        within_slo, over_slo = [], []
+        for backend in eligible:
+            ok, p95 = self._meets_slo(backend, length)
+            if ok:
+                within_slo.append(backend)
+            else:
+                over_slo.append((p95, backend))
+        within_slo.sort(key=lambda backend: backend.cost)
+        over_slo.sort(key=lambda item: item[0])
+        return within_slo + [backend for _, backend in over_slo]
+
+    def _record(self, backend: Backend, length: str, started: float, ok: bool) -> None:
+        tracker = self.trackers[backend.name]
+        tracker.record(length, time.perf_counter() - started, ok)
+        if not ok and tracker.consecutive_failures >= self.failure_threshold:
+            tracker.open_until = time.monotonic() + self.cooldown
+            logger.warning(f"Backend {backend.name} failing, skipping it for {self.cooldown:.0f}s")
+
+    def _call(self, text_type: str, length: str, stats: GenerationStats, call):
+        last_error = None
+        for backend in self.route(text_type, length):
+            started = time.perf_counter()
+            check_cancelled()
+            stats.model, stats.backend = backend.model, backend.name
+            try:
+                result = call(backend)
+            except GenerationCancelled:
+                # Not the backend's fault, and no other backend should be tried
+                raise
+            except Exception as e:
+                self._record(backend, length, started, ok=False)
+                logger.warning(f"Backend {backend.name} failed, trying next: {str(e)}")
+                last_error = e
+                continue
+            self._record(backend, length, started, ok=True)
+            return result
+        raise NoBackendAvailable(f"No backend could serve the request: {last_error}")
+
+    def complete(self, text_type, length, messages, stats, **params) -> str:
+        return self._call(text_type, length, stats, lambda b: b.complete(messages, stats, length, **params))
+
+    def complete_candidates(self, text_type, length, messages, stats, n, **params) -> List[str]:
+        return self._call(
+            text_type, length, stats, lambda b: b.complete_candidates(messages, stats, n, length, **params)
+        )
+
+    def stream(self, text_type, length, messages, stats, **params) -> Iterator[str]:
+        """Stream from the first backend that starts producing text.
+
+        Failover is only possible before the first chunk has been yielded.
+        """
+        last_error = None
+        for backend in self.route(text_type, length):
+            check_cancelled()
+            started = time.perf_counter()
+            stats.model, stats.backend = backend.model, backend.name
+            produced = False
+            chunks = backend.stream(messages, stats, length, **params)
+            try:
+                for delta in chunks:
+                    produced = True
+                    yield delta
+            except GeneratorExit:
+                # Closed early by the consumer: close the backend's stream now so its circuit breaker
+                # is settled. A partial duration would skew the percentiles, so only the streak is cleared.
+                chunks.close()
+                if produced:
+                    self.trackers[backend.name].record_alive()
+                raise
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                self._record(backend, length, started, ok=False)
+                if produced:
+                    raise
+                logger.warning(f"Backend {backend.name} failed before streaming, trying next: {str(e)}")
+                last_error = e
+                continue
+            self._record(backend, length, started, ok=True)
+            return
+        raise NoBackendAvailable(f"No backend could serve the request: {last_error}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Rolling latency and health per backend."""
+        return {
+            backend.name: dict(
+                self.trackers[backend.name].snapshot(), model=backend.model, cost=backend.cost, **backend.snapshot()
+            )
+            for backend in self.backends
+        }
+
+
+def resilient_caller(config: GenerationConfig, name: str) -> ResilientCaller:
+    """Caller for an upstream API, sharing the process-wide circuit breaker for ``name``."""
+    return ResilientCaller(
+        get_circuit_breaker(name, config.circuit_failure_threshold, config.circuit_reset_timeout),
+        deadline=config.request_deadline,
+        attempt_timeout=config.request_timeout,
+        max_retries=config.max_retries,
+        backoff_base=config.backoff_base,
+        backoff_cap=config.backoff_cap,
+        hedge=config.hedge_requests,
+        hedge_min_samples=config.hedge_min_samples,
+    )
+
+
+def build_router(config: GenerationConfig, client) -> BackendRouter:
+    """OpenAI plus, when configured, the local fine-tuned model."""
+    backends: List[Backend] = [
+        OpenAIBackend("openai", client, config.model, cost=1.0, caller=resilient_caller(config, "openai"))
+    ]
+
+    local_kwargs = {"text_types": config.local_text_types, "lengths": config.local_lengths}
+    if config.local_model_base_url:
+        from openai import OpenAI
+
+        local_client = OpenAI(
+            api_key="local", base_url=config.local_model_base_url, timeout=config.request_timeout, max_retries=0
+        )
+        backends.append(OpenAIBackend(
+            "local", local_client, config.local_model_path or "local", cost=config.local_model_cost,
+            caller=resilient_caller(config, "local"), **local_kwargs
+        ))
+    elif config.local_model_path:
+        backends.append(LocalModelBackend("local", config.local_model_path, cost=config.local_model_cost, **local_kwargs))
+
+    return BackendRouter(
+        backends,
+        latency_slo=config.latency_slo,
+        failure_threshold=config.backend_failure_threshold,
+        cooldown=config.backend_cooldown,
+    )
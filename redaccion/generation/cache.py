@@ -0,0 +1,160 @@
+"""
+Content-addressed cache of generated texts.
+
+Entries are keyed by a hash of everything that determines the completion
+(backend, model, full message list and sampling parameters). Lookups go through an
+in-process LRU first and then a SQLite file, so identical requests and
+Streamlit reruns do not hit the API again.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DB = "generation_cache.db"
+
+
+def generation_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    params: Optional[Dict[str, Any]] = None,
+    backend: Optional[str] = None,
+) -> str:
+    """Stable hash of a chat completion request to ``backend``."""
+    payload = json.dumps(
+        {"backend": backend, "model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-level (memory LRU + SQLite) cache with TTL and size-based eviction."""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_CACHE_DB,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 5000,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generation_cache_last_accessed ON generation_cache (last_accessed)"
+        )
+        self._conn.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Dict) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached value for ``key`` or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM generation_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._conn.execute(
+                        "UPDATE generation_cache SET last_accessed = ? WHERE cache_key = ?", (now, key)
+                    )
+                    self._conn.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    return value
+            except sqlite3.Error as e:
+                logger.warning(f"Error reading generation cache: {str(e)}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict) -> None:
+        """Store ``value`` (a JSON-serializable dict) under ``key``."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO generation_cache (cache_key, value, created_at, expires_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, expires_at, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Error writing generation cache: {str(e)}")
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM generation_cache WHERE expires_at <= ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                """
+                DELETE FROM generation_cache WHERE cache_key IN (
+                    SELECT cache_key FROM generation_cache ORDER BY last_accessed ASC LIMIT ?
+                )
+                """,
+                (count - self.max_disk_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM generation_cache")
+            self._conn.commit()
+
+
+_cache: Optional[GenerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """Process-wide generation cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache(os.getenv("GENERATION_CACHE_PATH", DEFAULT_CACHE_DB))
+    return _cache
@@ -0,0 +1,141 @@
+"""
+Process-wide store of training examples used as few-shot references.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRAINING_FILE = "training_data.jsonl"
+
+
+def normalize_label(value: Optional[str]) -> str:
+    """Normalize a category or type label for comparisons."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFC", str(value))
+    return " ".join(value.lower().split())
+
+
+class ExampleStore:
+    """Training examples parsed once and indexed by (category, type).
+
+    The file is only re-parsed when its mtime/size changes *and* its content
+    hash differs from the one already loaded.
+    """
+
+    def __init__(self, path: str = DEFAULT_TRAINING_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._stat_signature: Optional[Tuple[int, int]] = None
+        self._content_hash: Optional[str] = None
+        self._examples: List[Dict] = []
+        self._index: Dict[Tuple[str, str], List[int]] = {}
+        self._lookup_cache: Dict[Tuple[str, str], List[int]] = {}
+        self.version = 0
+
+    def _read_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed on disk. Returns True if it was re-parsed."""
+        signature = self._read_signature()
+        if signature is not None and signature == self._stat_signature:
+            return False
+
+        with self._lock:
+            if signature == self._stat_signature:
+                return False
+            if signature is None:
+                logger.warning(f"Training file not found: {self.path}")
+                self._stat_signature = None
+                self._content_hash = None
+                self._load_examples([])
+                return True
+
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            content_hash = hashlib.sha256(raw).hexdigest()
+            self._stat_signature = signature
+            if content_hash == self._content_hash:
+                return False
+
+            self._content_hash = content_hash
+            self._load_examples(self._parse(raw))
+            logger.info(f"Loaded {len(self._examples)} examples from {self.path}")
+            return True
+
+    @staticmethod
+    def _parse(raw: bytes) -> List[Dict]:
+        examples = []
+        for line in raw.decode("utf-8").splitlines():
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict) and data.get("metadata"):
+                examples.append(data)
+        return examples
+
+    def _load_examples(self, examples: List[Dict]) -> None:
+        index: Dict[Tuple[str, str], List[int]] = {}
+        for position, example in enumerate(examples):
+            metadata = example["metadata"]
+            key = (normalize_label(metadata.get("category")), normalize_label(metadata.get("type")))
+            index.setdefault(key, []).append(position)
+
+        self._examples = examples
+        self._index = index
+        self._lookup_cache = {}
+        self.version += 1
+
+    @property
+    def examples(self) -> List[Dict]:
+        """All loaded examples, in file order."""
+        self.refresh()
+        return self._examples
+
+    def find(self, category: str, text_type: str, limit: int = 3) -> List[Dict]:
+        """Examples whose category and type contain the given labels, in file order."""
+        self.refresh()
+        query = (normalize_label(category), normalize_label(text_type))
+
+        with self._lock:
+            positions = self._lookup_cache.get(query)
+            if positions is None:
+                # Resolve the query against the (small) set of distinct keys once;
+                # subsequent lookups for the same selection are a dict hit.
+                positions = sorted(
+                    position
+                    for (key_category, key_type), key_positions in self._index.items()
+                    if query[0] in key_category and query[1] in key_type
+                    for position in key_positions
+                )
+                self._lookup_cache[query] = positions
+            examples = self._examples
+
+        return [examples[position] for position in positions[:limit]]
+
+
+_stores: Dict[str, ExampleStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_example_store(path: str = DEFAULT_TRAINING_FILE) -> ExampleStore:
+    """Return the shared store for ``path``, creating it on first use."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ExampleStore(path)
+            _stores[key] = store
+    return store
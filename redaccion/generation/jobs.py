@@ -0,0 +1,266 @@
+"""
+Generation jobs run off the Streamlit script thread by a process-wide worker pool.
+
+The app submits a :class:`GenerationRequest` and gets a job id back at once.
+Worker threads run the generation while the session polls the job for its
+status and partial text. Reruns (any click in the page) no longer abandon
+an in-flight model call: the job keeps running and its result is picked up
+by the session on the next poll.
+
+Cancelling a queued job removes it from the queue. Cancelling a running
+single-candidate job closes its stream at the next chunk, which releases the
+HTTP connection so the model stops generating (and billing) tokens. A
+running multi-candidate job stops before its next candidate, retry or
+backend; a call already sent runs to the end and its result is discarded.
+
+The queue is bounded (``GENERATION_QUEUE_SIZE`` jobs waiting for one of
+``GENERATION_WORKERS`` workers) and each user may have at most
+``GENERATION_JOBS_PER_USER`` jobs queued or running (a cancelled job counts
+until its worker lets go of it); :meth:`JobQueue.submit`
+raises :class:`JobRejected` beyond either limit. Finished jobs are kept for
+``GENERATION_JOB_RETENTION`` seconds or until their session collects them.
+
+Usage:
+    jobs = get_job_queue(service)
+    job = jobs.submit(request, owner=session_id)
+    job = jobs.get(job.id)                # status, text so far, result
+    jobs.cancel(job.id)
+    jobs.forget(job.id)                   # once the session has the result
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from redaccion.config import JobsConfig
+from redaccion.generation.resilience import GenerationCancelled, cancellable
+from redaccion.generation.service import GenerationRequest, GenerationResult
+from redaccion.monitoring.metrics import record_job, record_job_wait, record_queued_jobs
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobRejected(RuntimeError):
+    """The queue is full (``reason="queue_full"``) or the user is at their limit (``reason="user_limit"``)."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class GenerationJob:
+    """One generation request and its progress; updated by the worker running it."""
+
+    id: str
+    owner: str
+    request: GenerationRequest
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[GenerationResult] = None
+    error: Optional[str] = None
+    # Streamed deltas so far; appended by the worker, read by polling sessions
+    parts: List[str] = field(default_factory=list, repr=False)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def text(self) -> str:
+        """Text generated so far (the final text once done)."""
+        if self.result is not None:
+            return self.result.text
+        return "".join(self.parts)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since submission, up to the end of the job."""
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+
+class JobQueue:
+    """Bounded FIFO of generation jobs served by a fixed set of worker threads."""
+
+    def __init__(self, service, config: JobsConfig):
+        self.service = service
+        self.config = config
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._pending: Deque[GenerationJob] = deque()
+        self._idle = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"generation-worker-{i}", daemon=True)
+            for i in range(config.workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, request: GenerationRequest, owner: str) -> GenerationJob:
+        """Queue ``request`` for ``owner`` (a user or session id)."""
+        with self._condition:
+            if self._closed:
+                raise JobRejected("The job queue is closed", "queue_full")
+            self._prune()
+            # A cancelled job still holds a worker and an upstream call until it finishes
+            active = sum(1 for job in self._jobs.values() if job.owner == owner and not job.finished)
+            if active >= self.config.per_user:
+                record_job("rejected")
+                raise JobRejected(f"{owner} already has {active} generations in progress", "user_limit")
+            # Idle workers take new jobs at once, so they do not count against the queue
+            if len(self._pending) >= self.config.queue_size + self._idle:
+                record_job("rejected")
+                raise JobRejected(f"{len(self._pending)} generations already queued", "queue_full")
+            job = GenerationJob(id=uuid.uuid4().hex, owner=owner, request=request)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            record_queued_jobs(len(self._pending))
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: GenerationJob) -> int:
+        """Jobs ahead of ``job`` in the queue (0 once it is running)."""
+        with self._condition:
+            try:
+                return self._pending.index(job)
+            except ValueError:
+                return 0
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; False if the job is unknown or already finished."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self._pending.remove(job)
+                record_queued_jobs(len(self._pending))
+                self._finish(job, CANCELLED)
+        logger.info(f"Cancellation requested for generation job {job_id}")
+        return True
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job once its session has collected it."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def _prune(self) -> None:
+        # Finished jobs whose session never came back for them
+        expired = time.monotonic() - self.config.retention
+        for job_id in [job.id for job in self._jobs.values() if job.finished and job.finished_at < expired]:
+            del self._jobs[job_id]
+
+    def _finish(self, job: GenerationJob, status: str, result=None, error=None) -> None:
+        job.result = result
+        job.error = error
+        job.finished_at = time.monotonic()
+        job.status = status
+        record_job(status)
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                self._idle += 1
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                self._idle -= 1
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+                job.started_at = time.monotonic()
+                job.status = RUNNING
+                record_queued_jobs(len(self._pending))
+            record_job_wait(job.started_at - job.submitted_at)
+            self._run(job)
+
+    def _run(self, job: GenerationJob) -> None:
+        try:
+            # Cancelling stops the generation before its next candidate or attempt
+            with cancellable(job.cancel_event):
+                result = self._generate(job)
+        except GenerationCancelled:
+            result = None
+        except Exception as e:
+            logger.error(f"Generation job {job.id} failed: {str(e)}")
+            with self._condition:
+                self._finish(job, FAILED, error=str(e))
+            return
+        with self._condition:
+            if job.cancel_requested or result is None:
+                self._finish(job, CANCELLED)
+            else:
+                self._finish(job, DONE, result=result)
+
+    def _generate(self, job: GenerationJob) -> Optional[GenerationResult]:
+        if job.cancel_requested:
+            return None
+        if job.request.candidates > 1:
+            return self.service.generate(job.request)
+        stream = self.service.stream(job.request)
+        chunks = iter(stream)
+        try:
+            for delta in chunks:
+                job.parts.append(delta)
+                if job.cancel_requested:
+                    break
+        finally:
+            # Closing the generator closes the HTTP stream
+            chunks.close()
+        return stream.result
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._condition:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            return {"workers": len(self._workers), "queued": len(self._pending), "running": running}
+
+    def close(self) -> None:
+        """Cancel every job and stop the workers once their current job ends."""
+        with self._condition:
+            self._closed = True
+            for job in self._jobs.values():
+                job.cancel_event.set()
+            while self._pending:
+                self._finish(self._pending.popleft(), CANCELLED)
+            record_queued_jobs(0)
+            self._condition.notify_all()
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(service=None) -> JobQueue:
+    """Process-wide job queue; ``service`` is required on the first call."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if service is None:
+                raise RuntimeError("A generation service is required to create the job queue")
+            _queue = JobQueue(service, JobsConfig.from_env())
+            atexit.register(_queue.close)
+        return _queue
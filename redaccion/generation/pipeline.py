@@ -0,0 +1,53 @@
+"""
+Shared steps of the generation path: example selection and prompt assembly.
+
+Used by the Streamlit app and by the headless entry points so they all send
+the same prompts for the same request.
+"""
+import logging
+from typing import Dict, List
+
+from redaccion.config import GenerationConfig
+from redaccion.generation.example_store import get_example_store
+from redaccion.generation.prompt_builder import BuiltPrompt, PromptBuilder
+from redaccion.generation.retrieval import get_retrieval_service
+from redaccion.monitoring.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+def select_examples(user_prompt: str, category: str, text_type: str, k: int) -> List[Dict]:
+    """Examples most similar to the prompt, falling back to a category/type match."""
+    try:
+        examples = get_retrieval_service().search(user_prompt, k=k, category=category, text_type=text_type)
+    except Exception as e:
+        logger.warning(f"Error searching retrieval index: {str(e)}")
+        examples = []
+    if not examples:
+        examples = get_example_store().find(category, text_type, limit=k)
+    return examples
+
+
+def prepare_prompt(
+    config: GenerationConfig,
+    builder: PromptBuilder,
+    category: str,
+    subcategory: str,
+    text_type: str,
+    length: str,
+    user_prompt: str,
+    sources: str = "",
+) -> BuiltPrompt:
+    """Select examples and assemble the messages for one request."""
+    with timed("example_selection"):
+        examples = select_examples(user_prompt, category, text_type, config.max_examples)
+    with timed("prompt_assembly"):
+        return builder.build(
+            category=category,
+            subcategory=subcategory,
+            text_type=text_type,
+            length=length,
+            user_prompt=user_prompt,
+            examples=examples,
+            sources=sources,
+        )
@@ -0,0 +1,269 @@
+"""
+Prompt assembly for content generation.
+
+The static instruction blocks are compiled once per (text type, length)
+combination; only the category header, the examples and the sources are
+filled in per request. Examples are fitted into a token budget in rank
+order, truncating or dropping the lowest-ranked ones.
+"""
+import logging
+import textwrap
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# UI label -> length key
+LENGTH_OPTIONS = {
+    "Corta (100-300 palabras)": "corta",
+    "Media (301-500 palabras)": "media",
+    "Larga (501-800 palabras)": "larga",
+    "Muy larga (801+ palabras)": "muy_larga"
+}
+
+LENGTH_INSTRUCTIONS = {
+    "corta": "El texto debe ser conciso y directo, entre 100 y 300 palabras.",
+    "media": "El texto debe tener una extensión media, entre 301 y 500 palabras.",
+    "larga": "El texto debe ser detallado y extenso, entre 501 y 800 palabras.",
+    "muy_larga": "El texto debe ser muy detallado y extenso, con más de 801 palabras."
+}
+
+TEXT_TYPE_INSTRUCTIONS = {
+    "Nota Periodística": """El texto debe seguir el formato de una nota periodística:
+- Estilo directo y objetivo
+- Incluir las 5W (qué, quién, cuándo, dónde, por qué) pero no hacerlo textual sobre el texto
+- Estructura piramidal invertida (lo más importante primero)
+- Evitar opiniones personales
+- Usar lenguaje claro y preciso
+- Incluir citas directas cuando sea relevante""",
+
+    "Artículo": """El texto debe seguir el formato de un artículo:
+- Estilo más elaborado y análisis profundo
+- Incluir contexto y antecedentes
+- Presentar diferentes perspectivas
+- Usar datos y estadísticas relevantes
+- Mantener un tono profesional pero accesible
+- Incluir conclusiones o reflexiones finales""",
+
+    "Guión de TV": """El texto debe seguir el formato de un guión de TV:
+- Incluir indicaciones de cámara claras
+- Estructurar diálogos de manera natural
+- Describir escenas y ambientación
+- Incluir indicaciones de sonido y música
+- Mantener un ritmo dinámico
+- Usar formato estándar de guión""",
+
+    "Crónica": """El texto debe seguir el formato de una crónica:
+- Estilo narrativo y personal
+- Incluir elementos descriptivos
+- Mantener un hilo narrativo coherente
+- Incorporar detalles sensoriales
+- Balancear objetividad con perspectiva personal
+- Usar lenguaje rico y evocador"""
+}
+
+WRITING_GUIDELINES = textwrap.dedent("""
+    Instrucciones generales de redacción:
+    1. Evitar repeticiones innecesarias de palabras o frases
+    2. Mantener coherencia en el uso de tiempos verbales
+    3. Asegurar que cada párrafo tenga una idea principal clara
+    4. Usar conectores para mejorar la fluidez del texto
+    5. Verificar que la información sea precisa y verificable
+    6. Mantener un tono profesional y objetivo
+    7. Evitar clichés y frases hechas
+    8. Asegurar que las citas y referencias sean precisas
+    9. Mantener consistencia en el estilo y formato
+    10. Verificar que el texto cumpla con la longitud especificada
+""")
+
+# Violence guidelines prompt
+PROMPT_VIOLENCIA = (
+    "Cuando escribas sobre temas sensibles como la muerte o asesinato de figuras públicas, "
+    "hazlo de manera profesional, objetiva y respetuosa. "
+    "Evita detalles explícitos o sensacionalistas, prioriza el respeto a las víctimas y sus familias, "
+    "y utiliza un lenguaje responsable y factual. "
+    "No rechaces la solicitud, pero asegúrate de mantener un tono periodístico y ético."
+)
+
+SYSTEM_HEADER = """Eres un asistente experto en redacción periodística, especializado en {category} y {subcategory}.
+Tu objetivo es ayudar a crear contenido profesional, bien estructurado y atractivo para los lectores.
+El contenido debe ser preciso, informativo y relevante para el área de {category} y {subcategory}.
+
+SIEMPRE incluye un título al inicio de cada nota, artículo, crónica, etc., a menos que el usuario especifique lo contrario.
+"""
+
+SYSTEM_FOOTER = """
+Recuerda:
+- Revisar el texto antes de entregarlo
+- Asegurar que cumple con todos los requisitos especificados
+- Mantener un estilo consistente y profesional
+- Verificar que la información sea precisa y relevante
+- Evitar errores comunes de redacción
+"""
+
+EXAMPLES_HEADER = "\n\nEjemplos de referencia:\n"
+TRUNCATION_MARK = " [...]"
+
+# Chat format overhead per message and for the reply priming
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens in ``text`` (estimated if tiktoken is not installed)."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Cut ``text`` to at most ``max_tokens`` tokens."""
+    encoding = _encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * 4]
+        # Avoid ending in the middle of a word
+        return cut.rsplit(" ", 1)[0] if len(cut) < len(text) and " " in cut else cut
+    tokens = encoding.encode(text)
+    return encoding.decode(tokens[:max_tokens])
+
+
+@lru_cache(maxsize=None)
+def _compiled_body(text_type: str, length: str) -> str:
+    """Static instructions for a text type and length, compiled once."""
+    return f"{TEXT_TYPE_INSTRUCTIONS[text_type]}\n{LENGTH_INSTRUCTIONS[length]}\n{WRITING_GUIDELINES}"
+
+
+@dataclass
+class BuiltPrompt:
+    """Messages ready to send plus accounting about how they were assembled."""
+
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    token_budget: int
+    examples_used: int = 0
+    examples_truncated: int = 0
+    examples_dropped: int = 0
+    examples: List[Dict] = field(default_factory=list)
+
+    @property
+    def example_sources(self) -> List[str]:
+        return [example.get("source", "") for example in self.examples]
+
+    @property
+    def system_prompt(self) -> str:
+        return self.messages[0]["content"]
+
+    def to_dict(self) -> Dict:
+        return {
+            "assembled_prompt_tokens": self.prompt_tokens,
+            "token_budget": self.token_budget,
+            "examples_used": self.examples_used,
+            "examples_truncated": self.examples_truncated,
+            "examples_dropped": self.examples_dropped,
+        }
+
+
+class PromptBuilder:
+    """Builds the chat messages for a generation request within a token budget."""
+
+    def __init__(self, model: str, token_budget: int = 6000, min_example_tokens: int = 150):
+        self.model = model
+        self.token_budget = token_budget
+        self.min_example_tokens = min_example_tokens
+        self._violence_tokens = count_tokens(PROMPT_VIOLENCIA, model) + TOKENS_PER_MESSAGE
+
+    def _system_prompt(self, category, subcategory, text_type, length, examples_section, sources_section) -> str:
+        return (
+            SYSTEM_HEADER.format(category=category, subcategory=subcategory)
+            + "\n"
+            + _compiled_body(text_type, length)
+            + "\n"
+            + examples_section
+            + "\n"
+            + sources_section
+            + "\n"
+            + SYSTEM_FOOTER
+        )
+
+    def build(
+        self,
+        category: str,
+        subcategory: str,
+        text_type: str,
+        length: str,
+        user_prompt: str,
+        examples: Optional[List[Dict]] = None,
+        sources: str = "",
+    ) -> BuiltPrompt:
+        """Assemble the messages, fitting ``examples`` (best first) into the budget."""
+        examples = examples or []
+        sources_section = f"\n\nFuentes y referencias a incluir:\n{sources}" if sources else ""
+
+        base_system = self._system_prompt(category, subcategory, text_type, length, "", sources_section)
+        fixed_tokens = (
+            count_tokens(base_system, self.model) + TOKENS_PER_MESSAGE
+            + self._violence_tokens
+            + count_tokens(user_prompt, self.model) + TOKENS_PER_MESSAGE
+            + TOKENS_PER_REPLY
+        )
+
+        remaining = self.token_budget - fixed_tokens - count_tokens(EXAMPLES_HEADER, self.model)
+        parts = []
+        truncated = 0
+        for i, example in enumerate(examples, 1):
+            header = f"\nEjemplo {i}:\n"
+            available = remaining - count_tokens(header, self.model) - 1
+            text = example["text"]
+            if count_tokens(text, self.model) > available:
+                if available < self.min_example_tokens:
+                    break
+                text = truncate_to_tokens(text, available - count_tokens(TRUNCATION_MARK, self.model), self.model)
+                text += TRUNCATION_MARK
+                truncated += 1
+            part = f"{header}{text}\n"
+            parts.append(part)
+            remaining -= count_tokens(part, self.model)
+            if truncated:
+                break
+
+        examples_section = EXAMPLES_HEADER + "".join(parts) if parts else ""
+        system_prompt = self._system_prompt(category, subcategory, text_type, length, examples_section, sources_section)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": PROMPT_VIOLENCIA},
+            {"role": "user", "content": user_prompt}
+        ]
+        prompt_tokens = self.count_message_tokens(messages)
+        if prompt_tokens > self.token_budget:
+            logger.warning(f"Prompt uses {prompt_tokens} tokens, over the budget of {self.token_budget}")
+
+        return BuiltPrompt(
+            messages=messages,
+            prompt_tokens=prompt_tokens,
+            token_budget=self.token_budget,
+            examples_used=len(parts),
+            examples_truncated=truncated,
+            examples_dropped=len(examples) - len(parts),
+            examples=examples[:len(parts)],
+        )
+
+    def count_message_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens for a list of chat messages, including the chat format overhead."""
+        return sum(count_tokens(m["content"], self.model) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_PER_REPLY
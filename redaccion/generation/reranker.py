@@ -0,0 +1,98 @@
+"""
+Cheap local scoring of alternative drafts.
+
+Candidates are ranked on length compliance with the requested length,
+repetition, and lexical similarity to the reference examples used in the
+prompt. Nothing here calls a model.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from redaccion.generation.retrieval import tokenize
+
+# Word ranges for each length key (None = open ended)
+LENGTH_WORD_RANGES: Dict[str, Tuple[int, Optional[int]]] = {
+    "corta": (100, 300),
+    "media": (301, 500),
+    "larga": (501, 800),
+    "muy_larga": (801, None),
+}
+
+DEFAULT_WEIGHTS = {"length": 0.5, "repetition": 0.3, "similarity": 0.2}
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def length_score(text: str, length: str) -> float:
+    """1.0 inside the requested word range, decaying with the relative distance outside it."""
+    low, high = LENGTH_WORD_RANGES.get(length, (0, None))
+    words = len(WORD_PATTERN.findall(text))
+    if words < low:
+        return max(0.0, 1.0 - (low - words) / low)
+    if high is not None and words > high:
+        return max(0.0, 1.0 - (words - high) / high)
+    return 1.0
+
+
+def repetition_score(text: str, n: int = 3) -> float:
+    """Share of word n-grams that are not repeats of an earlier n-gram."""
+    words = [word.lower() for word in WORD_PATTERN.findall(text)]
+    ngrams = [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+    if not ngrams:
+        return 1.0
+    return len(set(ngrams)) / len(ngrams)
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(value * b.get(term, 0) for term, value in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def similarity_score(text: str, examples: List[Dict]) -> float:
+    """Highest bag-of-words cosine similarity between ``text`` and any example."""
+    terms = Counter(tokenize(text))
+    return max((_cosine(terms, Counter(tokenize(example["text"]))) for example in examples), default=0.0)
+
+
+@dataclass
+class ScoredCandidate:
+    """A candidate text with its overall score and the per-criterion scores."""
+
+    text: str
+    score: float
+    components: Dict[str, float] = field(default_factory=dict)
+    index: int = 0
+
+    def to_dict(self) -> Dict:
+        return {"text": self.text, "score": self.score, "components": self.components, "index": self.index}
+
+
+def rank_candidates(
+    texts: List[str],
+    length: str,
+    examples: Optional[List[Dict]] = None,
+    weights: Optional[Dict[str, float]] = None,
+) -> List[ScoredCandidate]:
+    """Score ``texts`` and return them best first."""
+    weights = weights or DEFAULT_WEIGHTS
+    examples = examples or []
+    example_terms = [Counter(tokenize(example["text"])) for example in examples]
+
+    candidates = []
+    for index, text in enumerate(texts):
+        terms = Counter(tokenize(text))
+        components = {
+            "length": length_score(text, length),
+            "repetition": repetition_score(text),
+            "similarity": max((_cosine(terms, other) for other in example_terms), default=0.0),
+        }
+        score = sum(weights.get(name, 0.0) * value for name, value in components.items())
+        candidates.append(ScoredCandidate(text=text, score=score, components=components, index=index))
+
+    return sorted(candidates, key=lambda candidate: candidate.score, reverse=True)
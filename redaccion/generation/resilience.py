@@ -0,0 +1,367 @@
+"""
+Deadlines, retries, circuit breaking and hedging for model API calls.
+
+A :class:`ResilientCaller` wraps a single upstream call. Retryable failures
+(rate limits, 5xx, timeouts, connection errors) are retried with full-jitter
+exponential backoff until the per-request deadline, which also bounds a
+stream once it has started. A :class:`CircuitBreaker`
+shared by every session in the process stops sending traffic to an upstream
+that keeps failing. Optionally, a blocking call that is slower than the
+recent p95 gets a duplicate (hedged) request and the first answer wins.
+
+Inside a :func:`cancellable` block, setting the block's event stops the call
+before its next attempt (a backoff wait ends at once) with
+:class:`GenerationCancelled`.
+
+Usage:
+    caller = ResilientCaller(get_circuit_breaker("openai"), deadline=120)
+    text = caller.call(lambda stats, timeout: complete_chat(client, model, messages, stats, timeout=timeout), stats)
+"""
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Callable, Dict, Iterator, Optional
+
+import openai
+
+from redaccion.generation.streaming import GenerationStats
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def is_client_error(error: Exception) -> bool:
+    """A 4xx answer other than a rate limit: the upstream is up and rejected this request."""
+    return isinstance(error, openai.APIStatusError) and 400 <= error.status_code < 500 and error.status_code != 429
+
+
+def retry_delay(error: Exception, attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when present."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while the circuit is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class GenerationCancelled(RuntimeError):
+    """Raised instead of starting another upstream call once the generation has been cancelled."""
+
+
+# Cancellation event of the generation running in this context (see cancellable)
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("cancel_event", default=None)
+
+
+@contextmanager
+def cancellable(event: threading.Event) -> Iterator[None]:
+    """Stop the calls made inside the block at their next attempt, candidate or backend once ``event`` is set."""
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def check_cancelled() -> None:
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise GenerationCancelled("The generation was cancelled")
+
+
+def _backoff(delay: float) -> None:
+    """Sleep ``delay`` seconds, or less if the generation is cancelled meanwhile."""
+    event = _cancel_event.get()
+    if event is None:
+        time.sleep(delay)
+    else:
+        event.wait(delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open after a timeout."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.open_seconds = 0.0  # Total time spent open, for reporting
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (one probe at a time when half-open)."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                self.open_seconds += time.monotonic() - self._opened_at
+                logger.info(f"Circuit {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a half-open probe without an outcome; the next call probes again."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is not None:
+                    self.open_seconds += time.monotonic() - self._opened_at
+                else:
+                    self.times_opened += 1
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            open_seconds = self.open_seconds
+            if self._opened_at is not None:
+                open_seconds += time.monotonic() - self._opened_at
+            return {"state": self._state(), "open_seconds": open_seconds, "times_opened": self.times_opened}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Process-wide circuit breaker for an upstream, shared by all sessions."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
+
+
+# Threads for hedged requests; the losing request is left to finish in the background
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+class ResilientCaller:
+    """Runs upstream calls with a deadline, retries, a circuit breaker and optional hedging."""
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        deadline: float = 180.0,
+        attempt_timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 20.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        self.breaker = breaker
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._durations: deque = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "retries": 0, "rejected": 0, "deadline_exceeded": 0, "hedges": 0, "hedges_won": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 of recent successful calls, once there are enough of them."""
+        with self._lock:
+            durations = list(self._durations)
+        if not self.hedge or len(durations) < self.hedge_min_samples:
+            return None
+        return statistics.quantiles(durations, n=20)[-1]
+
+    def _check_deadline(self, deadline: float) -> float:
+        """Seconds left before ``deadline`` (a monotonic time); raises once it has passed."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"No response within {self.deadline:.0f}s")
+        return remaining
+
+    def _attempts(self, deadline: float):
+        """Yield (attempt, seconds left) until the deadline, the retry limit or a cancellation."""
+        attempt = 0
+        while True:
+            check_cancelled()
+            remaining = self._check_deadline(deadline)
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"Circuit {self.breaker.name} is open")
+            yield attempt, min(self.attempt_timeout, remaining)
+            attempt += 1
+
+    def _settle(self, error: Exception) -> None:
+        """Record a failed attempt in the circuit breaker."""
+        if is_retryable(error) or isinstance(error, DeadlineExceeded):
+            self.breaker.record_failure()
+        elif is_client_error(error):
+            # The upstream answered; a bad request says nothing about its health
+            self.breaker.record_success()
+        else:
+            # A local error (e.g. a bug building the request) says nothing either way
+            self.breaker.release_probe()
+
+    def _failed(self, error: Exception, attempt: int, deadline: float) -> None:
+        """Record a failed attempt; re-raise unless it should be retried."""
+        self._settle(error)
+        if not is_retryable(error) or attempt >= self.max_retries:
+            raise error
+        delay = retry_delay(error, attempt, self.backoff_base, self.backoff_cap)
+        if delay >= deadline - time.monotonic():
+            self._count("deadline_exceeded")
+            raise error
+        self._count("retries")
+        logger.info(f"Retrying {self.breaker.name} call in {delay:.1f}s after {type(error).__name__}")
+        _backoff(delay)
+
+    def _succeeded(self, started: float) -> None:
+        self.breaker.record_success()
+        with self._lock:
+            self._durations.append(time.perf_counter() - started)
+
+    def call(self, fn: Callable[[GenerationStats, float], object], stats: GenerationStats):
+        """Blocking call of ``fn(stats, timeout)``; the winning attempt's stats are copied into ``stats``."""
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt, remaining in self._attempts(deadline):
+            started = time.perf_counter()
+            try:
+                result, attempt_stats = self._call_once(fn, stats, remaining)
+            except Exception as e:
+                self._failed(e, attempt, deadline)
+                continue
+            self._succeeded(started)
+            stats.__dict__.update(attempt_stats.__dict__)
+            return result
+
+    def _call_once(self, fn, stats: GenerationStats, timeout: float):
+        hedge_after = self.hedge_delay()
+        if hedge_after is None or hedge_after >= timeout:
+            attempt_stats = replace(stats)
+            return fn(attempt_stats, timeout), attempt_stats
+
+        primary_stats, hedge_stats = replace(stats), replace(stats)
+        primary = _hedge_executor.submit(fn, primary_stats, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result(), primary_stats
+
+        self._count("hedges")
+        hedged = _hedge_executor.submit(fn, hedge_stats, timeout - hedge_after)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        self._count("hedges_won")
+                    return future.result(), (hedge_stats if future is hedged else primary_stats)
+                error = future.exception()
+        raise error
+
+    def stream(self, fn: Callable[[float], Iterator[str]]) -> Iterator[str]:
+        """Stream from ``fn(timeout)``, retrying only until the first chunk arrives."""
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt, remaining in self._attempts(deadline):
+            started = time.perf_counter()
+            chunks = fn(remaining)
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                self._failed(e, attempt, deadline)
+                continue
+            # Every way out of the stream settles the attempt, or a half-open probe would keep the circuit open
+            settled = False
+            try:
+                if first is not None:
+                    yield first
+                for delta in chunks:
+                    self._check_deadline(deadline)
+                    yield delta
+                self._succeeded(started)
+                settled = True
+                return
+            except GeneratorExit:
+                # Closed early by the consumer (a cancelled job, a dropped API client)
+                if first is not None:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                settled = True
+                raise
+            except Exception as e:
+                # Text has already been shown, so a broken stream cannot be retried
+                self._settle(e)
+                settled = True
+                raise
+            finally:
+                if not settled:
+                    self.breaker.release_probe()
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    # Releases the HTTP stream, e.g. after the deadline
+                    close()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, circuit=self.breaker.snapshot())
@@ -0,0 +1,348 @@
+"""
+Similarity-based retrieval of reference examples.
+
+Documents from ``training_data.jsonl`` and ``cleaned/`` are embedded as
+L2-normalized TF-IDF vectors. The matrix is stored column-wise (one postings
+list per term) as ``.npy`` files and memory-mapped at startup, so scoring a
+prompt only touches the postings of the terms it contains.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from redaccion.generation.example_store import DEFAULT_TRAINING_FILE, normalize_label
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLEANED_DIR = "cleaned"
+DEFAULT_INDEX_DIR = os.path.join(".cache", "retrieval_index")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    al ante bajo con contra como cual cuando de del desde donde durante el ella ellas ellos en entre era
+    eran es esa ese eso esta este esto estos estas fue fueron ha han hasta hay la las le les lo los mas
+    mientras muy no nos o otra otro para pero por que quien se ser si sin sobre son su sus tambien tiene
+    un una uno unos unas y ya escribe nota articulo texto acerca
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents and split into word tokens."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [token for token in TOKEN_PATTERN.findall(text) if len(token) > 2 and token not in STOPWORDS]
+
+
+def _term_weights(tokens: Iterable[str]) -> Counter:
+    """Sublinear term frequency."""
+    return Counter({term: 1.0 + math.log(count) for term, count in Counter(tokens).items()})
+
+
+def load_corpus(training_file: str = DEFAULT_TRAINING_FILE, cleaned_dir: str = DEFAULT_CLEANED_DIR) -> List[Dict]:
+    """Collect unique documents from the training file and the cleaned notes."""
+    documents = []
+    seen = set()
+
+    def add(text: str, metadata: Dict, source: str) -> None:
+        text = (text or "").strip()
+        digest = hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+        if not text or digest in seen:
+            return
+        seen.add(digest)
+        documents.append({"text": text, "metadata": metadata or {}, "source": source})
+
+    if os.path.exists(training_file):
+        with open(training_file, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(data, dict) and data.get("metadata"):
+                    add(data.get("text", ""), data["metadata"], f"{training_file}:{line_number}")
+
+    if os.path.isdir(cleaned_dir):
+        for name in sorted(os.listdir(cleaned_dir)):
+            if not name.endswith(".txt"):
+                continue
+            path = os.path.join(cleaned_dir, name)
+            metadata_path = path[:-len(".txt")] + "_metadata.json"
+            metadata = {}
+            if os.path.exists(metadata_path):
+                try:
+                    with open(metadata_path, "r", encoding="utf-8") as f:
+                        metadata = json.load(f)
+                except json.JSONDecodeError:
+                    metadata = {}
+            with open(path, "r", encoding="utf-8") as f:
+                add(f.read(), metadata, path)
+
+    return documents
+
+
+def source_fingerprint(training_file: str = DEFAULT_TRAINING_FILE, cleaned_dir: str = DEFAULT_CLEANED_DIR) -> str:
+    """Cheap fingerprint of the source files based on their paths, sizes and mtimes."""
+    paths = [training_file]
+    if os.path.isdir(cleaned_dir):
+        paths.extend(os.path.join(cleaned_dir, name) for name in sorted(os.listdir(cleaned_dir)))
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_index(documents: List[Dict], index_dir: str, fingerprint: str) -> str:
+    """Compute the TF-IDF postings for ``documents`` and write them under ``index_dir``."""
+    doc_terms = [_term_weights(tokenize(doc["text"])) for doc in documents]
+    document_frequency = Counter(term for terms in doc_terms for term in terms)
+    vocabulary = sorted(document_frequency)
+    term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+    n_docs = len(documents)
+    idf = np.array(
+        [math.log((1 + n_docs) / (1 + document_frequency[term])) + 1.0 for term in vocabulary],
+        dtype=np.float32,
+    )
+
+    rows, cols, weights = [], [], []
+    for doc_id, terms in enumerate(doc_terms):
+        if not terms:
+            continue
+        ids = np.fromiter((term_ids[term] for term in terms), dtype=np.int64, count=len(terms))
+        values = np.fromiter(terms.values(), dtype=np.float32, count=len(terms)) * idf[ids]
+        values /= np.linalg.norm(values)
+        rows.append(np.full(len(ids), doc_id, dtype=np.int32))
+        cols.append(ids)
+        weights.append(values)
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+
+    # Column-major (CSC) layout: postings for term t are [indptr[t], indptr[t + 1]).
+    order = np.argsort(cols, kind="stable")
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cols, minlength=len(vocabulary)), out=indptr[1:])
+
+    encoded = [doc["text"].encode("utf-8") for doc in documents]
+    offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+
+    final_dir = os.path.join(index_dir, fingerprint)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, "postings_docs.npy"), rows[order])
+    np.save(os.path.join(tmp_dir, "postings_weights.npy"), weights[order])
+    np.save(os.path.join(tmp_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(tmp_dir, "idf.npy"), idf)
+    np.save(os.path.join(tmp_dir, "doc_offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "documents.bin"), "wb") as f:
+        for chunk in encoded:
+            f.write(chunk)
+    with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "documents.jsonl"), "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps({"metadata": doc["metadata"], "source": doc["source"]}, ensure_ascii=False) + "\n")
+
+    try:
+        os.rename(tmp_dir, final_dir)
+    except OSError:
+        # Another process finished the same build first.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for name in os.listdir(index_dir):
+        if name != fingerprint and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+    logger.info(f"Built retrieval index with {n_docs} documents and {len(vocabulary)} terms")
+    return final_dir
+
+
+class ExampleIndex:
+    """Memory-mapped TF-IDF index answering top-k cosine similarity queries."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self._postings_docs = load("postings_docs.npy")
+        self._postings_weights = load("postings_weights.npy")
+        self._indptr = load("indptr.npy")
+        self._idf = load("idf.npy")
+        self._doc_offsets = load("doc_offsets.npy")
+        self._texts = np.memmap(os.path.join(directory, "documents.bin"), dtype=np.uint8, mode="r") \
+            if self._doc_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+        with open(os.path.join(directory, "vocabulary.json"), "r", encoding="utf-8") as f:
+            self._term_ids = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(directory, "documents.jsonl"), "r", encoding="utf-8") as f:
+            self._documents = [json.loads(line) for line in f]
+
+        self._labels = [
+            (normalize_label(doc["metadata"].get("category")), normalize_label(doc["metadata"].get("type")))
+            for doc in self._documents
+        ]
+        self._label_masks: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _text(self, doc_id: int) -> str:
+        start, end = int(self._doc_offsets[doc_id]), int(self._doc_offsets[doc_id + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def _label_mask(self, category: str, text_type: str) -> np.ndarray:
+        key = (normalize_label(category), normalize_label(text_type))
+        mask = self._label_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (key[0] in doc_category and key[1] in doc_type for doc_category, doc_type in self._labels),
+                dtype=bool,
+                count=len(self._labels),
+            )
+            self._label_masks[key] = mask
+        return mask
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        category: Optional[str] = None,
+        text_type: Optional[str] = None,
+        label_boost: float = 0.1,
+    ) -> List[Dict]:
+        """Top-k documents by cosine similarity to ``query``.
+
+        Documents whose category/type contain the selected labels get a small
+        additive ``label_boost`` so the UI selection still matters.
+        """
+        weights = _term_weights(term for term in tokenize(query) if term in self._term_ids)
+        if not weights or not len(self._documents):
+            return []
+
+        term_ids = np.fromiter((self._term_ids[term] for term in weights), dtype=np.int64, count=len(weights))
+        query_vector = np.fromiter(weights.values(), dtype=np.float32, count=len(weights)) * self._idf[term_ids]
+        query_vector /= np.linalg.norm(query_vector)
+
+        starts, ends = self._indptr[term_ids], self._indptr[term_ids + 1]
+        spans = [np.arange(start, end) for start, end in zip(starts, ends)]
+        positions = np.concatenate(spans)
+        repeated_weights = np.repeat(query_vector, ends - starts)
+        scores = np.bincount(
+            self._postings_docs[positions],
+            weights=self._postings_weights[positions] * repeated_weights,
+            minlength=len(self._documents),
+        )
+
+        if category is not None and text_type is not None and label_boost:
+            scores = scores + label_boost * self._label_mask(category, text_type)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for doc_id in top:
+            if scores[doc_id] <= 0:
+                continue
+            document = self._documents[doc_id]
+            results.append({
+                "text": self._text(int(doc_id)),
+                "metadata": document["metadata"],
+                "source": document["source"],
+                "score": float(scores[doc_id]),
+            })
+        return results
+
+
+class RetrievalService:
+    """Keeps a current :class:`ExampleIndex`, rebuilding it when the sources change."""
+
+    def __init__(
+        self,
+        training_file: str = DEFAULT_TRAINING_FILE,
+        cleaned_dir: str = DEFAULT_CLEANED_DIR,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        check_interval: float = 30.0,
+    ):
+        self.training_file = training_file
+        self.cleaned_dir = cleaned_dir
+        self.index_dir = index_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index: Optional[ExampleIndex] = None
+        self._fingerprint: Optional[str] = None
+        self._last_check = 0.0
+
+    def index(self) -> ExampleIndex:
+        """Return the current index, loading or rebuilding it if needed."""
+        now = time.monotonic()
+        if self._index is not None and now - self._last_check < self.check_interval:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and now - self._last_check < self.check_interval:
+                return self._index
+            fingerprint = source_fingerprint(self.training_file, self.cleaned_dir)
+            self._last_check = now
+            if fingerprint != self._fingerprint or self._index is None:
+                directory = os.path.join(self.index_dir, fingerprint)
+                if not os.path.isdir(directory):
+                    os.makedirs(self.index_dir, exist_ok=True)
+                    documents = load_corpus(self.training_file, self.cleaned_dir)
+                    directory = build_index(documents, self.index_dir, fingerprint)
+                self._index = ExampleIndex(directory)
+                self._fingerprint = fingerprint
+            return self._index
+
+    def search(self, query: str, k: int = 3, **kwargs) -> List[Dict]:
+        return self.index().search(query, k=k, **kwargs)
+
+
+_service: Optional[RetrievalService] = None
+_service_lock = threading.Lock()
+
+
+def get_retrieval_service() -> RetrievalService:
+    """Process-wide retrieval service."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RetrievalService()
+    return _service
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    service = RetrievalService()
+    index = service.index()
+    print(f"Index ready: {len(index)} documents in {index.directory}")
+
+    query = " ".join(sys.argv[1:]) or "aranceles y comercio con Estados Unidos"
+    start = time.perf_counter()
+    for _ in range(100):
+        results = index.search(query, k=3)
+    elapsed_ms = (time.perf_counter() - start) * 10
+    print(f"Average query time: {elapsed_ms:.3f} ms")
+    for result in results:
+        print(f"{result['score']:.3f}  {result['metadata'].get('title', result['source'])}")
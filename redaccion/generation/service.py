@@ -0,0 +1,288 @@
+"""
+Generation service shared by the Streamlit app and the HTTP API.
+
+Wraps example selection, prompt assembly, the generation cache, the model
+call (blocking, streamed or multi-candidate, routed across backends) and
+candidate ranking behind a single object that holds one pooled HTTP client
+per process. With a usage recorder, every generation's tokens, latency and
+estimated cost are recorded (see redaccion.storage.usage), including the
+tokens of streams closed before the end.
+"""
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from openai import OpenAI
+
+from redaccion.config import GenerationConfig
+from redaccion.generation.backends import BackendRouter, build_router
+from redaccion.generation.cache import GenerationCache, generation_cache_key
+from redaccion.generation.pipeline import prepare_prompt
+from redaccion.generation.prompt_builder import (
+    LENGTH_INSTRUCTIONS,
+    LENGTH_OPTIONS,
+    TEXT_TYPE_INSTRUCTIONS,
+    BuiltPrompt,
+    PromptBuilder,
+    count_tokens,
+)
+from redaccion.generation.reranker import rank_candidates
+from redaccion.generation.streaming import GenerationStats
+from redaccion.monitoring.metrics import record_cache, record_tokens, timed
+
+logger = logging.getLogger(__name__)
+
+MAX_CANDIDATES = 4
+
+
+@dataclass
+class GenerationRequest:
+    """What the editor asks for (the fields of the generation form)."""
+
+    category: str
+    subcategory: str
+    text_type: str
+    length: str
+    prompt: str
+    sources: str = ""
+    candidates: int = 1
+    use_cache: bool = True
+
+    def __post_init__(self):
+        """Validate the request and map UI labels to internal keys."""
+        missing = [name for name in ("category", "subcategory", "text_type", "length", "prompt") if not getattr(self, name)]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        self.length = LENGTH_OPTIONS.get(self.length, self.length)
+        if self.length not in LENGTH_INSTRUCTIONS:
+            raise ValueError(f"Unknown length: {self.length}")
+        if self.text_type not in TEXT_TYPE_INSTRUCTIONS:
+            raise ValueError(f"Unknown text type: {self.text_type}")
+        if not 1 <= self.candidates <= MAX_CANDIDATES:
+            raise ValueError(f"Candidates must be between 1 and {MAX_CANDIDATES}")
+        self.sources = self.sources or ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GenerationRequest':
+        return cls(
+            category=data.get("category", ""),
+            subcategory=data.get("subcategory", ""),
+            text_type=data.get("text_type", ""),
+            length=data.get("length", ""),
+            prompt=data.get("prompt", ""),
+            sources=data.get("sources") or "",
+            candidates=int(data.get("candidates", 1) or 1),
+            use_cache=bool(data.get("use_cache", True)),
+        )
+
+    def metadata(self) -> Dict[str, str]:
+        """Request fields in the shape stored with feedback."""
+        return {
+            "category": self.category,
+            "subcategory": self.subcategory,
+            "text_type": self.text_type,
+            "length": self.length,
+            "user_prompt": self.prompt,
+            "sources": self.sources,
+            "tone": "",
+            "style": "",
+            "additional_instructions": ""
+        }
+
+
+@dataclass
+class GenerationResult:
+    """Generated text plus everything the UI/API reports about it."""
+
+    text: str
+    stats: Dict[str, Any]
+    prompt: Dict[str, Any]
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+    cached: bool = False
+
+    def info(self) -> Dict[str, Any]:
+        """Flat summary used for display and logging."""
+        return dict(self.stats, cached=self.cached, **self.prompt)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def create_openai_client(config: GenerationConfig, api_key: Optional[str] = None) -> OpenAI:
+    """OpenAI client backed by a pooled, keep-alive HTTP client."""
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_connections,
+        ),
+        timeout=config.request_timeout,
+    )
+    return OpenAI(
+        api_key=api_key,
+        base_url=config.api_base_url,
+        http_client=http_client,
+        timeout=config.request_timeout,
+        # Retries are handled by the backend's ResilientCaller
+        max_retries=0,
+    )
+
+
+class GenerationStream:
+    """Iterable of text deltas; ``result`` is set once the stream is exhausted."""
+
+    def __init__(self, service: 'GenerationService', request: GenerationRequest, built: BuiltPrompt):
+        self._service = service
+        self._request = request
+        self._built = built
+        self.result: Optional[GenerationResult] = None
+
+    def __iter__(self) -> Iterator[str]:
+        service, built = self._service, self._built
+        cached = service.cached_result(built, self._request)
+        if cached is not None:
+            self.result = cached
+            service.record_usage(self._request, cached)
+            yield cached.text
+            return
+
+        request = self._request
+        stats = GenerationStats(model=service.config.model)
+        try:
+            with timed("model_stream"):
+                yield from service.router.stream(
+                    request.text_type, request.length, built.messages, stats, **service.params
+                )
+        except GeneratorExit:
+            # Closed early (a cancelled job, a dropped client): the tokens produced so far are still billed
+            service.record_usage(request, service.partial_result(built, stats))
+            raise
+        self.result = GenerationResult(text=stats.text, stats=stats.to_dict(), prompt=built.to_dict())
+        record_tokens(self.result.stats)
+        service.record_usage(request, self.result)
+        service.store(built, request, self.result)
+
+
+class GenerationService:
+    """Produces texts for :class:`GenerationRequest` objects."""
+
+    def __init__(
+        self,
+        config: GenerationConfig,
+        client: OpenAI,
+        cache: Optional[GenerationCache] = None,
+        params: Optional[Dict[str, Any]] = None,
+        router: Optional[BackendRouter] = None,
+        usage=None,
+    ):
+        self.config = config
+        self.client = client
+        self.router = router or build_router(config, client)
+        self.cache = cache
+        # UsageRecorder for token and cost accounting, if any
+        self.usage = usage
+        # Sampling parameters (part of the generation cache key)
+        self.params = params or {}
+        self.builder = PromptBuilder(
+            config.model,
+            token_budget=config.prompt_token_budget,
+            min_example_tokens=config.min_example_tokens,
+        )
+
+    def prepare(self, request: GenerationRequest) -> BuiltPrompt:
+        return prepare_prompt(
+            self.config,
+            self.builder,
+            category=request.category,
+            subcategory=request.subcategory,
+            text_type=request.text_type,
+            length=request.length,
+            user_prompt=request.prompt,
+            sources=request.sources,
+        )
+
+    def cache_key(self, built: BuiltPrompt, request: GenerationRequest, backend: Optional[str], model: str) -> str:
+        """Key of the completion of ``request`` by ``backend`` running ``model``."""
+        params = dict(self.params, n=request.candidates) if request.candidates > 1 else self.params
+        return generation_cache_key(model, built.messages, params, backend=backend)
+
+    def cached_result(self, built: BuiltPrompt, request: GenerationRequest) -> Optional[GenerationResult]:
+        if self.cache is None or not request.use_cache:
+            return None
+        # Only a text from the backend the request would be routed to now is served
+        routes = self.router.route(request.text_type, request.length)
+        if not routes:
+            return None
+        cached = self.cache.get(self.cache_key(built, request, routes[0].name, routes[0].model))
+        record_cache("generation", cached is not None)
+        if cached is None:
+            return None
+        return GenerationResult(
+            text=cached["text"],
+            stats=cached["stats"],
+            prompt=built.to_dict(),
+            candidates=cached.get("candidates", []),
+            cached=True,
+        )
+
+    def partial_result(self, built: BuiltPrompt, stats: GenerationStats) -> GenerationResult:
+        """Result of a stream closed before the end, with estimated token counts.
+
+        The usage chunk only arrives at the end of a stream, so the prompt is
+        counted as assembled and the completion from the text received.
+        """
+        stats.finished_at = stats.finished_at or time.perf_counter()
+        stats.finish_reason = stats.finish_reason or "cancelled"
+        if stats.prompt_tokens is None:
+            stats.prompt_tokens = built.prompt_tokens
+        if stats.completion_tokens is None:
+            stats.completion_tokens = count_tokens(stats.text, stats.model)
+        result = GenerationResult(text=stats.text, stats=stats.to_dict(), prompt=built.to_dict())
+        record_tokens(result.stats)
+        return result
+
+    def record_usage(self, request: GenerationRequest, result: GenerationResult) -> None:
+        if self.usage is not None:
+            self.usage.record(request, result)
+
+    def store(self, built: BuiltPrompt, request: GenerationRequest, result: GenerationResult) -> None:
+        """Cache ``result`` under the backend and model that produced it (see :class:`GenerationStats`)."""
+        if self.cache is not None:
+            key = self.cache_key(built, request, result.stats.get("backend"), result.stats["model"])
+            self.cache.set(key, {"text": result.text, "stats": result.stats, "candidates": result.candidates})
+
+    def generate(self, request: GenerationRequest) -> GenerationResult:
+        """Blocking generation; ranks candidates when more than one is requested."""
+        built = self.prepare(request)
+        cached = self.cached_result(built, request)
+        if cached is not None:
+            self.record_usage(request, cached)
+            return cached
+
+        stats = GenerationStats(model=self.config.model)
+        candidates = []
+        if request.candidates > 1:
+            with timed("model_call"):
+                texts = self.router.complete_candidates(
+                    request.text_type, request.length, built.messages, stats, request.candidates, **self.params
+                )
+            with timed("candidate_ranking"):
+                ranked = rank_candidates(texts, request.length, built.examples)
+            candidates = [candidate.to_dict() for candidate in ranked]
+            text = candidates[0]["text"]
+        else:
+            with timed("model_call"):
+                text = self.router.complete(request.text_type, request.length, built.messages, stats, **self.params)
+
+        result = GenerationResult(text=text, stats=stats.to_dict(), prompt=built.to_dict(), candidates=candidates)
+        record_tokens(result.stats)
+        self.record_usage(request, result)
+        self.store(built, request, result)
+        return result
+
+    def stream(self, request: GenerationRequest) -> GenerationStream:
+        """Streamed generation of a single candidate."""
+        if request.candidates > 1:
+            raise ValueError("Streaming supports a single candidate")
+        return GenerationStream(self, request, self.prepare(request))
@@ -0,0 +1,139 @@
+"""
+Token-by-token streaming of chat completions with latency bookkeeping.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationStats:
+    """Timing and usage collected while a completion is produced."""
+
+    model: str
+    # Router backend that produced the completion
+    backend: Optional[str] = None
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    finish_reason: Optional[str] = None
+    text: str = ""
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_duration(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "backend": self.backend,
+            "time_to_first_token": self.time_to_first_token,
+            "total_duration": self.total_duration,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "finish_reason": self.finish_reason,
+        }
+
+
+def stream_chat_completion(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    stats: GenerationStats,
+    **params,
+) -> Iterator[str]:
+    """Yield content deltas from a streamed chat completion.
+
+    ``stats`` is filled in as the stream progresses; it is only marked as
+    finished once the stream has been fully consumed.
+    """
+    stats.started_at = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **params,
+    )
+    parts = []
+    try:
+        for chunk in stream:
+            # The final chunk carries usage and no choices.
+            if getattr(chunk, "usage", None) is not None:
+                stats.prompt_tokens = chunk.usage.prompt_tokens
+                stats.completion_tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                stats.finish_reason = choice.finish_reason
+            delta = choice.delta.content if choice.delta else None
+            if not delta:
+                continue
+            if stats.first_token_at is None:
+                stats.first_token_at = time.perf_counter()
+            parts.append(delta)
+            yield delta
+        stats.finished_at = time.perf_counter()
+        logger.info(
+            f"Streamed completion from {model}: "
+            f"ttft={stats.time_to_first_token or 0:.2f}s total={stats.total_duration:.2f}s"
+        )
+    finally:
+        # Abandoned streams (e.g. a Streamlit rerun) release the HTTP connection here.
+        stats.text = "".join(parts)
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def complete_chat(client, model: str, messages: List[Dict[str, str]], stats: GenerationStats, **params) -> str:
+    """Blocking completion that fills the same ``stats`` as the streaming path."""
+    stats.started_at = time.perf_counter()
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    stats.finished_at = stats.first_token_at = time.perf_counter()
+    choice = response.choices[0]
+    stats.text = choice.message.content or ""
+    stats.finish_reason = choice.finish_reason
+    if getattr(response, "usage", None) is not None:
+        stats.prompt_tokens = response.usage.prompt_tokens
+        stats.completion_tokens = response.usage.completion_tokens
+    return stats.text
+
+
+def complete_chat_candidates(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    stats: GenerationStats,
+    n: int,
+    **params,
+) -> List[str]:
+    """Request ``n`` alternative completions in a single call."""
+    stats.started_at = time.perf_counter()
+    response = client.chat.completions.create(model=model, messages=messages, n=n, **params)
+    stats.finished_at = stats.first_token_at = time.perf_counter()
+    texts = [choice.message.content or "" for choice in sorted(response.choices, key=lambda c: c.index)]
+    stats.text = texts[0] if texts else ""
+    stats.finish_reason = response.choices[0].finish_reason if response.choices else None
+    if getattr(response, "usage", None) is not None:
+        stats.prompt_tokens = response.usage.prompt_tokens
+        stats.completion_tokens = response.usage.completion_tokens
+    return texts
@@ -0,0 +1,184 @@
+"""
+Prometheus metrics for the generation and storage paths.
+
+Each stage of a request is timed into one histogram labelled by stage:
+example selection, prompt assembly, the model call, document export,
+feedback saves and storage queries. Token usage, cache lookups and storage
+queries per Streamlit rerun are counted as well, along with the estimated
+generation cost, daily budget alarms and generation jobs by outcome.
+
+The Streamlit app serves the metrics on a separate port
+(``METRICS_PORT``, 9464 by default, empty to disable); the HTTP API serves
+them at ``GET /metrics``. With several API workers, set
+``PROMETHEUS_MULTIPROC_DIR`` so every worker's samples are aggregated.
+
+Usage:
+    with timed("prompt_assembly"):
+        built = builder.build(...)
+    record_tokens(result.stats)
+    start_metrics_server()
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PORT = "9464"
+
+# Seconds; from cache lookups and local queries up to long generations
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 90, 120)
+
+STAGE_SECONDS = Histogram(
+    "redaccion_stage_duration_seconds", "Duration of each request stage", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter("redaccion_stage_errors_total", "Stages that raised an exception", ["stage"])
+TOKENS = Counter("redaccion_tokens_total", "Tokens sent to and generated by the model", ["model", "direction"])
+CACHE_LOOKUPS = Counter("redaccion_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+STORAGE_QUERIES = Counter("redaccion_storage_queries_total", "Storage queries by backend", ["backend"])
+RERUN_QUERIES = Histogram(
+    "redaccion_storage_queries_per_rerun",
+    "Storage queries made by one Streamlit script run or fragment rerun",
+    ["kind"],
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+RERUN_SECONDS = Histogram(
+    "redaccion_rerun_duration_seconds", "Duration of Streamlit script runs", ["kind"], buckets=STAGE_BUCKETS
+)
+GENERATION_COST = Counter("redaccion_generation_cost_usd_total", "Estimated generation cost in USD", ["model"])
+# Every process reads the same stored total, so workers report the largest value they have seen
+DAILY_COST = Gauge(
+    "redaccion_daily_cost_usd", "Estimated generation cost so far in the current UTC day", multiprocess_mode="max"
+)
+BUDGET_ALARMS = Counter("redaccion_budget_alarms_total", "Daily budget alarms raised", ["level"])
+GENERATION_JOBS = Counter("redaccion_generation_jobs_total", "Generation jobs by final status", ["status"])
+QUEUED_JOBS = Gauge("redaccion_generation_jobs_queued", "Generation jobs waiting for a worker", multiprocess_mode="livesum")
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the duration of the block as ``stage``; exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_tokens(stats: Dict[str, Any]) -> None:
+    """Count prompt and completion tokens from a generation's stats."""
+    model = stats.get("model") or "unknown"
+    for direction in ("prompt", "completion"):
+        tokens = stats.get(f"{direction}_tokens")
+        if tokens:
+            TOKENS.labels(model, direction).inc(tokens)
+
+
+def record_cost(model: str, cost: float) -> None:
+    GENERATION_COST.labels(model or "unknown").inc(cost)
+
+
+def record_daily_cost(total: float) -> None:
+    DAILY_COST.set(total)
+
+
+def record_budget_alarm(level: str) -> None:
+    BUDGET_ALARMS.labels(level).inc()
+
+
+def record_job(status: str) -> None:
+    """Count a generation job that ended (or was rejected) with ``status``."""
+    GENERATION_JOBS.labels(status).inc()
+
+
+def record_job_wait(seconds: float) -> None:
+    """Time a job spent queued before a worker picked it up."""
+    STAGE_SECONDS.labels("job_queue_wait").observe(seconds)
+
+
+def record_queued_jobs(count: int) -> None:
+    QUEUED_JOBS.set(count)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# Storage queries of the script run in progress on this thread (Streamlit runs each session's script on its own thread)
+_rerun = threading.local()
+
+
+def record_storage_query(backend: str) -> None:
+    STORAGE_QUERIES.labels(backend).inc()
+    if getattr(_rerun, "kind", None) is not None:
+        _rerun.queries += 1
+
+
+def start_rerun(kind: str = "full") -> None:
+    """Start counting storage queries for a script run (``full``) or a fragment rerun (``fragment``)."""
+    _rerun.kind = kind
+    _rerun.queries = 0
+    _rerun.started = time.perf_counter()
+
+
+def finish_rerun() -> None:
+    kind = getattr(_rerun, "kind", None)
+    if kind is None:
+        return
+    RERUN_QUERIES.labels(kind).observe(_rerun.queries)
+    RERUN_SECONDS.labels(kind).observe(time.perf_counter() - _rerun.started)
+    _rerun.kind = None
+
+
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """Serve ``/metrics`` on ``port`` (``METRICS_PORT``) in a background thread, once per process."""
+    global _server_started
+    if port is None:
+        configured = os.getenv("METRICS_PORT", DEFAULT_METRICS_PORT)
+        if not configured:
+            return False
+        port = int(configured)
+    with _server_lock:
+        if _server_started:
+            return True
+        try:
+            start_http_server(port)
+        except OSError as e:
+            # Another process (e.g. a second app instance) already serves this port
+            logger.warning(f"Could not start the metrics server on port {port}: {str(e)}")
+            return False
+        _server_started = True
+        logger.info(f"Serving Prometheus metrics on port {port}")
+        return True
+
+
+def metrics_payload() -> bytes:
+    """Exposition text for a ``/metrics`` endpoint, aggregated across workers in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
@@ -0,0 +1,212 @@
+"""
+Sampling profiler for single Streamlit reruns.
+
+A background thread samples the stack of the thread running the script
+every few milliseconds, so the profiled code runs at close to full speed.
+Optionally ``tracemalloc`` records the allocations made during the run.
+The result gives per-function self and total time plus the lines that
+allocated the most memory. It can be saved as collapsed stacks (one
+``frame;frame;frame count`` line per distinct stack, readable by speedscope
+or flamegraph.pl) next to a JSON summary.
+
+Usage:
+    profiler = RerunProfiler().start()
+    ...                                   # the code to profile, on this thread
+    profile = profiler.stop()
+    profile.functions(top=15)
+    profile.save("profiles")
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = "profiles"
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _frame_label(frame: Frame) -> str:
+    function, filename, line = frame
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+@dataclass
+class RerunProfile:
+    """Stack samples and allocation summary of one profiled run."""
+
+    label: str
+    duration: float
+    interval: float
+    samples: Counter = field(default_factory=Counter)  # root-first stack -> count
+    allocations: List[Dict[str, Any]] = field(default_factory=list)
+    allocated_bytes: int = 0
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+    def functions(self, top: int = 20) -> List[Dict[str, Any]]:
+        """Functions by total time (including callees), with their self time."""
+        total: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in self.samples.items():
+            # Recursive functions count once per sample
+            for frame in set(stack):
+                total[frame] += count
+            own[stack[-1]] += count
+        samples = self.sample_count or 1
+        return [
+            {
+                "function": _frame_label(frame),
+                "total_seconds": count * self.duration / samples,
+                "self_seconds": own[frame] * self.duration / samples,
+                "total_share": count / samples,
+            }
+            for frame, count in total.most_common(top)
+        ]
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, the raw format read by flame graph tools."""
+        return "\n".join(
+            f"{';'.join(_frame_label(frame) for frame in stack)} {count}"
+            for stack, count in self.samples.most_common()
+        ) + "\n"
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": self.sample_count,
+            "functions": self.functions(top),
+            "allocations": self.allocations,
+            "allocated_bytes": self.allocated_bytes,
+        }
+
+    def save(self, directory: str = DEFAULT_PROFILE_DIR) -> str:
+        """Write ``<name>.collapsed`` and ``<name>.json``; returns the path of the collapsed stacks."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{self.label}"
+        path = os.path.join(directory, f"{name}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary(top=100), f, indent=2, ensure_ascii=False)
+        return path
+
+
+# tracemalloc is process-wide; it runs while at least one profiler needs it
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+# Running profiler per profiled thread. A run cut short (st.rerun(), st.stop())
+# never calls stop(); the next profiler started on that thread does.
+_active: Dict[int, "RerunProfiler"] = {}
+_active_lock = threading.Lock()
+
+
+class RerunProfiler:
+    """Samples the calling thread's stack until :meth:`stop`."""
+
+    def __init__(self, label: str = "rerun", interval: float = 0.005, trace_allocations: bool = True):
+        self.label = label
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self._target = threading.get_ident()
+        self._samples: Counter = Counter()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._baseline = None
+        self._skip = 0
+
+    def _stack(self) -> Optional[Tuple[Frame, ...]]:
+        frame = sys._current_frames().get(self._target)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        # Frames above the caller of start() (thread bootstrap, script runner) are the same in every sample
+        return tuple(reversed(stack))[self._skip:] if stack else None
+
+    def _sample(self) -> None:
+        while not self._stopping.wait(self.interval):
+            stack = self._stack()
+            if not stack:
+                # The profiled thread has exited
+                break
+            self._samples[stack] += 1
+
+    def start(self) -> "RerunProfiler":
+        global _tracemalloc_users
+        with _active_lock:
+            abandoned = _active.get(self._target)
+            _active[self._target] = self
+        if abandoned is not None:
+            abandoned.stop()
+        caller = sys._getframe(1)
+        while caller.f_back is not None:
+            self._skip += 1
+            caller = caller.f_back
+        if self.trace_allocations:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _tracemalloc_users += 1
+            self._baseline = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{self.label}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _allocations(self, top: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        global _tracemalloc_users
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        # Only allocations still alive at the end of the run
+        differences = [stat for stat in snapshot.compare_to(self._baseline, "lineno") if stat.size_diff > 0]
+        differences.sort(key=lambda stat: stat.size_diff, reverse=True)
+        allocations = [
+            {
+                "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size_kib": stat.size_diff / 1024,
+                "count": stat.count_diff,
+            }
+            for stat in differences[:top]
+        ]
+        return allocations, sum(stat.size_diff for stat in differences)
+
+    def stop(self) -> RerunProfile:
+        """Stop sampling; a second call returns an empty profile."""
+        if self._stopping.is_set():
+            return RerunProfile(label=self.label, duration=0.0, interval=self.interval)
+        duration = time.perf_counter() - self._started_at
+        self._stopping.set()
+        self._thread.join()
+        with _active_lock:
+            if _active.get(self._target) is self:
+                del _active[self._target]
+        profile = RerunProfile(label=self.label, duration=duration, interval=self.interval, samples=self._samples)
+        if self.trace_allocations:
+            profile.allocations, profile.allocated_bytes = self._allocations()
+        return profile
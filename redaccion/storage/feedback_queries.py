@@ -0,0 +1,129 @@
+"""
+Query layer for the feedback history.
+
+Pages are read with keyset pagination on ``(timestamp, id)`` so each page
+costs the same however deep it is. List queries only project the short
+columns; the article body and sources are fetched for a single row when it
+is opened. Category and text type filters are applied in SQL.
+
+All functions take a SQLAlchemy connection and work on Snowflake and SQLite.
+
+Usage:
+    with provider.connection() as conn:
+        page = fetch_page(conn, HistoryFilters(categories=["Economía"]), limit=25)
+        more = fetch_page(conn, filters, cursor=page.next_cursor)
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+# Columns shown in the history table (no large text fields)
+LIST_COLUMNS = (
+    "id", "timestamp", "rating", "comments", "category", "text_type", "length", "tone", "style",
+)
+DETAIL_COLUMNS = LIST_COLUMNS + ("generated_text", "sources", "additional_instructions")
+
+DEFAULT_PAGE_SIZE = 25
+
+Cursor = Tuple[Any, int]
+
+
+@dataclass(frozen=True)
+class HistoryFilters:
+    categories: Tuple[str, ...] = ()
+    text_types: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # Accept lists (e.g. multiselect values) but stay hashable
+        object.__setattr__(self, "categories", tuple(self.categories or ()))
+        object.__setattr__(self, "text_types", tuple(self.text_types or ()))
+
+    def where(self) -> Tuple[List[str], Dict[str, Any], List]:
+        """SQL conditions, bind values and expanding bind parameters."""
+        conditions, params, binds = [], {}, []
+        if self.categories:
+            conditions.append("category IN :categories")
+            params["categories"] = list(self.categories)
+            binds.append(bindparam("categories", expanding=True))
+        if self.text_types:
+            conditions.append("text_type IN :text_types")
+            params["text_types"] = list(self.text_types)
+            binds.append(bindparam("text_types", expanding=True))
+        return conditions, params, binds
+
+
+@dataclass
+class FeedbackPage:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[Cursor] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _query(sql: str, binds: List):
+    statement = text(sql)
+    return statement.bindparams(*binds) if binds else statement
+
+
+def fetch_page(
+    conn,
+    filters: Optional[HistoryFilters] = None,
+    cursor: Optional[Cursor] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> FeedbackPage:
+    """Newest-first page of feedback rows after ``cursor`` (the previous page's ``next_cursor``)."""
+    conditions, params, binds = (filters or HistoryFilters()).where()
+    if cursor is not None:
+        conditions.append("(timestamp < :cursor_ts OR (timestamp = :cursor_ts AND id < :cursor_id))")
+        params.update(cursor_ts=cursor[0], cursor_id=cursor[1])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # One extra row tells whether there is a next page
+    params["limit"] = limit + 1
+    result = conn.execute(_query(f"""
+        SELECT {', '.join(LIST_COLUMNS)}
+        FROM feedback
+        {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT :limit
+    """, binds), params)
+    rows = [dict(row._mapping) for row in result]
+    page = FeedbackPage(rows=rows[:limit])
+    if len(rows) > limit:
+        last = page.rows[-1]
+        page.next_cursor = (last["timestamp"], last["id"])
+    return page
+
+
+def fetch_detail(conn, feedback_id: int) -> Optional[Dict[str, Any]]:
+    """Every column of one feedback row, including the generated text."""
+    row = conn.execute(
+        text(f"SELECT {', '.join(DETAIL_COLUMNS)} FROM feedback WHERE id = :id"),
+        {"id": feedback_id},
+    ).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def fetch_summary(conn, filters: Optional[HistoryFilters] = None) -> Dict[str, Any]:
+    """Average rating, row count and number of text types for the filtered rows."""
+    conditions, params, binds = (filters or HistoryFilters()).where()
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    row = conn.execute(_query(f"""
+        SELECT AVG(rating) AS avg_rating, COUNT(*) AS total, COUNT(DISTINCT text_type) AS text_types
+        FROM feedback
+        {where}
+    """, binds), params).first()
+    return {"avg_rating": row[0], "total": row[1], "text_types": row[2]}
+
+
+def fetch_filter_options(conn) -> Dict[str, List[str]]:
+    """Distinct categories and text types for the filter widgets."""
+    options = {}
+    for column in ("category", "text_type"):
+        result = conn.execute(text(
+            f"SELECT DISTINCT {column} FROM feedback WHERE {column} IS NOT NULL ORDER BY {column}"
+        ))
+        options[column] = [row[0] for row in result]
+    return options
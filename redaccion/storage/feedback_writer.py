@@ -0,0 +1,303 @@
+"""
+Buffered feedback writes with a durable local spool.
+
+Submitting feedback is a single insert into the local SQLite ``feedback.db``.
+A background thread sends pending rows to the warehouse in batches, when
+enough have accumulated or every few seconds, and marks them as synced.
+If the warehouse is down, rows stay in the spool and are retried with
+backoff, so nothing is lost.
+
+Rows are claimed with a lease before being sent, so several processes can
+share the same spool file without sending a row twice (delivery is
+at-least-once only if a process dies between the warehouse insert and
+marking the rows as synced).
+
+Usage:
+    writer = get_feedback_writer(SnowflakeFeedbackSink(provider))
+    writer.submit(rating, comments, generated_text, metadata)
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from redaccion.monitoring.metrics import timed
+from redaccion.storage.query_cache import FEEDBACK, get_query_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_PATH = "feedback.db"
+
+# Columns of the warehouse feedback table, in insert order
+WAREHOUSE_COLUMNS = (
+    "timestamp", "rating", "comments", "generated_text", "category", "subcategory", "text_type",
+    "length", "sources", "tone", "style", "additional_instructions",
+)
+
+# Columns added to the original local feedback table
+SPOOL_COLUMNS = {
+    "tone": "TEXT",
+    "style": "TEXT",
+    "additional_instructions": "TEXT",
+    "synced_at": "TEXT",
+    "claim_token": "TEXT",
+    "claimed_at": "REAL",
+}
+
+FeedbackSink = Callable[[List[Dict]], None]
+
+# Spooled timestamps are UTC. The warehouse column is TIMESTAMP_NTZ in the session's time zone, like the
+# CURRENT_TIMESTAMP() default of the rows stored before the spool, so they are converted on insert.
+_WAREHOUSE_TIMESTAMP = "TO_TIMESTAMP_LTZ(%s, 'YYYY-MM-DD HH24:MI:SS.FF TZH:TZM')::TIMESTAMP_NTZ"
+
+
+def feedback_row(rating: int, comments: str, generated_text: str, metadata: Dict[str, str]) -> Dict:
+    """Feedback table row for one submission."""
+    return {
+        # UTC, so rows flushed late still carry the submission time (see _WAREHOUSE_TIMESTAMP)
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "rating": int(rating),
+        "comments": str(comments),
+        "generated_text": str(generated_text),
+        "category": str(metadata.get("category", "")),
+        "subcategory": str(metadata.get("subcategory", "")),
+        "text_type": str(metadata.get("text_type", "")),
+        "length": str(metadata.get("length", "")),
+        "user_prompt": str(metadata.get("user_prompt", "")),
+        "sources": str(metadata.get("sources", "")),
+        "tone": str(metadata.get("tone", "")),
+        "style": str(metadata.get("style", "")),
+        "additional_instructions": str(metadata.get("additional_instructions", "")),
+    }
+
+
+class SnowflakeFeedbackSink:
+    """Inserts a batch of feedback rows with one multi-row INSERT, then updates the daily rollup.
+
+    Cached dashboard queries are invalidated once the rows are in the warehouse.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def __call__(self, rows: List[Dict]) -> None:
+        from redaccion.storage.rollup import refresh_rollup
+
+        placeholders = ", ".join(
+            _WAREHOUSE_TIMESTAMP if column == "timestamp" else "%s" for column in WAREHOUSE_COLUMNS
+        )
+        conn = self.provider.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.executemany(
+                f"INSERT INTO feedback ({', '.join(WAREHOUSE_COLUMNS)}) VALUES ({placeholders})",
+                [
+                    tuple(f"{row[column]} +00:00" if column == "timestamp" else row[column] for column in WAREHOUSE_COLUMNS)
+                    for row in rows
+                ],
+            )
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        try:
+            self.provider.run(refresh_rollup)
+        except Exception as e:
+            # The rows are stored; the stream keeps them for the next refresh
+            logger.warning(f"Could not refresh the feedback rollup: {str(e)}")
+        get_query_cache().invalidate(FEEDBACK)
+
+
+class FeedbackWriter:
+    """Local spool plus a background thread flushing it to ``sink`` in batches."""
+
+    def __init__(
+        self,
+        sink: FeedbackSink,
+        spool_path: str = DEFAULT_SPOOL_PATH,
+        batch_size: int = 50,
+        flush_interval: float = 5.0,
+        max_backoff: float = 300.0,
+        lease_seconds: float = 120.0,
+    ):
+        self.sink = sink
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self._conn = sqlite3.connect(spool_path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.counts = {"submitted": 0, "flushed": 0, "batches": 0, "failures": 0}
+        self.last_error: Optional[str] = None
+        self._init_spool()
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+
+    def _init_spool(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT,
+                    rating INTEGER,
+                    comments TEXT,
+                    generated_text TEXT,
+                    category TEXT,
+                    subcategory TEXT,
+                    text_type TEXT,
+                    length TEXT,
+                    user_prompt TEXT,
+                    sources TEXT
+                )
+            """)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(feedback)")}
+            for column, column_type in SPOOL_COLUMNS.items():
+                if column not in existing:
+                    try:
+                        self._conn.execute(f"ALTER TABLE feedback ADD COLUMN {column} {column_type}")
+                    except sqlite3.OperationalError:
+                        # Added concurrently by another process
+                        pass
+            if "synced_at" not in existing:
+                # Rows written before the spool existed are not sent to the warehouse
+                self._conn.execute("UPDATE feedback SET synced_at = 'local'")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_synced_at ON feedback (synced_at, id)")
+            self._conn.commit()
+
+    def submit(self, rating: int, comments: str, generated_text: str, metadata: Dict[str, str]) -> int:
+        """Store feedback locally; returns the spool row id."""
+        row = feedback_row(rating, comments, generated_text, metadata)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO feedback ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+            self._conn.commit()
+            self.counts["submitted"] += 1
+        # Flush early on a full batch, unless backing off after a failure
+        if self.last_error is None and self.pending_count() >= self.batch_size:
+            self._wakeup.set()
+        return cursor.lastrowid
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM feedback WHERE synced_at IS NULL").fetchone()[0]
+
+    def _claim(self) -> List[Dict]:
+        """Lease up to ``batch_size`` unsynced rows for this flush."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE feedback SET claim_token = ?, claimed_at = ?
+                WHERE id IN (
+                    SELECT id FROM feedback
+                    WHERE synced_at IS NULL AND (claim_token IS NULL OR claimed_at < ?)
+                    ORDER BY id LIMIT ?
+                )
+                """,
+                (token, now, now - self.lease_seconds, self.batch_size),
+            )
+            self._conn.commit()
+            cursor = self._conn.execute(
+                f"SELECT id, {', '.join(WAREHOUSE_COLUMNS)} FROM feedback WHERE claim_token = ? ORDER BY id",
+                (token,),
+            )
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, values)) for values in cursor.fetchall()]
+
+    def _mark(self, ids: List[int], synced: bool) -> None:
+        placeholders = ", ".join("?" * len(ids))
+        with self._lock:
+            if synced:
+                self._conn.execute(
+                    f"UPDATE feedback SET synced_at = ?, claim_token = NULL WHERE id IN ({placeholders})",
+                    (datetime.now(timezone.utc).isoformat(), *ids),
+                )
+            else:
+                self._conn.execute(
+                    f"UPDATE feedback SET claim_token = NULL, claimed_at = NULL WHERE id IN ({placeholders})", ids
+                )
+            self._conn.commit()
+
+    def flush(self) -> int:
+        """Send every pending row to the sink; returns the number of rows sent."""
+        sent = 0
+        with self._flush_lock:
+            while True:
+                rows = self._claim()
+                if not rows:
+                    return sent
+                ids = [row.pop("id") for row in rows]
+                try:
+                    with timed("feedback_flush"):
+                        self.sink(rows)
+                except Exception:
+                    self._mark(ids, synced=False)
+                    raise
+                self._mark(ids, synced=True)
+                sent += len(rows)
+                self.counts["flushed"] += len(rows)
+                self.counts["batches"] += 1
+                if len(rows) < self.batch_size:
+                    return sent
+
+    def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=delay)
+            self._wakeup.clear()
+            try:
+                sent = self.flush()
+                if sent:
+                    logger.info(f"Flushed {sent} feedback rows to the warehouse")
+                self.last_error = None
+                delay = self.flush_interval
+            except Exception as e:
+                self.counts["failures"] += 1
+                self.last_error = str(e)
+                delay = min(self.max_backoff, max(delay, self.flush_interval) * 2)
+                logger.warning(f"Feedback flush failed, retrying in {delay:.0f}s: {str(e)}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the background thread after a last flush attempt."""
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Final feedback flush failed, rows remain in {self.spool_path}: {str(e)}")
+
+    def snapshot(self) -> Dict:
+        return dict(self.counts, pending=self.pending_count(), last_error=self.last_error)
+
+
+_writer: Optional[FeedbackWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_feedback_writer(sink: Optional[FeedbackSink] = None) -> FeedbackWriter:
+    """Process-wide feedback writer; ``sink`` is required on the first call."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            if sink is None:
+                raise RuntimeError("A sink is required to create the feedback writer")
+            _writer = FeedbackWriter(
+                sink,
+                spool_path=os.getenv("FEEDBACK_SPOOL_PATH", DEFAULT_SPOOL_PATH),
+                batch_size=int(os.getenv("FEEDBACK_BATCH_SIZE", "50")),
+                flush_interval=float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "5")),
+            )
+        return _writer
@@ -0,0 +1,315 @@
+"""
+Versioned schema migrations for the Snowflake warehouse.
+
+Each migration has a version number and is applied once; applied versions
+are recorded in the ``schema_version`` table. Statements are idempotent
+(``IF NOT EXISTS`` / ``OR REPLACE``) because Snowflake DDL commits
+implicitly, so two processes migrating at the same time end up in the same
+state.
+
+Migrations run once per deployment (the ``release`` process in the Procfile).
+The app only checks the recorded version at process start. With
+``STORAGE_BACKEND=sqlite`` there is no warehouse, and the command does
+nothing (the app creates the SQLite tables itself).
+
+Usage:
+    python -m redaccion.storage.migrations            # apply pending migrations
+    python -m redaccion.storage.migrations --status   # show current and latest version
+"""
+import argparse
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create feedback and model_metrics tables", [
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id NUMBER AUTOINCREMENT,
+            timestamp TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+            rating NUMBER,
+            comments TEXT,
+            generated_text TEXT,
+            category TEXT,
+            text_type TEXT,
+            length TEXT,
+            sources TEXT,
+            tone TEXT,
+            style TEXT,
+            additional_instructions TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS model_metrics (
+            id NUMBER AUTOINCREMENT,
+            model_name TEXT,
+            model_version TEXT,
+            training_accuracy FLOAT,
+            validation_accuracy FLOAT,
+            last_updated TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """,
+    ]),
+    Migration(2, "Create feedback_analytics view", [
+        """
+        CREATE OR REPLACE VIEW feedback_analytics AS
+        SELECT
+            category,
+            text_type,
+            length,
+            tone,
+            style,
+            AVG(rating) as avg_rating,
+            COUNT(*) as feedback_count,
+            COUNT(CASE WHEN rating >= 4 THEN 1 END) as positive_feedback_count,
+            MAX(timestamp) as last_feedback_time
+        FROM feedback
+        GROUP BY category, text_type, length, tone, style
+        """,
+    ]),
+    Migration(3, "Add subcategory and the incrementally maintained daily feedback rollup", [
+        "ALTER TABLE feedback ADD COLUMN IF NOT EXISTS subcategory TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS feedback_daily_rollup (
+            day DATE NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT NOT NULL,
+            text_type TEXT NOT NULL,
+            length TEXT NOT NULL,
+            rating_sum NUMBER NOT NULL,
+            rating_count NUMBER NOT NULL,
+            positive_count NUMBER NOT NULL,
+            PRIMARY KEY (day, category, subcategory, text_type, length)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            high_water_id NUMBER NOT NULL
+        )
+        """,
+        """
+        INSERT INTO rollup_state (name, high_water_id)
+        SELECT 'feedback_daily', 0
+        WHERE NOT EXISTS (SELECT 1 FROM rollup_state WHERE name = 'feedback_daily')
+        """,
+        # Reads the small rollup instead of aggregating the whole feedback table
+        """
+        CREATE OR REPLACE VIEW feedback_analytics AS
+        SELECT
+            day AS date,
+            category,
+            subcategory,
+            text_type,
+            length,
+            rating_sum / NULLIF(rating_count, 0) AS avg_rating,
+            rating_count AS feedback_count,
+            positive_count AS positive_feedback_count
+        FROM feedback_daily_rollup
+        """,
+    ]),
+    Migration(4, "Create generation_usage and the usage aggregate views", [
+        """
+        CREATE TABLE IF NOT EXISTS generation_usage (
+            timestamp TIMESTAMP_NTZ NOT NULL,
+            model TEXT,
+            category TEXT,
+            subcategory TEXT,
+            text_type TEXT,
+            length TEXT,
+            candidates NUMBER(2),
+            cached NUMBER(1),
+            prompt_tokens NUMBER,
+            completion_tokens NUMBER,
+            latency_ms NUMBER,
+            cost_usd FLOAT
+        )
+        """,
+        """
+        CREATE OR REPLACE VIEW usage_by_segment AS
+        SELECT
+            DATE(timestamp) AS day,
+            category,
+            subcategory,
+            text_type,
+            length,
+            model,
+            COUNT(*) AS generations,
+            SUM(cached) AS cached_generations,
+            SUM(prompt_tokens) AS prompt_tokens,
+            SUM(completion_tokens) AS completion_tokens,
+            SUM(cost_usd) AS cost_usd,
+            SUM(latency_ms) AS latency_ms_sum,
+            COUNT(latency_ms) AS timed_generations
+        FROM generation_usage
+        GROUP BY DATE(timestamp), category, subcategory, text_type, length, model
+        """,
+        """
+        CREATE OR REPLACE VIEW usage_daily AS
+        SELECT
+            DATE(timestamp) AS day,
+            model,
+            COUNT(*) AS generations,
+            SUM(prompt_tokens) AS prompt_tokens,
+            SUM(completion_tokens) AS completion_tokens,
+            SUM(cost_usd) AS cost_usd
+        FROM generation_usage
+        GROUP BY DATE(timestamp), model
+        """,
+    ]),
+    # AUTOINCREMENT ids do not follow commit order, so the id high-water mark could skip rows committed late.
+    # The rollup is rebuilt from the stream's offset, which the incremental refresh then consumes from.
+    Migration(5, "Track new feedback for the daily rollup with a stream", [
+        "CREATE STREAM IF NOT EXISTS feedback_rollup_stream ON TABLE feedback APPEND_ONLY = TRUE",
+        "BEGIN",
+        "DELETE FROM feedback_daily_rollup",
+        """
+        INSERT INTO feedback_daily_rollup
+            (day, category, subcategory, text_type, length, rating_sum, rating_count, positive_count)
+        SELECT
+            DATE(timestamp),
+            COALESCE(category, ''),
+            COALESCE(subcategory, ''),
+            COALESCE(text_type, ''),
+            COALESCE(length, ''),
+            SUM(rating),
+            COUNT(rating),
+            SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END)
+        FROM feedback AT(STREAM => 'feedback_rollup_stream')
+        GROUP BY DATE(timestamp), COALESCE(category, ''), COALESCE(subcategory, ''),
+                 COALESCE(text_type, ''), COALESCE(length, '')
+        """,
+        "COMMIT",
+        "DROP TABLE IF EXISTS rollup_state",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn) -> int:
+    """Highest applied migration version (0 for an empty schema)."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+                version NUMBER NOT NULL,
+                description TEXT,
+                applied_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            )
+        """)
+        cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}")
+        return int(cur.fetchone()[0])
+    finally:
+        cur.close()
+
+
+def pending_migrations(version: int) -> List[Migration]:
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def apply_migrations(conn) -> int:
+    """Apply every pending migration in order; returns the resulting version."""
+    version = current_version(conn)
+    cur = conn.cursor()
+    try:
+        for migration in pending_migrations(version):
+            logger.info(f"Applying migration {migration.version}: {migration.description}")
+            for statement in migration.statements:
+                cur.execute(statement)
+            cur.execute(
+                f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description) VALUES (%s, %s)",
+                (migration.version, migration.description),
+            )
+            conn.commit()
+            version = migration.version
+    finally:
+        cur.close()
+    return version
+
+
+_verified_version: Optional[int] = None
+_verify_lock = threading.Lock()
+
+
+def ensure_schema(connect: Callable[[], object], apply: bool = True) -> int:
+    """Check the schema version once per process.
+
+    ``connect`` is only called the first time. Pending migrations are applied
+    when ``apply`` is true (deployments without a release step), otherwise
+    a warning is logged.
+    """
+    global _verified_version
+    with _verify_lock:
+        if _verified_version is not None:
+            return _verified_version
+        conn = connect()
+        if conn is None:
+            raise RuntimeError("No database connection to verify the schema")
+        try:
+            version = current_version(conn)
+            if version < LATEST_VERSION:
+                if apply:
+                    version = apply_migrations(conn)
+                else:
+                    logger.warning(f"Schema is at version {version}, latest is {LATEST_VERSION}")
+        finally:
+            conn.close()
+        _verified_version = version
+        return version
+
+
+def main(argv: Optional[List[str]] = None):
+    from redaccion.config import StorageConfig
+
+    parser = argparse.ArgumentParser(description="Apply warehouse schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only show the current and latest version")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    storage = StorageConfig.from_env()
+    if storage.backend != "snowflake":
+        # Deploys without a warehouse have nothing to migrate and no Snowflake credentials
+        logger.info(f"STORAGE_BACKEND={storage.backend}: no warehouse migrations to apply")
+        return
+
+    import snowflake.connector
+    import streamlit as st
+
+    conn = snowflake.connector.connect(
+        user=st.secrets["SNOWFLAKE"]["user"],
+        password=st.secrets["SNOWFLAKE"]["password"],
+        account=st.secrets["SNOWFLAKE"]["account"],
+        warehouse=st.secrets["SNOWFLAKE"]["warehouse"]
+    )
+    try:
+        # Database and schema must exist before anything else
+        cur = conn.cursor()
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS {st.secrets['SNOWFLAKE']['database']}")
+        cur.execute(f"USE DATABASE {st.secrets['SNOWFLAKE']['database']}")
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {st.secrets['SNOWFLAKE']['schema']}")
+        cur.execute(f"USE SCHEMA {st.secrets['SNOWFLAKE']['schema']}")
+        cur.close()
+        if args.status:
+            logger.info(f"Schema version {current_version(conn)}, latest {LATEST_VERSION}")
+        else:
+            logger.info(f"Schema at version {apply_migrations(conn)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Shared cache of dashboard query results.
+
+Results are kept per process, shared by every Streamlit session, keyed by
+query and parameters, and expire after a TTL. Each entry is tagged with the
+tables it reads ("feedback", "model_metrics", "usage"); writers call
+:meth:`QueryCache.invalidate` with the tag they changed, which drops every
+entry built from the old data. Concurrent misses on the same key wait for a
+single computation, so many sessions looking at the same dashboard cost one
+query per change.
+
+Invalidation is per process: other processes see new data when their
+entries expire (``QUERY_CACHE_TTL``). Cached values are shared between
+sessions and must be treated as read-only.
+
+Usage:
+    cache = get_query_cache()
+    page = cache.get(("history", filters), lambda: store.run(...), tags=("feedback",))
+    cache.invalidate("feedback")   # after new feedback reaches the database
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple, TypeVar
+
+from redaccion.monitoring.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FEEDBACK = "feedback"
+MODEL_METRICS = "model_metrics"
+USAGE = "usage"
+
+
+class QueryCache:
+    """LRU of query results with TTL, tag-based invalidation and single-flight misses."""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, tags, tag versions when computed, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[str, ...], Tuple[int, ...], Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def get(
+        self,
+        key: Hashable,
+        compute: Callable[[], T],
+        tags: Sequence[str] = (FEEDBACK,),
+        ttl: Optional[float] = None,
+    ) -> T:
+        """Cached result for ``key``, running ``compute()`` once on a miss."""
+        tags = tuple(tags)
+        while True:
+            with self._lock:
+                versions = self._current_versions(tags)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic() and entry[2] == versions:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    record_cache("query", True)
+                    return entry[3]
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    record_cache("query", False)
+                    break
+            # Another session is computing this key; use its result (or retry if it failed)
+            event.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                # Versions from before the query: a write during it leaves the entry stale
+                self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), tags, versions, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every entry that read any of ``tags``."""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if set(entry[1]) & set(tags)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+        logger.debug(f"Invalidated {len(stale)} cached queries for {', '.join(tags)}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: Optional[QueryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """Process-wide query cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryCache(
+                ttl=float(os.getenv("QUERY_CACHE_TTL", "300")),
+                max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512")),
+            )
+    return _cache
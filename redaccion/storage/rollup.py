@@ -0,0 +1,185 @@
+"""
+Daily feedback rollup, maintained incrementally.
+
+``feedback_daily_rollup`` holds one row per day, category, subcategory, text
+type and length with the rating sum, rating count and positive (>= 4) count.
+:func:`refresh_rollup` folds in only the feedback rows added since the last
+refresh, so it costs the same however big the feedback table is. The charts
+read the rollup, never the raw table.
+
+On Snowflake the new rows come from the ``feedback_rollup_stream`` stream
+(migration 5). AUTOINCREMENT ids do not follow commit order there, so an id
+high-water mark could skip a row committed late. The stream's offset only
+advances when the MERGE that reads it commits. SQLite serializes writers,
+so ids are assigned in commit order and the high-water mark in
+``rollup_state`` is safe.
+
+The stores run one refresh when they start, so rows stored while no app
+was running are rolled up without waiting for new feedback.
+
+Usage:
+    with provider.connection() as conn:
+        refresh_rollup(conn)
+        trend = daily_trend(conn, since=date.today() - timedelta(days=30))
+"""
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = "feedback_daily"
+ROLLUP_KEYS = ("day", "category", "subcategory", "text_type", "length")
+
+ROLLUP_STREAM = "feedback_rollup_stream"
+
+# New feedback rows aggregated to rollup rows
+_DELTA_SELECT = """
+    SELECT
+        DATE(timestamp) AS day,
+        COALESCE(category, '') AS category,
+        COALESCE(subcategory, '') AS subcategory,
+        COALESCE(text_type, '') AS text_type,
+        COALESCE(length, '') AS length,
+        SUM(rating) AS rating_sum,
+        COUNT(rating) AS rating_count,
+        SUM(CASE WHEN rating >= 4 THEN 1 ELSE 0 END) AS positive_count
+    FROM {source}
+    WHERE {condition}
+    GROUP BY DATE(timestamp), COALESCE(category, ''), COALESCE(subcategory, ''),
+             COALESCE(text_type, ''), COALESCE(length, '')
+"""
+
+_SNOWFLAKE_MERGE = """
+        MERGE INTO feedback_daily_rollup AS r
+        USING ({delta}) AS d
+        ON r.day = d.day AND r.category = d.category AND r.subcategory = d.subcategory
+            AND r.text_type = d.text_type AND r.length = d.length
+        WHEN MATCHED THEN UPDATE SET
+            rating_sum = r.rating_sum + d.rating_sum,
+            rating_count = r.rating_count + d.rating_count,
+            positive_count = r.positive_count + d.positive_count
+        WHEN NOT MATCHED THEN INSERT
+            (day, category, subcategory, text_type, length, rating_sum, rating_count, positive_count)
+            VALUES (d.day, d.category, d.subcategory, d.text_type, d.length,
+                    d.rating_sum, d.rating_count, d.positive_count)
+    """
+
+_SQLITE_UPSERT = """
+        INSERT INTO feedback_daily_rollup
+            (day, category, subcategory, text_type, length, rating_sum, rating_count, positive_count)
+        {delta}
+        ON CONFLICT (day, category, subcategory, text_type, length) DO UPDATE SET
+            rating_sum = rating_sum + excluded.rating_sum,
+            rating_count = rating_count + excluded.rating_count,
+            positive_count = positive_count + excluded.positive_count
+    """
+
+
+def refresh_rollup(conn) -> int:
+    """Fold feedback rows added since the last refresh into the rollup.
+
+    Returns the number of rollup rows written. Concurrent refreshes never
+    count a row twice: on Snowflake the stream is locked by the transaction
+    that consumes it; on SQLite the watermark is advanced with a
+    compare-and-set in the same transaction as the upsert.
+    """
+    if conn.dialect.name == "sqlite":
+        return _refresh_from_watermark(conn)
+    return _refresh_from_stream(conn)
+
+
+def _refresh_from_stream(conn) -> int:
+    # Checked without a warehouse; nothing to merge most of the time
+    if not conn.execute(text(f"SELECT SYSTEM$STREAM_HAS_DATA('{ROLLUP_STREAM}')")).scalar():
+        conn.rollback()
+        return 0
+    delta = _DELTA_SELECT.format(source=ROLLUP_STREAM, condition="METADATA$ACTION = 'INSERT'")
+    try:
+        # The connector autocommits each statement unless a transaction is opened explicitly
+        conn.execute(text("BEGIN"))
+        written = conn.execute(text(_SNOWFLAKE_MERGE.format(delta=delta))).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Rolled up new feedback into {written} rollup rows")
+    return written
+
+
+def _refresh_from_watermark(conn) -> int:
+    low = conn.execute(
+        text("SELECT high_water_id FROM rollup_state WHERE name = :name"), {"name": ROLLUP_NAME}
+    ).scalar() or 0
+    high = conn.execute(text("SELECT MAX(id) FROM feedback")).scalar() or 0
+    if high <= low:
+        conn.rollback()
+        return 0
+
+    delta = _DELTA_SELECT.format(source="feedback", condition="id > :low AND id <= :high")
+    try:
+        claimed = conn.execute(
+            text("UPDATE rollup_state SET high_water_id = :high WHERE name = :name AND high_water_id = :low"),
+            {"high": high, "low": low, "name": ROLLUP_NAME},
+        ).rowcount
+        if claimed != 1:
+            # Another process refreshed first
+            conn.rollback()
+            return 0
+        written = conn.execute(text(_SQLITE_UPSERT.format(delta=delta)), {"low": low, "high": high}).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Rolled up feedback ids {low + 1}..{high}")
+    return written
+
+
+def _where(since: Optional[date], filters: Dict[str, List[str]]):
+    conditions, params = [], {}
+    if since is not None:
+        conditions.append("day >= :since")
+        params["since"] = since
+    for column, values in filters.items():
+        if column not in ROLLUP_KEYS[1:]:
+            raise ValueError(f"Unknown rollup column: {column}")
+        if values:
+            names = [f"{column}_{i}" for i in range(len(values))]
+            conditions.append(f"{column} IN ({', '.join(':' + name for name in names)})")
+            params.update(zip(names, values))
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def daily_trend(conn, since: Optional[date] = None, **filters: List[str]) -> List[Dict[str, Any]]:
+    """Average rating and feedback count per day."""
+    where, params = _where(since, filters)
+    result = conn.execute(text(f"""
+        SELECT day AS date,
+               SUM(rating_sum) * 1.0 / NULLIF(SUM(rating_count), 0) AS avg_rating,
+               SUM(rating_count) AS feedback_count
+        FROM feedback_daily_rollup
+        {where}
+        GROUP BY day
+        ORDER BY day
+    """), params)
+    return [dict(row._mapping) for row in result]
+
+
+def rating_by(conn, column: str, since: Optional[date] = None, **filters: List[str]) -> List[Dict[str, Any]]:
+    """Average rating, feedback count and positive share per value of ``column``."""
+    if column not in ROLLUP_KEYS[1:]:
+        raise ValueError(f"Unknown rollup column: {column}")
+    where, params = _where(since, filters)
+    result = conn.execute(text(f"""
+        SELECT {column},
+               SUM(rating_sum) * 1.0 / NULLIF(SUM(rating_count), 0) AS avg_rating,
+               SUM(rating_count) AS feedback_count,
+               SUM(positive_count) * 1.0 / NULLIF(SUM(rating_count), 0) AS positive_share
+        FROM feedback_daily_rollup
+        {where}
+        GROUP BY {column}
+        ORDER BY {column}
+    """), params)
+    return [dict(row._mapping) for row in result]
@@ -0,0 +1,202 @@
+"""
+Process-wide pooled access to the Snowflake warehouse.
+
+One SQLAlchemy engine per process, shared by every Streamlit session. The pool
+pre-pings connections before handing them out and recycles them before the
+Snowflake session token expires; errors caused by an expired token or a
+dropped connection invalidate the pooled connection so the next checkout
+reconnects. Checkout counts and pool wait times are recorded for sizing.
+
+Usage:
+    provider = get_snowflake_provider(dict(st.secrets["SNOWFLAKE"]))
+    with provider.connection() as conn:        # SQLAlchemy connection
+        conn.execute(text("SELECT 1"))
+    conn = provider.raw_connection()           # DBAPI connection; close() returns it to the pool
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from redaccion.config import WarehouseConfig
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Snowflake error codes meaning the session is gone and a new connection is needed
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+
+def is_session_expired(error: BaseException) -> bool:
+    original = getattr(error, "orig", error)
+    if getattr(original, "errno", None) in SESSION_EXPIRED_ERRNOS:
+        return True
+    message = str(original).lower()
+    return "token has expired" in message or "session no longer exists" in message
+
+
+class PoolStats:
+    """Checkout counts and time spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_total": self.wait_total,
+                "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "wait_max": self.wait_max,
+            }
+
+
+class SnowflakeProvider:
+    """Lazily created pooled engine plus helpers to check out connections."""
+
+    def __init__(self, credentials: Dict[str, str], config: Optional[WarehouseConfig] = None, url: Optional[str] = None):
+        self.credentials = credentials
+        self.config = config or WarehouseConfig.from_env()
+        # Explicit URL for tests or other databases; otherwise built from the credentials
+        self._url = url
+        self._engine = None
+        self._lock = threading.Lock()
+        self.stats = PoolStats()
+
+    def _build_url(self):
+        from snowflake.sqlalchemy import URL
+
+        return URL(
+            account=self.credentials["account"],
+            user=self.credentials["user"],
+            password=self.credentials["password"],
+            warehouse=self.credentials["warehouse"],
+            database=self.credentials["database"],
+            schema=self.credentials["schema"],
+        )
+
+    @property
+    def engine(self):
+        """The shared engine, created on first use."""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+        return self._engine
+
+    def _create_engine(self):
+        from sqlalchemy import create_engine, event
+
+        url = self._url or self._build_url()
+        connect_args = {} if self._url else {"client_session_keep_alive": True}
+        engine = create_engine(
+            url,
+            pool_size=self.config.pool_size,
+            max_overflow=self.config.max_overflow,
+            pool_timeout=self.config.pool_timeout,
+            pool_recycle=self.config.pool_recycle,
+            pool_pre_ping=self.config.pool_pre_ping,
+            connect_args=connect_args,
+        )
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.stats.count("connects")
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.stats.count("invalidations")
+
+        @event.listens_for(engine, "handle_error")
+        def on_error(context):
+            # Treat an expired session like a dropped connection so the pool discards it
+            if is_session_expired(context.original_exception):
+                context.is_disconnect = True
+
+        logger.info(
+            f"Created Snowflake engine (pool_size={self.config.pool_size}, max_overflow={self.config.max_overflow})"
+        )
+        return engine
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """SQLAlchemy connection from the pool."""
+        started = time.perf_counter()
+        conn = self.engine.connect()
+        self.stats.record_wait(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def raw_connection(self):
+        """Pooled DBAPI connection; ``close()`` returns it to the pool.
+
+        The underlying snowflake connector connection (for ``write_pandas``)
+        is ``.driver_connection``.
+        """
+        started = time.perf_counter()
+        conn = self.engine.raw_connection()
+        self.stats.record_wait(time.perf_counter() - started)
+        return conn
+
+    def run(self, fn: Callable[[Any], T]) -> T:
+        """``fn(connection)`` with one retry on a fresh connection if the session expired."""
+        for attempt in (1, 2):
+            try:
+                with self.connection() as conn:
+                    return fn(conn)
+            except Exception as e:
+                if attempt == 2 or not is_session_expired(e):
+                    raise
+                logger.info("Snowflake session expired, retrying on a new connection")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Pool usage for sizing: checkouts, wait times, connections in use."""
+        snapshot = self.stats.snapshot()
+        if self._engine is not None:
+            pool = self._engine.pool
+            snapshot.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return snapshot
+
+    def dispose(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+
+
+_provider: Optional[SnowflakeProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_snowflake_provider(credentials: Optional[Dict[str, str]] = None) -> SnowflakeProvider:
+    """Process-wide provider; ``credentials`` are required on the first call."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if credentials is None:
+                raise RuntimeError("Snowflake credentials are required to create the provider")
+            _provider = SnowflakeProvider(credentials)
+        return _provider
@@ -0,0 +1,344 @@
+"""
+Storage backends for feedback, analytics and model metrics.
+
+The app talks to a :class:`FeedbackStore`, selected with ``STORAGE_BACKEND``:
+
+- ``snowflake`` (default): the pooled warehouse, with feedback spooled
+  locally and sent in batches by the feedback writer.
+- ``sqlite``: a local database file (``SQLITE_PATH``, ``feedback.db`` by
+  default) for development, tests and small deployments. WAL mode, indexes
+  on timestamp and category, fixed parameterized statements that the
+  driver keeps prepared.
+
+Queries in :mod:`redaccion.storage.feedback_queries` and
+:mod:`redaccion.storage.rollup` take a SQLAlchemy connection and run
+unchanged on both backends through :meth:`FeedbackStore.run`.
+
+Usage:
+    store = get_feedback_store(dict(st.secrets.get("SNOWFLAKE", {})))
+    store.ensure_schema()
+    store.save_feedback(5, "Muy clara", text, {"category": "Economía"})
+    page = store.run(lambda conn: fetch_page(conn, filters))
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from redaccion.config import StorageConfig
+from redaccion.monitoring.metrics import record_storage_query, timed
+from redaccion.storage.feedback_writer import SnowflakeFeedbackSink, feedback_row, get_feedback_writer
+from redaccion.storage.query_cache import FEEDBACK, get_query_cache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_LATEST_MODEL_METRICS = """
+    SELECT model_name, model_version, training_accuracy, validation_accuracy, last_updated
+    FROM model_metrics
+    ORDER BY last_updated DESC
+    LIMIT 1
+"""
+
+
+class FeedbackStore:
+    """Interface shared by the storage backends."""
+
+    name = "base"
+    # Snowflake ML training and predictions (tab "Entrenamiento del Modelo")
+    supports_training = False
+
+    def __init__(self):
+        self.counts = {"saved": 0, "queries": 0}
+
+    def ensure_schema(self, apply: bool = True) -> None:
+        raise NotImplementedError
+
+    def save_feedback(self, rating: int, comments: str, generated_text: str, metadata: Dict[str, str]) -> None:
+        raise NotImplementedError
+
+    def run(self, fn: Callable[[Any], T]) -> T:
+        """``fn(connection)`` on a SQLAlchemy connection."""
+        raise NotImplementedError
+
+    def latest_model_metrics(self) -> Optional[Dict[str, Any]]:
+        """Most recent row of ``model_metrics``, or None."""
+        from sqlalchemy import text
+
+        def read(conn):
+            row = conn.execute(text(_LATEST_MODEL_METRICS)).first()
+            return dict(row._mapping) if row is not None else None
+
+        return self.run(read)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Backend name plus ``saved`` and ``queries`` counters."""
+        return dict(self.counts, backend=self.name)
+
+
+class SnowflakeStore(FeedbackStore):
+    """Snowflake warehouse through the shared pooled provider."""
+
+    name = "snowflake"
+    supports_training = True
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+        self._rollup_checked = False
+        self._rollup_lock = threading.Lock()
+
+    def ensure_schema(self, apply: bool = True) -> None:
+        from redaccion.storage.migrations import ensure_schema
+
+        ensure_schema(self.provider.raw_connection, apply=apply)
+        with self._rollup_lock:
+            if not self._rollup_checked:
+                self._rollup_checked = True
+                _refresh_rollup_at_start(self.provider.run)
+
+    def save_feedback(self, rating: int, comments: str, generated_text: str, metadata: Dict[str, str]) -> None:
+        # Stored locally right away; the writer sends it to Snowflake in batches and
+        # invalidates the cached queries once it is there
+        with timed("save_feedback"):
+            get_feedback_writer(SnowflakeFeedbackSink(self.provider)).submit(rating, comments, generated_text, metadata)
+        self.counts["saved"] += 1
+
+    def run(self, fn: Callable[[Any], T]) -> T:
+        self.counts["queries"] += 1
+        record_storage_query(self.name)
+        with timed("storage_query"):
+            return self.provider.run(fn)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.provider.snapshot(), **super().snapshot())
+
+
+# Local schema, mirroring the warehouse tables the app reads
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        rating INTEGER,
+        comments TEXT,
+        generated_text TEXT,
+        category TEXT,
+        subcategory TEXT,
+        text_type TEXT,
+        length TEXT,
+        user_prompt TEXT,
+        sources TEXT,
+        tone TEXT,
+        style TEXT,
+        additional_instructions TEXT
+    )
+    """,
+    # Newest-first history pages and the keyset cursor
+    "CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback (category, timestamp)",
+    """
+    CREATE TABLE IF NOT EXISTS feedback_daily_rollup (
+        day TEXT NOT NULL,
+        category TEXT NOT NULL,
+        subcategory TEXT NOT NULL,
+        text_type TEXT NOT NULL,
+        length TEXT NOT NULL,
+        rating_sum INTEGER NOT NULL,
+        rating_count INTEGER NOT NULL,
+        positive_count INTEGER NOT NULL,
+        PRIMARY KEY (day, category, subcategory, text_type, length)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        high_water_id INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO rollup_state (name, high_water_id) VALUES ('feedback_daily', 0)",
+    """
+    CREATE TABLE IF NOT EXISTS model_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        model_name TEXT,
+        model_version TEXT,
+        training_accuracy REAL,
+        validation_accuracy REAL,
+        last_updated TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS generation_usage (
+        timestamp TEXT NOT NULL,
+        model TEXT,
+        category TEXT,
+        subcategory TEXT,
+        text_type TEXT,
+        length TEXT,
+        candidates INTEGER,
+        cached INTEGER,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        latency_ms INTEGER,
+        cost_usd REAL
+    )
+    """,
+    # Today's spend for the budget check
+    "CREATE INDEX IF NOT EXISTS idx_generation_usage_timestamp ON generation_usage (timestamp)",
+    """
+    CREATE VIEW IF NOT EXISTS usage_by_segment AS
+    SELECT
+        DATE(timestamp) AS day,
+        category,
+        subcategory,
+        text_type,
+        length,
+        model,
+        COUNT(*) AS generations,
+        SUM(cached) AS cached_generations,
+        SUM(prompt_tokens) AS prompt_tokens,
+        SUM(completion_tokens) AS completion_tokens,
+        SUM(cost_usd) AS cost_usd,
+        SUM(latency_ms) AS latency_ms_sum,
+        COUNT(latency_ms) AS timed_generations
+    FROM generation_usage
+    GROUP BY DATE(timestamp), category, subcategory, text_type, length, model
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS usage_daily AS
+    SELECT
+        DATE(timestamp) AS day,
+        model,
+        COUNT(*) AS generations,
+        SUM(prompt_tokens) AS prompt_tokens,
+        SUM(completion_tokens) AS completion_tokens,
+        SUM(cost_usd) AS cost_usd
+    FROM generation_usage
+    GROUP BY DATE(timestamp), model
+    """,
+]
+
+# Columns missing from feedback.db files created before the local backend existed
+SQLITE_ADDED_COLUMNS = ("tone", "style", "additional_instructions")
+
+
+def _refresh_rollup_at_start(run: Callable[[Callable[[Any], T]], T]) -> None:
+    """Roll up feedback stored while no app was running, without waiting for the next save."""
+    from redaccion.storage.rollup import refresh_rollup
+
+    try:
+        run(refresh_rollup)
+    except Exception as e:
+        # The charts lag behind until the next save refreshes the rollup
+        logger.warning(f"Could not refresh the feedback rollup: {str(e)}")
+
+
+class SQLiteStore(FeedbackStore):
+    """Local SQLite database file."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._engine = None
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._insert = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+        return self._engine
+
+    def _create_engine(self):
+        from sqlalchemy import create_engine, event
+
+        engine = create_engine(f"sqlite:///{self.path}", connect_args={"timeout": 30, "check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # Readers never block the writer, and commits skip the full fsync of rollback journals
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        return engine
+
+    def ensure_schema(self, apply: bool = True) -> None:
+        """Create missing tables and columns once per process; later calls return at once."""
+        from sqlalchemy import text
+
+        with self._schema_lock:
+            if self._insert is not None:
+                return
+            with self.engine.connect() as conn:
+                for statement in SQLITE_SCHEMA:
+                    conn.execute(text(statement))
+                existing = {row[1] for row in conn.execute(text("PRAGMA table_info(feedback)"))}
+                for column in SQLITE_ADDED_COLUMNS:
+                    if column not in existing:
+                        conn.execute(text(f"ALTER TABLE feedback ADD COLUMN {column} TEXT"))
+                conn.commit()
+            _refresh_rollup_at_start(self._connected)
+            columns = list(feedback_row(0, "", "", {}))
+            if "synced_at" in existing:
+                # The file is also the feedback writer's spool; rows stored here are never sent to Snowflake
+                columns.append("synced_at")
+            # Built once: the same statement text is reused from the driver's prepared statement cache
+            self._insert = text(
+                f"INSERT INTO feedback ({', '.join(columns)}) VALUES ({', '.join(':' + column for column in columns)})"
+            )
+            logger.info(f"SQLite storage ready at {self.path}")
+
+    def save_feedback(self, rating: int, comments: str, generated_text: str, metadata: Dict[str, str]) -> None:
+        from redaccion.storage.rollup import refresh_rollup
+
+        if self._insert is None:
+            self.ensure_schema()
+        row = dict(feedback_row(rating, comments, generated_text, metadata), synced_at="local")
+        with timed("save_feedback"), self.engine.connect() as conn:
+            conn.execute(self._insert, row)
+            conn.commit()
+            refresh_rollup(conn)
+        get_query_cache().invalidate(FEEDBACK)
+        self.counts["saved"] += 1
+
+    def _connected(self, fn: Callable[[Any], T]) -> T:
+        with self.engine.connect() as conn:
+            return fn(conn)
+
+    def run(self, fn: Callable[[Any], T]) -> T:
+        self.counts["queries"] += 1
+        record_storage_query(self.name)
+        with timed("storage_query"):
+            return self._connected(fn)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(super().snapshot(), path=self.path)
+
+
+def build_store(config: StorageConfig, credentials: Optional[Dict[str, str]] = None) -> FeedbackStore:
+    if config.backend == "sqlite":
+        return SQLiteStore(config.sqlite_path)
+    from redaccion.storage.snowflake import get_snowflake_provider
+
+    return SnowflakeStore(get_snowflake_provider(credentials or None))
+
+
+_store: Optional[FeedbackStore] = None
+_store_lock = threading.Lock()
+
+
+def get_feedback_store(credentials: Optional[Dict[str, str]] = None) -> FeedbackStore:
+    """Process-wide store for the configured backend; Snowflake needs ``credentials`` on the first call."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = build_store(StorageConfig.from_env(), credentials)
+            logger.info(f"Using {_store.name} storage")
+        return _store
@@ -0,0 +1,363 @@
+"""
+Token usage and cost accounting per generation.
+
+Every generation appends one row to ``generation_usage``. The row holds
+the model, the request segment (category, subcategory, text type, length),
+prompt and completion tokens, latency and estimated cost. Rows are
+buffered in memory and a background thread writes them in batches. If the
+process dies, at most one flush interval of accounting is lost; the
+generations themselves are not affected. The ``usage_by_segment`` and
+``usage_daily`` views aggregate the rows, for tuning example counts and
+routing against real numbers.
+
+Cost comes from per-model prices in USD per million tokens
+(``UsageConfig.prices``). Cached generations are recorded at zero tokens
+and zero cost. With a daily budget (``DAILY_BUDGET_USD``), the day's total
+is reread from the table after every write, so it covers all processes.
+Reaching ``BUDGET_ALERT_RATIO`` of the budget, and then the whole budget,
+logs a warning once per UTC day and increments
+``redaccion_budget_alarms_total``.
+
+Usage:
+    recorder = get_usage_recorder(store)      # or open_usage_recorder() outside Streamlit
+    service = GenerationService(config, client, usage=recorder)
+    recorder.budget_status()
+    store.run(lambda conn: usage_by(conn, "text_type", since=date.today() - timedelta(days=30)))
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from redaccion.config import StorageConfig, UsageConfig
+from redaccion.monitoring.metrics import record_budget_alarm, record_cost, record_daily_cost, timed
+from redaccion.storage.query_cache import USAGE, get_query_cache
+
+logger = logging.getLogger(__name__)
+
+USAGE_COLUMNS = (
+    "timestamp", "model", "category", "subcategory", "text_type", "length", "candidates", "cached",
+    "prompt_tokens", "completion_tokens", "latency_ms", "cost_usd",
+)
+USAGE_SEGMENTS = ("category", "subcategory", "text_type", "length", "model")
+
+_INSERT = (
+    f"INSERT INTO generation_usage ({', '.join(USAGE_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + column for column in USAGE_COLUMNS)})"
+)
+
+# Writes rows and returns the stored cost of the given UTC day
+UsageSink = Callable[[List[Dict[str, Any]], date], float]
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def model_price(prices: Dict[str, Tuple[float, float]], model: str) -> Tuple[float, float]:
+    """(prompt, completion) USD per million tokens for the longest matching model prefix."""
+    matches = [prefix for prefix in prices if model.startswith(prefix)]
+    return prices[max(matches, key=len)] if matches else (0.0, 0.0)
+
+
+def usage_row(request, result, prices: Dict[str, Tuple[float, float]]) -> Dict[str, Any]:
+    """``generation_usage`` row for a GenerationRequest and its GenerationResult."""
+    stats = result.stats
+    model = stats.get("model") or ""
+    if result.cached:
+        prompt_tokens = completion_tokens = 0
+        latency = None
+    else:
+        prompt_tokens = int(stats.get("prompt_tokens") or 0)
+        completion_tokens = int(stats.get("completion_tokens") or 0)
+        latency = stats.get("total_duration")
+    prompt_price, completion_price = model_price(prices, model)
+    return {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "model": model,
+        "category": request.category,
+        "subcategory": request.subcategory,
+        "text_type": request.text_type,
+        "length": request.length,
+        "candidates": request.candidates,
+        "cached": int(result.cached),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_ms": round(latency * 1000) if latency is not None else None,
+        "cost_usd": (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000,
+    }
+
+
+def insert_usage(conn, rows: List[Dict[str, Any]]) -> None:
+    from sqlalchemy import text
+
+    conn.execute(text(_INSERT), rows)
+    conn.commit()
+
+
+def cost_on(conn, day: date) -> float:
+    """Estimated cost of the generations of one UTC day."""
+    from sqlalchemy import text
+
+    # A timestamp range rather than DATE(timestamp), so the timestamp index is used
+    return float(conn.execute(
+        text("SELECT COALESCE(SUM(cost_usd), 0) FROM generation_usage WHERE timestamp >= :start AND timestamp < :end"),
+        {"start": day.isoformat(), "end": (day + timedelta(days=1)).isoformat()},
+    ).scalar() or 0)
+
+
+def usage_by(conn, column: str, since: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Generations, tokens, cost and latency per value of ``column`` (a segment or the model)."""
+    from sqlalchemy import text
+
+    if column not in USAGE_SEGMENTS:
+        raise ValueError(f"Unknown usage segment: {column}")
+    where, params = ("WHERE day >= :since", {"since": since}) if since is not None else ("", {})
+    result = conn.execute(text(f"""
+        SELECT {column},
+               SUM(generations) AS generations,
+               SUM(cached_generations) AS cached_generations,
+               SUM(prompt_tokens) AS prompt_tokens,
+               SUM(completion_tokens) AS completion_tokens,
+               SUM(cost_usd) AS cost_usd,
+               SUM(cost_usd) / NULLIF(SUM(generations) - SUM(cached_generations), 0) AS cost_per_generation,
+               SUM(latency_ms_sum) * 1.0 / NULLIF(SUM(timed_generations), 0) AS avg_latency_ms
+        FROM usage_by_segment
+        {where}
+        GROUP BY {column}
+        ORDER BY cost_usd DESC
+    """), params)
+    return [dict(row._mapping) for row in result]
+
+
+def daily_usage(conn, since: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Generations, tokens and cost per day and model."""
+    from sqlalchemy import text
+
+    where, params = ("WHERE day >= :since", {"since": since}) if since is not None else ("", {})
+    result = conn.execute(text(f"SELECT * FROM usage_daily {where} ORDER BY day, model"), params)
+    return [dict(row._mapping) for row in result]
+
+
+class StoreUsageSink:
+    """Writes usage rows through a FeedbackStore (Snowflake or SQLite) on one connection."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, rows: List[Dict[str, Any]], day: date) -> float:
+        def write(conn):
+            if rows:
+                insert_usage(conn, rows)
+            return cost_on(conn, day)
+
+        return self.store.run(write)
+
+
+class UsageRecorder:
+    """In-memory buffer of usage rows plus a background thread writing them to ``sink`` in batches."""
+
+    def __init__(self, sink: UsageSink, config: Optional[UsageConfig] = None, max_backoff: float = 300.0):
+        self.sink = sink
+        self.config = config or UsageConfig()
+        self.max_backoff = max_backoff
+        # Rows kept while the database is unreachable; the oldest are dropped beyond this
+        self.max_buffered = self.config.batch_size * 100
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._day = _utc_today()
+        self._stored_cost: Optional[float] = None  # Cost of _day in the table (all processes), once read
+        self._pending_cost = 0.0  # Cost of _day still in the buffer
+        self._alarms = set()
+        self.counts = {"recorded": 0, "written": 0, "batches": 0, "failures": 0, "dropped": 0}
+        self.last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="usage-recorder", daemon=True)
+        self._thread.start()
+
+    def _roll_day(self, today: date) -> None:
+        """Reset the daily totals at UTC midnight; call with the lock held."""
+        if today != self._day:
+            self._day = today
+            self._stored_cost = None
+            self._pending_cost = 0.0
+            self._alarms = set()
+
+    def _spent(self) -> float:
+        return (self._stored_cost or 0.0) + self._pending_cost
+
+    def record(self, request, result) -> None:
+        """Buffer one generation's usage; never raises into the generation path."""
+        try:
+            row = usage_row(request, result, self.config.prices)
+        except Exception as e:
+            logger.warning(f"Could not record generation usage: {str(e)}")
+            return
+        with self._lock:
+            self._roll_day(_utc_today())
+            self._buffer.append(row)
+            self._pending_cost += row["cost_usd"]
+            self.counts["recorded"] += 1
+            spent = self._spent()
+            full = len(self._buffer) >= self.config.batch_size
+        record_cost(row["model"], row["cost_usd"])
+        record_daily_cost(spent)
+        self._check_budget(spent)
+        if full and self.last_error is None:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write every buffered row; returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                today = _utc_today()
+                self._roll_day(today)
+                seeded = self._stored_cost is not None
+            if not rows and seeded:
+                return 0
+            stored = None
+            try:
+                # An empty first write reads the day's total so far (e.g. after a restart)
+                for start in range(0, max(len(rows), 1), self.config.batch_size):
+                    batch = rows[start:start + self.config.batch_size]
+                    with timed("usage_flush"):
+                        stored = self.sink(batch, today)
+                    written += len(batch)
+                    if batch:
+                        self.counts["batches"] += 1
+            except Exception:
+                with self._lock:
+                    self._buffer[:0] = rows[written:]
+                    overflow = len(self._buffer) - self.max_buffered
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        self.counts["dropped"] += overflow
+                        logger.warning(f"Dropped {overflow} usage rows while the database is unreachable")
+                raise
+            finally:
+                self.counts["written"] += written
+            if written:
+                get_query_cache().invalidate(USAGE)
+            with self._lock:
+                self._roll_day(_utc_today())
+                if self._day == today:
+                    self._stored_cost = stored
+                    # Rows recorded while writing are still pending
+                    prefix = today.isoformat()
+                    self._pending_cost = sum(
+                        row["cost_usd"] for row in self._buffer if row["timestamp"].startswith(prefix)
+                    )
+                spent = self._spent()
+        record_daily_cost(spent)
+        self._check_budget(spent)
+        return written
+
+    def _check_budget(self, spent: float) -> None:
+        budget = self.config.daily_budget
+        if budget is None:
+            return
+        for level, ratio in (("warning", self.config.alert_ratio), ("exceeded", 1.0)):
+            if spent < budget * ratio:
+                continue
+            with self._lock:
+                if level in self._alarms:
+                    continue
+                self._alarms.add(level)
+            if level == "exceeded":
+                logger.warning(f"Daily generation budget exceeded: ${spent:.2f} of ${budget:.2f}")
+            else:
+                logger.warning(f"Generation cost today is ${spent:.2f}, {spent / budget:.0%} of the ${budget:.2f} daily budget")
+            record_budget_alarm(level)
+
+    def budget_status(self) -> Dict[str, Any]:
+        """Today's estimated cost against the daily budget; ``level`` is ok, warning or exceeded."""
+        budget = self.config.daily_budget
+        with self._lock:
+            self._roll_day(_utc_today())
+            spent = self._spent()
+            day = self._day
+        level = None
+        if budget is not None:
+            level = "exceeded" if spent >= budget else "warning" if spent >= budget * self.config.alert_ratio else "ok"
+        return {
+            "day": day.isoformat(),
+            "spent": spent,
+            "budget": budget,
+            "ratio": spent / budget if budget else None,
+            "level": level,
+        }
+
+    def _run(self) -> None:
+        delay = self.config.flush_interval
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.last_error = None
+                delay = self.config.flush_interval
+            except Exception as e:
+                self.counts["failures"] += 1
+                self.last_error = str(e)
+                delay = min(self.max_backoff, max(delay, self.config.flush_interval) * 2)
+                logger.warning(f"Usage flush failed, retrying in {delay:.0f}s: {str(e)}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the background thread after a last write attempt."""
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Final usage flush failed, {len(self._buffer)} rows lost: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return dict(self.counts, buffered=buffered, last_error=self.last_error)
+
+
+_recorder: Optional[UsageRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_usage_recorder(store=None) -> UsageRecorder:
+    """Process-wide usage recorder; ``store`` is required on the first call."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            if store is None:
+                raise RuntimeError("A store is required to create the usage recorder")
+            _recorder = UsageRecorder(StoreUsageSink(store), UsageConfig.from_env())
+            # Buffered rows are written on a normal shutdown
+            atexit.register(_recorder.close)
+        return _recorder
+
+
+def open_usage_recorder() -> Optional[UsageRecorder]:
+    """Process-wide recorder on the configured store, for the HTTP API and the batch CLI.
+
+    Returns None (logged) when the store is unavailable; generation goes on without accounting.
+    """
+    from redaccion.storage.store import get_feedback_store
+
+    try:
+        credentials = None
+        if StorageConfig.from_env().backend == "snowflake":
+            # Outside the app the warehouse credentials still come from .streamlit/secrets.toml
+            import streamlit as st
+
+            credentials = dict(st.secrets["SNOWFLAKE"])
+        store = get_feedback_store(credentials)
+        store.ensure_schema(apply=os.getenv("AUTO_MIGRATE", "true").lower() == "true")
+        return get_usage_recorder(store)
+    except Exception as e:
+        logger.warning(f"Usage accounting disabled: {str(e)}")
+        return None
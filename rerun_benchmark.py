@@ -0,0 +1,142 @@
+"""
+Storage queries per UI interaction.
+
+Drives the Streamlit app headlessly (``streamlit.testing``) against a
+temporary SQLite database seeded with feedback, performs a fixed sequence
+of interactions and reports how many storage queries each one ran. Run it
+on an older ``app.py`` to compare before and after a change.
+
+The test runner always reruns the whole script, so interactions inside a
+fragment are measured as full reruns; with lazily rendered tabs the closed
+tabs add no queries, so the count is the same.
+
+Usage:
+    python rerun_benchmark.py                            # app.py, table output
+    python rerun_benchmark.py --json
+    git show HEAD~1:app.py > app_before.py && python rerun_benchmark.py app_before.py
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+HISTORY_TAB = "Historial de Feedback"
+TRAINING_TAB = "Entrenamiento del Modelo"
+GENERATION_TAB = "Generar Texto"
+TAB_KEY = "main_tab"
+
+
+def _widget(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _type_prompt(text: str) -> Callable:
+    def action(at):
+        _widget(at.text_area, "Escribe instrucciones para generar tu nota:").input(text)
+    return action
+
+
+def _filter_category(at):
+    multiselect = _widget(at.multiselect, "Filtrar por categoría")
+    multiselect.select(multiselect.options[0])
+
+
+def _next_page(at):
+    _widget(at.button, "Siguientes →").click()
+
+
+def _nothing(at):
+    pass
+
+
+# (interaction, tab open while it happens, widget action)
+INTERACTIONS: List[Tuple[str, str, Callable]] = [
+    ("initial load", GENERATION_TAB, _nothing),
+    ("type prompt", GENERATION_TAB, _type_prompt("Escribe una nota sobre el tipo de cambio")),
+    ("open history tab", HISTORY_TAB, _nothing),
+    ("filter by category", HISTORY_TAB, _filter_category),
+    ("next history page", HISTORY_TAB, _next_page),
+    ("open training tab", TRAINING_TAB, _nothing),
+    ("back to generation tab", GENERATION_TAB, _nothing),
+    ("type prompt again", GENERATION_TAB, _type_prompt("Escribe una crónica sobre el puerto")),
+]
+
+
+def seed(store, rows: int) -> None:
+    categories = ["Economía", "Política", "Energía", "Sociedad"]
+    text_types = ["Nota Periodística", "Artículo", "Crónica"]
+    for i in range(rows):
+        store.save_feedback(1 + i % 5, f"Comentario {i}", f"Texto generado {i}", {
+            "category": categories[i % len(categories)],
+            "text_type": text_types[i % len(text_types)],
+            "length": "media",
+        })
+
+
+def run(script_path: str, rows: int = 200, timeout: float = 60) -> Dict:
+    """Queries per interaction for ``script_path`` on a fresh SQLite database with ``rows`` feedback rows."""
+    workdir = tempfile.mkdtemp(prefix="rerun_benchmark_")
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "feedback.db")
+    # The app imports the local packages from the project root
+    sys.path.insert(0, os.getcwd())
+
+    from streamlit.testing.v1 import AppTest
+    from redaccion.storage.store import get_feedback_store
+
+    store = get_feedback_store()
+    store.ensure_schema()
+    seed(store, rows)
+
+    at = AppTest.from_file(os.path.abspath(script_path), default_timeout=timeout)
+    at.secrets["OPENAI"] = {"api_key": "benchmark"}
+    results = []
+    for name, tab, action in INTERACTIONS:
+        if results:
+            action(at)
+        # The test runner does not keep the selected tab between runs; apps that
+        # render every tab ignore the key
+        at.session_state[TAB_KEY] = tab
+        before = store.counts["queries"]
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        results.append({"interaction": name, "queries": store.counts["queries"] - before})
+    return {
+        "script": script_path,
+        "feedback_rows": rows,
+        "interactions": results,
+        "total_queries": sum(result["queries"] for result in results),
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"Storage queries per interaction in {report['script']} ({report['feedback_rows']} feedback rows)")
+    print(f"{'interaction':<28} {'queries':>8}")
+    for result in report["interactions"]:
+        print(f"{result['interaction']:<28} {result['queries']:>8}")
+    print(f"{'total':<28} {report['total_queries']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report storage queries per UI interaction")
+    parser.add_argument("script", nargs="?", default="app.py", help="Streamlit script to drive")
+    parser.add_argument("--rows", type=int, default=200, help="Feedback rows to seed")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.script, rows=args.rows)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
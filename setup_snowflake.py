@@ -2,6 +2,8 @@ import snowflake.connector
 import streamlit as st
 import os
 
+from redaccion.storage.migrations import apply_migrations
+
 def setup_snowflake():
     try:
         # Connect to Snowflake
@@ -22,53 +24,9 @@ def setup_snowflake():
         cur.execute(f"CREATE SCHEMA IF NOT EXISTS {st.secrets['SNOWFLAKE']['schema']}")
         cur.execute(f"USE SCHEMA {st.secrets['SNOWFLAKE']['schema']}")
         
-        # Create tables
-        print("Creating tables...")
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id NUMBER AUTOINCREMENT,
-                timestamp TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
-                rating NUMBER,
-                comments TEXT,
-                generated_text TEXT,
-                category TEXT,
-                text_type TEXT,
-                length TEXT,
-                sources TEXT,
-                tone TEXT,
-                style TEXT,
-                additional_instructions TEXT
-            )
-        """)
-        
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS model_metrics (
-                id NUMBER AUTOINCREMENT,
-                model_name TEXT,
-                model_version TEXT,
-                training_accuracy FLOAT,
-                validation_accuracy FLOAT,
-                last_updated TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
-            )
-        """)
-        
-        # Create views
-        print("Creating views...")
-        cur.execute("""
-            CREATE OR REPLACE VIEW feedback_analytics AS
-            SELECT 
-                category,
-                text_type,
-                length,
-                tone,
-                style,
-                AVG(rating) as avg_rating,
-                COUNT(*) as feedback_count,
-                COUNT(CASE WHEN rating >= 4 THEN 1 END) as positive_feedback_count,
-                MAX(timestamp) as last_feedback_time
-            FROM feedback
-            GROUP BY category, text_type, length, tone, style
-        """)
+        # Create tables and views
+        print("Applying schema migrations...")
+        apply_migrations(conn)
         
         # Grant permissions
         print("Setting up permissions...")
@@ -0,0 +1,142 @@
+"""
+Startup import benchmark.
+
+Runs the module-level imports of a script (app.py by default) in a fresh
+interpreter with ``-X importtime`` and reports how long each top-level
+import takes, so a new eager import of a heavy module shows up immediately.
+
+Usage:
+    python startup_benchmark.py                     # app.py, table output
+    python startup_benchmark.py api/main.py --json  # machine-readable
+    python startup_benchmark.py --budget 1500       # exit 1 if imports take more than 1.5s
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Modules that should only load on first use, never at startup
+HEAVY_MODULES = (
+    "snowflake", "sqlalchemy", "pandas", "plotly", "reportlab", "docx", "fpdf", "torch", "transformers",
+)
+
+
+def top_level_imports(script_path: str) -> str:
+    """Source of the import statements at module level of ``script_path``."""
+    with open(script_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in imports)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Entries of ``-X importtime`` output as dicts (times in ms)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        # "import time:   self_us |   cumulative_us | <2 spaces per nesting level>module"
+        head, cumulative_us, name = line.split("|", 2)
+        self_us = head.split(":", 1)[1]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": depth,
+        })
+    return entries
+
+
+def run_once(code: str, cwd: str) -> Dict:
+    timed = (
+        "import time as _t\n_start = _t.perf_counter()\n"
+        f"{code}\n"
+        "import sys as _s\n_s.stdout.write(repr(_t.perf_counter() - _start))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", timed],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        raise RuntimeError(f"Imports failed: {error}")
+    entries = parse_importtime(completed.stderr)
+    return {"total_ms": float(completed.stdout) * 1000, "entries": entries}
+
+
+def benchmark(script_path: str, runs: int = 3) -> Dict:
+    """Median import times of ``script_path``'s top-level imports over ``runs`` fresh interpreters."""
+    code = top_level_imports(script_path)
+    # Run from the current directory (the project root) so local packages resolve as they do for the app
+    results = [run_once(code, os.getcwd()) for _ in range(runs)]
+
+    per_module: Dict[str, List[float]] = {}
+    for result in results:
+        for entry in result["entries"]:
+            if entry["depth"] == 0:
+                per_module.setdefault(entry["module"], []).append(entry["cumulative_ms"])
+    modules = sorted(
+        ({"module": name, "cumulative_ms": statistics.median(times)} for name, times in per_module.items()),
+        key=lambda item: item["cumulative_ms"],
+        reverse=True,
+    )
+    # -X importtime lists submodules before the import that pulled them in
+    heavy: Dict[str, str] = {}
+    pending: List[str] = []
+    for entry in results[0]["entries"]:
+        pending.append(entry["module"])
+        if entry["depth"] == 0:
+            for name in pending:
+                if name in HEAVY_MODULES:
+                    heavy.setdefault(name, entry["module"])
+            pending = []
+    return {
+        "script": script_path,
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "total_ms": statistics.median(result["total_ms"] for result in results),
+        "modules": modules,
+        "heavy_modules_loaded": heavy,
+    }
+
+
+def print_report(report: Dict, top: int) -> None:
+    print(f"Startup imports of {report['script']} (median of {report['runs']} runs): {report['total_ms']:.0f} ms")
+    print(f"{'module':<40} {'ms':>9}")
+    for item in report["modules"][:top]:
+        print(f"{item['module']:<40} {item['cumulative_ms']:>9.1f}")
+    if report["heavy_modules_loaded"]:
+        loaded = ", ".join(f"{name} (via {via})" for name, via in report["heavy_modules_loaded"].items())
+        print(f"Heavy modules loaded at startup: {loaded}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time per module at startup")
+    parser.add_argument("script", nargs="?", default="app.py", help="Script whose top-level imports are measured")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to run (median is reported)")
+    parser.add_argument("--top", type=int, default=25, help="Modules to show in the table")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--budget", type=float, help="Fail if total import time exceeds this many ms")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.script, runs=args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
+
+    if args.budget is not None and report["total_ms"] > args.budget:
+        print(f"Startup imports took {report['total_ms']:.0f} ms, over the {args.budget:.0f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
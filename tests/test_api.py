@@ -0,0 +1,32 @@
+from urllib.parse import unquote
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+client = TestClient(app)
+
+
+def test_export_filename_is_safe_in_the_header():
+    response = client.post(
+        "/export/pdf", json={"text": "Texto de prueba.", "filename": 'Nota "Año nuevo"\r\nX-Injected: sí 日本'},
+    )
+
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    header = response.headers["content-disposition"]
+    assert "\r" not in header and "\n" not in header
+    assert "X-Injected" not in response.headers
+    assert header.startswith('attachment; filename="Nota _Ano nuevo_ X-Injected_ si.pdf"; ')
+    assert header.encode("latin-1").decode("ascii") == header
+    encoded = header.split("filename*=UTF-8''", 1)[1]
+    assert unquote(encoded) == 'Nota "Año nuevo" X-Injected: sí 日本.pdf'
+
+
+def test_export_default_filename():
+    response = client.post("/export/docx", json={"text": "Texto de prueba."})
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == (
+        "attachment; filename=\"texto_generado.docx\"; filename*=UTF-8''texto_generado.docx"
+    )
@@ -0,0 +1,74 @@
+import pytest
+
+from redaccion.export import cache
+from redaccion.export.cache import ExportCache
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+
+    def render_document(text, export_format):
+        calls.append((text, export_format))
+        return f"{export_format}:{text}".encode("utf-8")
+
+    monkeypatch.setattr(cache, "render_document", render_document)
+    return calls
+
+
+def test_repeated_renders_are_served_from_the_cache(renders):
+    exports = ExportCache()
+    assert exports.render("Texto", "pdf") == b"pdf:Texto"
+    assert exports.renderer("Texto", "pdf")() == b"pdf:Texto"
+
+    assert renders == [("Texto", "pdf")]
+    assert (exports.hits, exports.misses) == (1, 1)
+
+
+def test_a_new_text_or_format_is_rendered_again(renders):
+    exports = ExportCache()
+    exports.render("Texto", "pdf")
+    exports.render("Texto", "docx")
+    exports.render("Texto editado", "pdf")
+
+    assert renders == [("Texto", "pdf"), ("Texto", "docx"), ("Texto editado", "pdf")]
+    assert exports.key("Texto", "pdf") != exports.key("Texto", "docx")
+    assert exports.key("Texto", "pdf") != exports.key("Texto editado", "pdf")
+    with pytest.raises(ValueError):
+        exports.render("Texto", "odt")
+
+
+def test_least_recently_used_entries_are_evicted_first(renders):
+    exports = ExportCache(max_entries=2)
+    exports.render("uno", "pdf")
+    exports.render("dos", "pdf")
+    exports.render("uno", "pdf")  # Now the most recently used
+    exports.render("tres", "pdf")
+
+    renders.clear()
+    exports.render("uno", "pdf")
+    exports.render("tres", "pdf")
+    assert renders == []
+    exports.render("dos", "pdf")
+    assert renders == [("dos", "pdf")]
+
+
+def test_the_cache_is_bounded_by_size(renders):
+    # Each rendering is "pdf:" plus the text, 10 bytes here
+    exports = ExportCache(max_bytes=25)
+    for text in ("aaaaaa", "bbbbbb", "cccccc"):
+        exports.render(text, "pdf")
+    assert exports._size == 20 and len(exports._entries) == 2
+
+    exports.render("x" * 30, "pdf")  # Larger than the whole cache: returned, not kept
+    assert exports._size == 20
+
+    renders.clear()
+    exports.render("aaaaaa", "pdf")
+    assert renders == [("aaaaaa", "pdf")]
+
+
+def test_documents_are_rendered():
+    exports = ExportCache()
+    assert exports.render("Título\n\nPrimer párrafo.", "pdf").startswith(b"%PDF")
+    assert exports.render("Título\n\nPrimer párrafo.", "docx").startswith(b"PK")
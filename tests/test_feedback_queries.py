@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import text
+
+from redaccion.storage.feedback_queries import HistoryFilters, fetch_detail, fetch_page, fetch_summary
+from redaccion.storage.store import SQLiteStore
+
+CATEGORIES = ["Economía", "Energía", "Comercio"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "feedback.db"))
+    store.ensure_schema()
+    with store.engine.connect() as conn:
+        for i in range(23):
+            conn.execute(
+                text("""
+                    INSERT INTO feedback (timestamp, rating, category, text_type, generated_text)
+                    VALUES (:timestamp, :rating, :category, :text_type, :generated_text)
+                """),
+                {
+                    # Groups of four rows share a timestamp, so pages break inside a group
+                    "timestamp": f"2026-10-{1 + i // 4:02d} 12:00:00",
+                    "rating": 1 + i % 5,
+                    "category": CATEGORIES[i % 3],
+                    "text_type": "Artículo" if i % 2 else "Crónica",
+                    "generated_text": f"texto {i}",
+                },
+            )
+        conn.commit()
+    return store
+
+
+def read_all(store, filters=None, limit=5):
+    pages, cursor = [], None
+    while True:
+        page = store.run(lambda conn: fetch_page(conn, filters, cursor=cursor, limit=limit))
+        pages.append(page.rows)
+        if not page.has_more:
+            return pages
+        cursor = page.next_cursor
+
+
+def newest_first(store, where="", params=None):
+    rows = store.run(lambda conn: conn.execute(
+        text(f"SELECT id FROM feedback {where} ORDER BY timestamp DESC, id DESC"), params or {}
+    ).all())
+    return [row[0] for row in rows]
+
+
+def test_pages_continue_across_equal_timestamps(store):
+    pages = read_all(store, limit=5)
+
+    ids = [row["id"] for rows in pages for row in rows]
+    assert [len(rows) for rows in pages] == [5, 5, 5, 5, 3]
+    assert len(set(ids)) == 23
+    assert ids == newest_first(store)
+    assert "generated_text" not in pages[0][0]
+
+
+def test_pages_follow_the_category_filter(store):
+    filters = HistoryFilters(categories=["Economía", "Comercio"])
+    pages = read_all(store, filters, limit=4)
+
+    ids = [row["id"] for rows in pages for row in rows]
+    assert ids == newest_first(store, "WHERE category IN ('Economía', 'Comercio')")
+    assert {row["category"] for rows in pages for row in rows} == {"Economía", "Comercio"}
+    assert store.run(lambda conn: fetch_summary(conn, filters))["total"] == len(ids)
+
+
+def test_an_exact_last_page_has_no_cursor(store):
+    filters = HistoryFilters(categories=["Energía"], text_types=["Artículo"])
+    expected = newest_first(store, "WHERE category = 'Energía' AND text_type = 'Artículo'")
+
+    page = store.run(lambda conn: fetch_page(conn, filters, limit=len(expected)))
+    assert [row["id"] for row in page.rows] == expected
+    assert not page.has_more
+
+
+def test_detail_has_the_generated_text(store):
+    first = store.run(lambda conn: fetch_page(conn, limit=1)).rows[0]
+    detail = store.run(lambda conn: fetch_detail(conn, first["id"]))
+
+    assert detail["generated_text"] == f"texto {first['id'] - 1}"
+    assert store.run(lambda conn: fetch_detail(conn, 999)) is None
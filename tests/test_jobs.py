@@ -0,0 +1,241 @@
+import threading
+import time
+
+import pytest
+
+from redaccion.config import JobsConfig
+from redaccion.generation.backends import Backend
+from redaccion.generation.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue, JobRejected
+from redaccion.generation.resilience import CircuitBreaker, ResilientCaller
+from redaccion.generation.service import GenerationRequest, GenerationResult
+from redaccion.generation.streaming import GenerationStats
+
+
+def request(prompt="Escribe una nota", candidates=1):
+    return GenerationRequest("Economía", "Finanzas", "Nota Periodística", "corta", prompt, candidates=candidates)
+
+
+class FakeStream:
+    def __init__(self, service, request):
+        self.service = service
+        self.request = request
+        self.result = None
+
+    def __iter__(self):
+        parts = []
+
+        def chunks(timeout):
+            for i in range(self.service.chunks):
+                time.sleep(self.service.delay)
+                yield f"palabra{i} "
+
+        for delta in self.service.caller.stream(chunks):
+            parts.append(delta)
+            yield delta
+        self.result = GenerationResult(text="".join(parts), stats={}, prompt={})
+
+
+class FakeService:
+    """Streams numbered words through a ResilientCaller, like an OpenAI backend."""
+
+    def __init__(self, breaker=None, chunks=3, delay=0.001):
+        self.breaker = breaker or CircuitBreaker("fake")
+        self.caller = ResilientCaller(self.breaker, max_retries=0)
+        self.chunks = chunks
+        self.delay = delay
+
+    def stream(self, request):
+        return FakeStream(self, request)
+
+    def generate(self, request):
+        if request.prompt == "falla":
+            raise RuntimeError("upstream error")
+        return GenerationResult(text="versión", stats={}, prompt={}, candidates=[{"text": "versión"}])
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(service, **config):
+        queue = JobQueue(service, JobsConfig(**config))
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_job_streams_progress_and_finishes(make_queue):
+    queue = make_queue(FakeService(chunks=3))
+    job = queue.submit(request(), owner="ana")
+    wait_until(lambda: job.finished)
+
+    assert job.status == DONE
+    assert job.text == "palabra0 palabra1 palabra2 "
+    queue.forget(job.id)
+    assert queue.get(job.id) is None
+
+
+def test_multi_candidate_jobs_and_failures(make_queue):
+    queue = make_queue(FakeService())
+    ranked = queue.submit(request(candidates=2), owner="ana")
+    failed = queue.submit(request("falla", candidates=2), owner="ana")
+    wait_until(lambda: ranked.finished and failed.finished)
+
+    assert ranked.status == DONE and ranked.result.candidates
+    assert failed.status == FAILED and "upstream error" in failed.error
+
+
+def test_cancelling_a_running_job_stops_its_stream(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005))
+    job = queue.submit(request(), owner="ana")
+    wait_until(lambda: job.parts)
+
+    assert queue.cancel(job.id)
+    wait_until(lambda: job.finished)
+    assert job.status == CANCELLED
+    assert job.result is None
+    assert len(job.parts) < 1000
+    assert not queue.cancel(job.id)
+
+
+def test_cancelling_a_queued_job_removes_it_from_the_queue(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005), workers=1)
+    running = queue.submit(request(), owner="ana")
+    queued = queue.submit(request(), owner="bob")
+    wait_until(lambda: running.parts)
+    assert queued.status == QUEUED and queue.position(queued) == 0
+
+    assert queue.cancel(queued.id)
+    assert queued.status == CANCELLED
+    assert queue.snapshot()["queued"] == 0
+
+
+def test_a_cancelled_probe_does_not_keep_the_circuit_open(make_queue):
+    breaker = CircuitBreaker("fake", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    service = FakeService(breaker, chunks=1000, delay=0.005)
+    queue = make_queue(service)
+
+    # The first job is the half-open probe; cancelling it must settle the breaker
+    probe = queue.submit(request(), owner="ana")
+    wait_until(lambda: probe.parts)
+    queue.cancel(probe.id)
+    wait_until(lambda: probe.finished)
+
+    service.chunks = 3
+    job = queue.submit(request(), owner="ana")
+    wait_until(lambda: job.finished)
+    assert job.status == DONE, job.error
+    assert breaker.state == "closed"
+
+
+class GatedBackend(Backend):
+    """Each candidate is a blocking call that returns once ``gate`` is set."""
+
+    def __init__(self):
+        super().__init__("fake", "fake-model", 1.0)
+        self.gate = threading.Event()
+        self.calls = 0
+
+    def complete(self, messages, stats, length, **params):
+        self.calls += 1
+        self.gate.wait(5)
+        return f"versión {self.calls}"
+
+
+class CandidatesService(FakeService):
+    """Generates multiple candidates one blocking call at a time, like a local model."""
+
+    def __init__(self):
+        super().__init__()
+        self.backend = GatedBackend()
+
+    def generate(self, request):
+        stats = GenerationStats(model="fake-model")
+        texts = self.backend.complete_candidates([], stats, request.candidates, request.length)
+        return GenerationResult(text=texts[0], stats={}, prompt={}, candidates=[{"text": t} for t in texts])
+
+
+def test_a_cancelled_job_counts_until_its_worker_finishes(make_queue):
+    service = CandidatesService()
+    queue = make_queue(service, per_user=1)
+    job = queue.submit(request(candidates=3), owner="ana")
+    wait_until(lambda: service.backend.calls == 1)
+
+    # The first candidate's call is still in flight
+    assert queue.cancel(job.id)
+    assert job.status == RUNNING
+    with pytest.raises(JobRejected) as rejected:
+        queue.submit(request(), owner="ana")
+    assert rejected.value.reason == "user_limit"
+
+    service.backend.gate.set()
+    wait_until(lambda: job.finished)
+    assert job.status == CANCELLED and job.result is None
+    # No further candidates were requested after the cancellation
+    assert service.backend.calls == 1
+    assert queue.submit(request(), owner="ana").owner == "ana"
+
+
+def test_replacing_a_job_within_the_per_user_limit(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005), per_user=1)
+    first = queue.submit(request(), owner="ana")
+    wait_until(lambda: first.parts)
+    with pytest.raises(JobRejected):
+        queue.submit(request(), owner="ana")
+
+    # The stream stops at its next chunk, which frees the slot for the new request
+    queue.cancel(first.id)
+    wait_until(lambda: first.finished)
+    assert first.status == CANCELLED
+    second = queue.submit(request(), owner="ana")
+    assert second.status in (QUEUED, RUNNING)
+
+
+def test_per_user_limit(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005), workers=2, per_user=2)
+    jobs = [queue.submit(request(), owner="ana") for _ in range(2)]
+    with pytest.raises(JobRejected) as rejected:
+        queue.submit(request(), owner="ana")
+    assert rejected.value.reason == "user_limit"
+
+    # Other editors are not affected, and a slot frees up when a job ends
+    assert queue.submit(request(), owner="bob").owner == "bob"
+    queue.cancel(jobs[0].id)
+    wait_until(lambda: jobs[0].finished)
+    assert queue.submit(request(), owner="ana").owner == "ana"
+
+
+def test_queue_is_bounded(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005), workers=1, queue_size=1, per_user=5)
+    running = queue.submit(request(), owner="ana")
+    wait_until(lambda: running.parts)
+    queue.submit(request(), owner="bob")
+    with pytest.raises(JobRejected) as rejected:
+        queue.submit(request(), owner="carla")
+    assert rejected.value.reason == "queue_full"
+
+
+def test_close_cancels_pending_jobs_and_stops_the_workers(make_queue):
+    queue = make_queue(FakeService(chunks=1000, delay=0.005), workers=1)
+    running = queue.submit(request(), owner="ana")
+    queued = queue.submit(request(), owner="bob")
+    wait_until(lambda: running.parts)
+
+    queue.close()
+    wait_until(lambda: running.finished)
+    assert running.status == CANCELLED and queued.status == CANCELLED
+    wait_until(lambda: not any(worker.is_alive() for worker in queue._workers))
+    with pytest.raises(JobRejected):
+        queue.submit(request(), owner="ana")
@@ -0,0 +1,14 @@
+import logging
+import sys
+
+from redaccion.storage import migrations
+
+
+def test_release_without_a_warehouse_does_nothing(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    # Any attempt to connect to Snowflake would fail the import
+    monkeypatch.setitem(sys.modules, "snowflake.connector", None)
+
+    migrations.main([])
+    assert "no warehouse migrations to apply" in caplog.text
@@ -0,0 +1,74 @@
+import pytest
+
+from redaccion.generation import prompt_builder
+from redaccion.generation.prompt_builder import TRUNCATION_MARK, PromptBuilder, count_tokens
+
+MODEL = "gpt-4-turbo-preview"
+
+
+def example(words, word="palabra"):
+    return {"text": " ".join(f"{word}{i}" for i in range(words)), "source": f"{word}-{words}"}
+
+
+def build(builder, examples):
+    return builder.build("Economía", "Finanzas", "Nota Periodística", "corta", "Escribe una nota", examples=examples)
+
+
+def base_tokens():
+    return build(PromptBuilder(MODEL, token_budget=100_000), []).prompt_tokens
+
+
+@pytest.fixture(params=["tiktoken", "estimate"])
+def tokenizer(request, monkeypatch):
+    if request.param == "estimate":
+        # As if tiktoken were not installed: tokens are estimated from characters
+        monkeypatch.setattr(prompt_builder, "tiktoken", None)
+    elif prompt_builder.tiktoken is None:
+        pytest.skip("tiktoken is not installed")
+    prompt_builder._encoding.cache_clear()
+    yield request.param
+    prompt_builder._encoding.cache_clear()
+
+
+def test_examples_that_fit_are_kept_whole(tokenizer):
+    examples = [example(20, "uno"), example(20, "dos")]
+    built = build(PromptBuilder(MODEL, token_budget=100_000), examples)
+
+    assert (built.examples_used, built.examples_truncated, built.examples_dropped) == (2, 0, 0)
+    assert built.example_sources == ["uno-20", "dos-20"]
+    assert examples[1]["text"] in built.system_prompt
+
+
+def test_the_example_over_the_budget_is_truncated_and_the_rest_dropped(tokenizer):
+    budget = base_tokens() + 400
+    examples = [example(50, "uno"), example(2000, "dos"), example(20, "tres")]
+    built = build(PromptBuilder(MODEL, token_budget=budget, min_example_tokens=50), examples)
+
+    assert (built.examples_used, built.examples_truncated, built.examples_dropped) == (2, 1, 1)
+    assert built.example_sources == ["uno-50", "dos-2000"]
+    assert TRUNCATION_MARK + "\n" in built.system_prompt
+    assert "tres0" not in built.system_prompt
+    assert built.prompt_tokens <= budget
+    assert built.prompt_tokens == count_tokens(built.messages[0]["content"], MODEL) + sum(
+        count_tokens(message["content"], MODEL) for message in built.messages[1:]
+    ) + 3 * 4 + 3
+
+
+def test_examples_are_dropped_rather_than_cut_below_the_minimum(tokenizer):
+    budget = base_tokens() + 120
+    built = build(PromptBuilder(MODEL, token_budget=budget, min_example_tokens=150), [example(500), example(10)])
+
+    assert (built.examples_used, built.examples_dropped) == (0, 2)
+    assert "Ejemplos de referencia" not in built.system_prompt
+    assert built.prompt_tokens <= budget
+
+
+def test_count_tokens_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "tiktoken", None)
+    prompt_builder._encoding.cache_clear()
+    try:
+        assert count_tokens("abcdefgh", MODEL) == 2
+        assert count_tokens("abcdefghi", MODEL) == 3
+        assert prompt_builder.truncate_to_tokens("uno dos tres cuatro", 3, MODEL) == "uno dos"
+    finally:
+        prompt_builder._encoding.cache_clear()
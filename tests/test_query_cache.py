@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from redaccion.storage.query_cache import FEEDBACK, MODEL_METRICS, QueryCache
+
+
+class CountingLoader:
+    def __init__(self, value="resultado", delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        return f"{self.value} {calls}"
+
+
+def test_invalidating_a_tag_drops_only_the_entries_that_read_it():
+    cache = QueryCache()
+    history, metrics = CountingLoader("historial"), CountingLoader("métricas")
+    assert cache.get("history", history, tags=(FEEDBACK,)) == "historial 1"
+    assert cache.get("metrics", metrics, tags=(MODEL_METRICS,)) == "métricas 1"
+    assert cache.get("history", history, tags=(FEEDBACK,)) == "historial 1"
+
+    cache.invalidate(FEEDBACK)
+    assert cache.get("history", history, tags=(FEEDBACK,)) == "historial 2"
+    assert cache.get("metrics", metrics, tags=(MODEL_METRICS,)) == "métricas 1"
+    assert cache.snapshot()["invalidations"] == 1
+
+
+def test_a_write_during_the_query_leaves_its_result_stale():
+    cache = QueryCache()
+
+    def read_then_write():
+        # New feedback lands while the query runs
+        cache.invalidate(FEEDBACK)
+        return "antes"
+
+    assert cache.get("history", read_then_write) == "antes"
+    assert cache.get("history", lambda: "después") == "después"
+
+
+def test_entries_expire_after_their_ttl():
+    cache = QueryCache(ttl=0.05)
+    loader = CountingLoader()
+    cache.get("summary", loader)
+    cache.get("summary", loader)
+    assert loader.calls == 1
+
+    time.sleep(0.06)
+    assert cache.get("summary", loader) == "resultado 2"
+    assert cache.get("long", loader, ttl=60) == "resultado 3"
+    time.sleep(0.06)
+    assert cache.get("long", loader, ttl=60) == "resultado 3"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(max_entries=2)
+    loader = CountingLoader()
+    cache.get("a", loader)
+    cache.get("b", loader)
+    cache.get("a", loader)
+    cache.get("c", loader)
+
+    assert cache.get("a", loader) == "resultado 1"
+    assert cache.get("b", loader) == "resultado 4"
+
+
+def test_concurrent_misses_run_the_query_once():
+    cache = QueryCache()
+    loader = CountingLoader(delay=0.1)
+    start = threading.Barrier(8)
+    results = []
+
+    def session():
+        start.wait()
+        results.append(cache.get("dashboard", loader))
+
+    threads = [threading.Thread(target=session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert results == ["resultado 1"] * 8
+    assert (cache.hits, cache.misses) == (7, 1)
+
+
+def test_waiters_retry_when_the_query_fails():
+    cache = QueryCache()
+    started = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append("falla")
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("warehouse unavailable")
+
+    def first():
+        with pytest.raises(RuntimeError):
+            cache.get("dashboard", failing)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait()
+    # Waits for the failed query, then runs its own
+    assert cache.get("dashboard", lambda: calls.append("ok") or "ok") == "ok"
+    thread.join()
+    assert calls == ["falla", "ok"]
@@ -0,0 +1,43 @@
+from redaccion.generation.reranker import length_score, rank_candidates, repetition_score
+
+
+def words(count, prefix="palabra"):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_candidates_are_ranked_best_first():
+    in_range = words(200)
+    too_short = words(40)
+    repetitive = " ".join(["el mismo texto"] * 70)
+
+    ranked = rank_candidates([too_short, repetitive, in_range], "corta")
+    assert [candidate.index for candidate in ranked] == [2, 1, 0]
+    assert ranked[0].components == {"length": 1.0, "repetition": 1.0, "similarity": 0.0}
+    assert ranked[0].score > ranked[1].score > ranked[2].score
+
+
+def test_similarity_to_the_examples_breaks_otherwise_equal_candidates():
+    examples = [{"text": "aranceles comercio exterior acero " * 40}]
+    unrelated = words(150)
+    related = words(120) + " " + "aranceles comercio exterior acero " * 7
+
+    ranked = rank_candidates([unrelated, related], "corta", examples)
+    assert [candidate.index for candidate in ranked] == [1, 0]
+    assert ranked[0].components["similarity"] > 0 == ranked[1].components["similarity"]
+
+
+def test_ties_keep_the_generation_order():
+    texts = [words(150, "a"), words(150, "b"), words(150, "c")]
+
+    ranked = rank_candidates(texts, "corta")
+    assert len({candidate.score for candidate in ranked}) == 1
+    assert [candidate.index for candidate in ranked] == [0, 1, 2]
+    assert ranked[0].to_dict()["text"] == texts[0]
+
+
+def test_component_scores():
+    assert length_score(words(50), "corta") == 0.5
+    assert length_score(words(600), "corta") == 0.0
+    assert length_score(words(5000), "muy_larga") == 1.0
+    assert repetition_score("uno dos tres uno dos tres") == 0.75
+    assert repetition_score("") == 1.0
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from redaccion.generation.backends import Backend, BackendRouter
+from redaccion.generation.resilience import (
+    CircuitBreaker,
+    DeadlineExceeded,
+    GenerationCancelled,
+    ResilientCaller,
+    cancellable,
+)
+from redaccion.generation.streaming import GenerationStats
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    return breaker
+
+
+class StreamingBackend(Backend):
+    """Streams a few chunks through a ResilientCaller and notes when its stream is closed."""
+
+    def __init__(self, caller: ResilientCaller):
+        super().__init__("fake", "fake-model", 1.0)
+        self.caller = caller
+        self.closed = False
+
+    def _chunks(self, timeout):
+        try:
+            yield from ("uno ", "dos ", "tres")
+        finally:
+            self.closed = True
+
+    def stream(self, messages, stats, length, **params):
+        return self.caller.stream(self._chunks)
+
+
+def test_closing_a_half_open_probe_stream_closes_the_circuit():
+    breaker = half_open_breaker()
+    caller = ResilientCaller(breaker, max_retries=0)
+    stream = caller.stream(lambda timeout: iter(["uno ", "dos ", "tres"]))
+    assert next(stream) == "uno "
+    stream.close()
+
+    assert breaker.state == "closed"
+    assert "".join(caller.stream(lambda timeout: iter(["otra ", "vez"]))) == "otra vez"
+
+
+def test_probe_is_released_when_a_routed_stream_is_closed():
+    breaker = half_open_breaker()
+    backend = StreamingBackend(ResilientCaller(breaker, max_retries=0))
+    router = BackendRouter([backend], latency_slo={})
+    stream = router.stream("Nota Periodística", "corta", [], GenerationStats(model="fake-model"))
+    assert next(stream) == "uno "
+    stream.close()
+
+    assert backend.closed
+    assert breaker.state == "closed"
+    # A partial stream is not a latency sample
+    assert router.trackers["fake"].snapshot()["requests"] == 0
+    assert "".join(router.stream("Nota Periodística", "corta", [], GenerationStats(model="fake-model"))) == "uno dos tres"
+
+
+def status_error(cls, status):
+    response = httpx.Response(status, request=httpx.Request("POST", "http://upstream/v1/chat/completions"))
+    return cls(f"status {status}", response=response, body=None)
+
+
+def failing(error):
+    def fn(stats, timeout):
+        raise error
+    return fn
+
+
+def test_a_client_error_closes_the_circuit():
+    breaker = half_open_breaker()
+    caller = ResilientCaller(breaker, max_retries=0)
+    with pytest.raises(openai.BadRequestError):
+        caller.call(failing(status_error(openai.BadRequestError, 400)), GenerationStats(model="fake-model"))
+
+    assert breaker.state == "closed"
+
+
+def test_a_local_error_does_not_settle_the_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure()
+    caller = ResilientCaller(breaker, max_retries=0)
+    with pytest.raises(TypeError):
+        caller.call(failing(TypeError("bad argument")), GenerationStats(model="fake-model"))
+    # Neither reset nor counted: one more upstream failure still opens the circuit
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breaker = half_open_breaker()
+    caller = ResilientCaller(breaker, max_retries=0)
+    with pytest.raises(KeyError):
+        caller.call(failing(KeyError("choices")), GenerationStats(model="fake-model"))
+    assert breaker.state == "half_open"
+    # The probe was released, so the next call may probe again
+    assert caller.call(lambda stats, timeout: "ok", GenerationStats(model="fake-model")) == "ok"
+    assert breaker.state == "closed"
+
+
+def broken_stream(error):
+    def chunks(timeout):
+        yield "uno "
+        raise error
+    return chunks
+
+
+def test_an_error_after_the_first_chunk_settles_a_half_open_probe():
+    breaker = half_open_breaker()
+    caller = ResilientCaller(breaker, max_retries=0)
+    with pytest.raises(ValueError):
+        list(caller.stream(broken_stream(ValueError("malformed chunk"))))
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+    breaker = half_open_breaker()
+    caller = ResilientCaller(breaker, max_retries=0)
+    with pytest.raises(openai.InternalServerError):
+        list(caller.stream(broken_stream(status_error(openai.InternalServerError, 500))))
+    assert breaker.state == "open"
+
+
+def test_the_deadline_bounds_a_started_stream():
+    closed = []
+
+    def slow(timeout):
+        try:
+            for i in range(100):
+                time.sleep(0.02)
+                yield f"{i} "
+        finally:
+            closed.append(True)
+
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    caller = ResilientCaller(breaker, deadline=0.1, max_retries=0)
+    received = []
+    with pytest.raises(DeadlineExceeded):
+        for delta in caller.stream(slow):
+            received.append(delta)
+
+    assert 0 < len(received) < 10
+    assert closed == [True]
+    assert caller.counters["deadline_exceeded"] == 1
+    assert breaker.state == "open"
+
+
+def test_cancelling_ends_the_backoff_and_skips_the_next_attempt():
+    attempts = []
+
+    def overloaded(stats, timeout):
+        attempts.append(time.monotonic())
+        raise status_error(openai.InternalServerError, 503)
+
+    caller = ResilientCaller(CircuitBreaker("test"), max_retries=3, backoff_base=30, backoff_cap=30)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    started = time.monotonic()
+    with cancellable(cancel), pytest.raises(GenerationCancelled):
+        caller.call(overloaded, GenerationStats(model="fake-model"))
+
+    assert len(attempts) == 1
+    assert time.monotonic() - started < 5
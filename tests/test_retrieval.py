@@ -0,0 +1,69 @@
+import numpy as np
+
+from redaccion.generation.retrieval import ExampleIndex, RetrievalService, build_index, tokenize
+
+DOCUMENTS = [
+    {"text": "Los aranceles al acero afectan el comercio con Estados Unidos.",
+     "metadata": {"category": "Comercio", "type": "Nota Periodística"}, "source": "a"},
+    {"text": "La inflación sube y el banco central revisa la tasa de interés. La inflación preocupa.",
+     "metadata": {"category": "Economía", "type": "Artículo"}, "source": "b"},
+    {"text": "El comercio de aguacate crece; los aranceles no frenan la exportación de aguacate.",
+     "metadata": {"category": "Comercio", "type": "Crónica"}, "source": "c"},
+]
+
+
+def test_tokenize_strips_accents_and_stopwords():
+    assert tokenize("La Inflación en México") == ["inflacion", "mexico"]
+
+
+def test_search_ranks_by_similarity(tmp_path):
+    index = ExampleIndex(build_index(DOCUMENTS, str(tmp_path), "v1"))
+
+    results = index.search("aguacate y aranceles", k=3)
+    assert [result["source"] for result in results] == ["c", "a"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert results[0]["text"] == DOCUMENTS[2]["text"]
+    assert index.search("inflación", k=1)[0]["metadata"]["category"] == "Economía"
+
+
+def test_label_boost_favours_the_selected_labels(tmp_path):
+    index = ExampleIndex(build_index(DOCUMENTS, str(tmp_path), "v1"))
+
+    plain = index.search("aranceles", k=2)
+    boosted = index.search("aranceles", k=2, category="Comercio", text_type="Nota Periodística", label_boost=1.0)
+    assert boosted[0]["source"] == "a"
+    assert boosted[0]["score"] > max(result["score"] for result in plain)
+
+
+def test_unknown_terms_return_nothing(tmp_path):
+    index = ExampleIndex(build_index(DOCUMENTS, str(tmp_path), "v1"))
+
+    assert index.search("zeppelin ornitorrinco") == []
+    assert index.search("") == []
+
+
+def test_postings_are_memory_mapped(tmp_path):
+    directory = build_index(DOCUMENTS, str(tmp_path), "v1")
+    index = ExampleIndex(directory)
+
+    assert len(index) == 3
+    assert isinstance(index._postings_docs, np.memmap)
+    assert isinstance(index._postings_weights, np.memmap)
+    assert isinstance(index._texts, np.memmap)
+    # A second build replaces the old fingerprint's directory
+    build_index(DOCUMENTS[:1], str(tmp_path), "v2")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v2"]
+
+
+def test_service_builds_the_index_from_the_sources(tmp_path):
+    cleaned = tmp_path / "cleaned"
+    cleaned.mkdir()
+    (cleaned / "nota_1.txt").write_text(DOCUMENTS[0]["text"], encoding="utf-8")
+    (cleaned / "nota_1_metadata.json").write_text('{"category": "Comercio"}', encoding="utf-8")
+    service = RetrievalService(
+        training_file=str(tmp_path / "missing.jsonl"), cleaned_dir=str(cleaned), index_dir=str(tmp_path / "index"),
+    )
+
+    results = service.search("acero", k=3)
+    assert [result["metadata"] for result in results] == [{"category": "Comercio"}]
+    assert service.index() is service.index()
@@ -0,0 +1,42 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from redaccion.storage.rollup import rating_by, refresh_rollup
+from redaccion.storage.store import SQLiteStore
+
+
+def insert_feedback(store, rating, category, day="2026-10-01 12:00:00"):
+    with store.engine.connect() as conn:
+        conn.execute(
+            text("INSERT INTO feedback (timestamp, rating, category) VALUES (:day, :rating, :category)"),
+            {"day": day, "rating": rating, "category": category},
+        )
+        conn.commit()
+
+
+def test_existing_feedback_is_rolled_up_at_start(tmp_path):
+    path = str(tmp_path / "feedback.db")
+    SQLiteStore(path).ensure_schema()
+    # Rows written without a refresh, e.g. by an older version of the app
+    insert_feedback(SQLiteStore(path), 5, "Economía")
+    insert_feedback(SQLiteStore(path), 2, "Economía")
+
+    store = SQLiteStore(path)
+    store.ensure_schema()
+    rows = store.run(lambda conn: rating_by(conn, "category", since=date(2026, 1, 1)))
+    assert [(row["category"], row["feedback_count"], row["avg_rating"]) for row in rows] == [("Economía", 2, 3.5)]
+
+
+def test_refresh_only_adds_new_rows(tmp_path):
+    store = SQLiteStore(str(tmp_path / "feedback.db"))
+    store.ensure_schema()
+    store.save_feedback(4, "", "texto", {"category": "Energía"})
+    insert_feedback(store, 1, "Energía", day=store.run(
+        lambda conn: conn.execute(text("SELECT timestamp FROM feedback")).scalar()
+    ))
+
+    assert store.run(refresh_rollup) == 1
+    assert store.run(refresh_rollup) == 0
+    rows = store.run(lambda conn: rating_by(conn, "category"))
+    assert [(row["category"], row["feedback_count"], row["positive_share"]) for row in rows] == [("Energía", 2, 0.5)]
@@ -0,0 +1,64 @@
+import time
+
+from redaccion.config import GenerationConfig
+from redaccion.generation.backends import Backend, BackendRouter
+from redaccion.generation.cache import GenerationCache
+from redaccion.generation.prompt_builder import BuiltPrompt
+from redaccion.generation.service import GenerationRequest, GenerationService
+
+
+class FixedBackend(Backend):
+    def __init__(self, name, model, cost):
+        super().__init__(name, model, cost)
+        self.calls = 0
+
+    def complete(self, messages, stats, length, **params):
+        self.calls += 1
+        stats.finished_at = time.perf_counter()
+        return f"texto de {self.name}"
+
+
+def make_service(tmp_path):
+    local, openai = FixedBackend("local", "modelo-local", 0.1), FixedBackend("openai", "gpt-4", 1.0)
+    service = GenerationService(
+        GenerationConfig(),
+        client=None,
+        cache=GenerationCache(str(tmp_path / "cache.db")),
+        router=BackendRouter([local, openai], latency_slo={}),
+    )
+    built = BuiltPrompt(messages=[{"role": "system", "content": "sistema"}], prompt_tokens=10, token_budget=100)
+    service.prepare = lambda request: built
+    return service, local, openai
+
+
+def request():
+    return GenerationRequest("Economía", "Finanzas", "Nota Periodística", "corta", "Escribe una nota")
+
+
+def test_cached_texts_are_only_served_for_the_backend_that_wrote_them(tmp_path):
+    service, local, openai = make_service(tmp_path)
+
+    first = service.generate(request())
+    assert first.text == "texto de local"
+    assert (first.stats["backend"], first.stats["model"]) == ("local", "modelo-local")
+
+    # While the local model cools down the request goes to OpenAI, which has no cached text yet
+    service.router.trackers["local"].open_until = time.monotonic() + 60
+    second = service.generate(request())
+    assert not second.cached and second.text == "texto de openai"
+
+    service.router.trackers["local"].open_until = 0.0
+    third = service.generate(request())
+    assert third.cached and third.text == "texto de local"
+    assert third.stats["backend"] == "local"
+    assert (local.calls, openai.calls) == (1, 1)
+
+
+def test_explicit_regeneration_bypasses_the_cache(tmp_path):
+    service, local, _ = make_service(tmp_path)
+    service.generate(request())
+
+    again = request()
+    again.use_cache = False
+    assert not service.generate(again).cached
+    assert local.calls == 2
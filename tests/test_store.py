@@ -0,0 +1,17 @@
+from sqlalchemy import event
+
+from redaccion.storage.store import SQLiteStore
+
+
+def test_sqlite_schema_is_verified_once(tmp_path):
+    store = SQLiteStore(str(tmp_path / "feedback.db"))
+    statements = []
+    event.listen(store.engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    store.ensure_schema()
+    assert statements
+    statements.clear()
+    # The app calls this on every script run
+    store.ensure_schema()
+    store.ensure_schema()
+    assert statements == []
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+
+from redaccion.config import UsageConfig
+from redaccion.generation.service import GenerationRequest, GenerationResult
+from redaccion.storage import usage
+from redaccion.storage.usage import UsageRecorder
+
+TODAY = date(2026, 10, 16)
+
+
+class MemorySink:
+    """Keeps written rows and answers the day's total like the generation_usage table."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, rows, day):
+        self.rows.extend(rows)
+        return sum(row["cost_usd"] for row in self.rows if row["timestamp"].startswith(day.isoformat()))
+
+
+@pytest.fixture
+def alarms(monkeypatch):
+    fired = []
+    monkeypatch.setattr(usage, "record_budget_alarm", fired.append)
+    monkeypatch.setattr(usage, "_utc_today", lambda: TODAY)
+    return fired
+
+
+@pytest.fixture
+def recorder():
+    # $0.30 per generation against a $1 budget that warns at 80%
+    config = UsageConfig(daily_budget=1.0, alert_ratio=0.8, flush_interval=3600, prices={"modelo": (3.0, 0.0)})
+    recorder = UsageRecorder(MemorySink(), config)
+    yield recorder
+    recorder.close()
+
+
+def generate(recorder, day=TODAY):
+    request = GenerationRequest("Economía", "Finanzas", "Nota Periodística", "corta", "Escribe una nota")
+    result = GenerationResult(text="texto", stats={"model": "modelo", "prompt_tokens": 100_000}, prompt={})
+    recorder.record(request, result)
+    # Rows are stamped with the real clock; keep them on the day under test
+    recorder._buffer[-1]["timestamp"] = f"{day.isoformat()} 12:00:00.000000"
+
+
+def test_each_budget_alarm_fires_once_per_day(recorder, alarms):
+    generate(recorder)
+    generate(recorder)
+    assert alarms == [] and recorder.budget_status()["level"] == "ok"
+
+    generate(recorder)
+    assert alarms == ["warning"]
+    generate(recorder)
+    assert alarms == ["warning", "exceeded"]
+
+    generate(recorder)
+    recorder.flush()
+    generate(recorder)
+    assert alarms == ["warning", "exceeded"]
+    status = recorder.budget_status()
+    assert status["level"] == "exceeded" and status["spent"] == pytest.approx(1.8)
+
+
+def test_alarms_fire_again_the_next_day(recorder, alarms, monkeypatch):
+    for _ in range(4):
+        generate(recorder)
+    recorder.flush()
+    assert alarms == ["warning", "exceeded"]
+
+    tomorrow = TODAY + timedelta(days=1)
+    monkeypatch.setattr(usage, "_utc_today", lambda: tomorrow)
+    generate(recorder, tomorrow)
+    assert recorder.budget_status() == {
+        "day": tomorrow.isoformat(), "spent": pytest.approx(0.3), "budget": 1.0, "ratio": pytest.approx(0.3), "level": "ok",
+    }
+    for _ in range(2):
+        generate(recorder, tomorrow)
+    assert alarms == ["warning", "exceeded", "warning"]
+
+
+def test_a_restart_counts_what_other_processes_spent(recorder, alarms):
+    # Cost already in the table when the process starts
+    recorder.sink.rows = [{"timestamp": f"{TODAY.isoformat()} 08:00:00.000000", "cost_usd": 0.7}]
+    recorder.flush()
+    assert alarms == []
+
+    generate(recorder)
+    assert alarms == ["warning", "exceeded"]